@@ -0,0 +1,1010 @@
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from src import (
+    Tokenizer, MappedTokenizer, Parser, Arena, Cursor, NodeKind, NODE_FIELDS, NODE_KIND_BY_TYPE,
+    LALRParser, GRAMMAR_PATH, build_tables, load_tables, SymbolTable, SemanticAnalyzer, FusedAnalyzer,
+    TAC, fold_ast_constants, pretty_ast, uninitialized_uses, constant_fold,
+    copy_and_constant_propagation, dead_code_elimination, tac_equals, to_ir, IRArrays,
+    optimize_tac, register_optimization, tac_to_asm, StreamingCompiler, construct_ssa, destruct_ssa,
+)
+from src.lexer_numpy import HAVE_NUMPY
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+"""
+Benchmarks for the compiler front end
+
+Every measurement runs in a fresh interpreter so peak RSS belongs to that
+measurement alone.
+
+    python benchmark.py mmap --size-mb 256
+    python benchmark.py lexer --size-mb 16
+    python benchmark.py parser --size-mb 8
+    python benchmark.py lalr --size-mb 8
+    python benchmark.py arena --size-mb 6
+    python benchmark.py parallel --size-mb 8 --workers 1 2 4 8
+    python benchmark.py steps --size-mb 4 --step-tokens 1024 4096 16384
+    python benchmark.py analysis --functions 20 --statements 2000
+    python benchmark.py passes --size-mb 1 --depth 2000
+    python benchmark.py init --functions 4 --statements 500 1000 2000 4000
+    python benchmark.py ir --functions 1 --statements 250 500 1000
+    python benchmark.py stream --functions 16 32 64 --statements 20
+    python benchmark.py ssa --functions 4 --statements 500 1000 2000 4000
+"""
+
+
+_FUNCTION_TEMPLATE = """\
+int func{n}(int a, int b) {{
+    int x = a + b * {n}; // running total
+    /* loop until the
+       bound is reached */
+    while (x < {n}) {{
+        x = x + 1;
+    }}
+    if (x > 3) {{
+        return x - b;
+    }}
+    for (int i = 0; i < b; i++) {{
+        if (i == a) {{
+            continue;
+        }}
+        x += (i - -x) % 7;
+    }}
+    if (x == 1) {{
+        x = !x;
+    }} else {{
+        x = ~x;
+    }}
+    do {{
+        x--;
+    }} while (x > a && x != b);
+    return x;
+}}
+
+"""
+
+
+# Repeated inside one function body by generate_large_functions
+_STATEMENT_TEMPLATE = """\
+    int v{n} = a + {n};
+    for (int i = 0; i < b; i++) {{
+        v{n} += i * {n};
+        if (v{n} > a) {{
+            a = v{n} - b;
+        }}
+    }}
+    while (v{n} > b) {{
+        v{n} = v{n} - 1;
+    }}
+"""
+
+
+def generate_source(path: Path, size_mb: int) -> None:
+    """Writes a valid translation unit of roughly size_mb megabytes"""
+    target = size_mb * 1024 * 1024
+    written = 0
+    n = 0
+    with open(path, 'w') as file:
+        while written < target:
+            chunk = "".join(_FUNCTION_TEMPLATE.format(n=n + i) for i in range(1000))
+            file.write(chunk)
+            written += len(chunk)
+            n += 1000
+        file.write("int main() { return 0; }\n")
+
+
+def generate_large_functions(path: Path, functions: int, statements: int) -> None:
+    """Writes functions that each repeat _STATEMENT_TEMPLATE statements times"""
+    with open(path, 'w') as file:
+        for k in range(functions):
+            file.write(f"int big{k}(int a, int b) {{\n")
+            file.write("".join(_STATEMENT_TEMPLATE.format(n=n) for n in range(statements)))
+            file.write("    return a;\n}\n\n")
+        file.write("int main() { return 0; }\n")
+
+
+def generate_deep_source(path: Path, depth: int) -> None:
+    """Writes a function nesting blocks, parentheses and a + chain depth levels deep"""
+    with open(path, 'w') as file:
+        file.write("int main() {\n    int x = 1;\n")
+        file.write("    x = " + " + ".join(["x"] * depth) + ";\n")
+        file.write("    x = " + "-(" * depth + "x" + ")" * depth + ";\n")
+        file.write("    " + "{ " * depth + "x = x - 1;" + " }" * depth + "\n")
+        file.write("    return x;\n}\n")
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return float('nan')
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_mmap_child(mode: str, stage: str, path: Path) -> dict:
+    """Lexes or parses path through one input path, run inside the child"""
+    start = time.perf_counter()
+    if mode == 'mmap':
+        tokenizer = MappedTokenizer(path)
+    else:
+        tokenizer = Tokenizer(path.read_text())
+    tokens = tokenizer.iter_tokens()
+    if stage == 'parse':
+        count = len(Parser(tokens).parse().units)
+    else:
+        count = 0
+        for _ in tokens:
+            count += 1
+    elapsed = time.perf_counter() - start
+    if mode == 'mmap':
+        tokenizer.close()
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'count': count}
+
+
+def measure(args: list[str]) -> dict:
+    """Runs one measurement in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', *args],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def bench_mmap(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB, stage {args.stage}")
+        print(f"{'input':<10}{'seconds':>10}{'MB/s':>10}{'peak RSS MB':>14}")
+        for mode in ('read_text', 'mmap'):
+            result = measure(['mmap', mode, args.stage, str(path)])
+            throughput = size_mb / result['seconds']
+            print(f"{mode:<10}{result['seconds']:>10.2f}{throughput:>10.2f}"
+                  f"{result['peak_rss_mb']:>14.1f}")
+
+
+def run_lexer_child(engine: str, path: Path) -> dict:
+    """Scans path into a TokenStream with one lexer engine, run inside the child
+
+    Timing includes the numpy prescan, which runs when the Tokenizer is built
+    """
+    source = path.read_text()
+    start = time.perf_counter()
+    count = len(Tokenizer(source, engine=engine).token_stream())
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'count': count}
+
+
+def bench_lexer(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB")
+        print(f"{'engine':<10}{'seconds':>10}{'MB/s':>10}{'tokens':>12}")
+        engines = ('regex', 'dfa', 'numpy') if HAVE_NUMPY else ('regex', 'dfa')
+        for engine in engines:
+            result = measure(['lexer', engine, str(path)])
+            throughput = size_mb / result['seconds']
+            print(f"{engine:<10}{result['seconds']:>10.2f}{throughput:>10.2f}"
+                  f"{result['count']:>12}")
+
+
+def run_parser_child(path: Path, lazy: bool) -> dict:
+    """Parses an already lexed path, run inside the child"""
+    tokens = Tokenizer(path.read_text()).tokenize()
+    start = time.perf_counter()
+    count = len(Parser(tokens, lazy_bodies=lazy).parse().units)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'count': count,
+            'tokens': len(tokens)}
+
+
+def bench_parser(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB{', lazy bodies' if args.lazy else ''}")
+        print(f"{'run':<6}{'seconds':>10}{'MB/s':>10}{'tokens/s':>12}")
+        for run in range(args.runs):
+            result = measure(['parser', str(path), str(int(args.lazy))])
+            print(f"{run:<6}{result['seconds']:>10.2f}{size_mb / result['seconds']:>10.2f}"
+                  f"{result['tokens'] / result['seconds']:>12.0f}")
+
+
+def run_lalr_child(engine: str, path: Path) -> dict:
+    """Parses an already lexed path with one of the two parsers, run inside the child"""
+    tokens = Tokenizer(path.read_text()).tokenize()
+    start = time.perf_counter()
+    tables = load_tables()
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    if engine == 'lalr':
+        count = len(LALRParser(tokens, tables).parse().units)
+    else:
+        count = len(Parser(tokens).parse().units)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'count': count,
+            'tokens': len(tokens), 'load_seconds': load_seconds}
+
+
+def bench_lalr(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    tables = build_tables(GRAMMAR_PATH.read_text(encoding='utf-8-sig'))
+    build_seconds = time.perf_counter() - start
+    print(f"tables: {len(tables.action)} states, built in {build_seconds:.2f} s")
+    load_tables()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB")
+        print(f"{'parser':<10}{'seconds':>10}{'tokens/s':>12}{'vs descent':>12}{'peak RSS MB':>14}")
+        for run in range(args.runs):
+            descent = measure(['lalr', 'descent', str(path)])
+            lalr = measure(['lalr', 'lalr', str(path)])
+            for engine, result in (('descent', descent), ('lalr', lalr)):
+                print(f"{engine:<10}{result['seconds']:>10.2f}"
+                      f"{result['tokens'] / result['seconds']:>12.0f}"
+                      f"{descent['seconds'] / result['seconds']:>12.2f}{result['peak_rss_mb']:>14.1f}")
+        print(f"cached tables load in {lalr['load_seconds'] * 1000:.1f} ms")
+
+
+def run_parallel_child(workers: int, path: Path) -> dict:
+    """Parses an already lexed path, serially when workers is 0, run inside the child"""
+    tokens = Tokenizer(path.read_text()).tokenize()
+    start = time.perf_counter()
+    if workers:
+        count = len(Parser(tokens).parse_parallel(workers).units)
+    else:
+        count = len(Parser(tokens).parse().units)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'count': count}
+
+
+def bench_parallel(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB, {os.cpu_count()} cores")
+        print(f"{'workers':<10}{'seconds':>10}{'speedup':>10}{'peak RSS MB':>14}")
+        serial = measure(['parallel', '0', str(path)])
+        print(f"{'serial':<10}{serial['seconds']:>10.2f}{1:>10.2f}{serial['peak_rss_mb']:>14.1f}")
+        for workers in args.workers:
+            result = measure(['parallel', str(workers), str(path)])
+            print(f"{workers:<10}{result['seconds']:>10.2f}"
+                  f"{serial['seconds'] / result['seconds']:>10.2f}{result['peak_rss_mb']:>14.1f}")
+
+
+def run_steps_child(step_tokens: int, path: Path) -> dict:
+    """Lexes and parses path on an event loop, run inside the child
+
+    A second task measures how long each of its turns waits on the parse.
+    With step_tokens 0 the parse is a plain parse() that holds the loop.
+    """
+    source = path.read_text()
+    stalls = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            stalls.append(time.perf_counter() - start)
+
+    async def compile_job():
+        parser = Parser(Tokenizer(source).iter_tokens())
+        if step_tokens:
+            return await parser.parse_async(step_tokens)
+        return parser.parse()
+
+    async def run():
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        program = await compile_job()
+        elapsed = time.perf_counter() - start
+        # Let the ticker record the turn it waited through
+        await asyncio.sleep(0)
+        tick.cancel()
+        return program, elapsed
+
+    program, elapsed = asyncio.run(run())
+    stalls.sort()
+    return {'seconds': elapsed, 'count': len(program.units),
+            'p99_stall_ms': stalls[int(len(stalls) * 0.99)] * 1000, 'max_stall_ms': stalls[-1] * 1000}
+
+
+def bench_steps(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB, lexed and parsed on an event loop")
+        print(f"{'step':<10}{'seconds':>10}{'MB/s':>10}{'p99 stall ms':>14}{'max stall ms':>14}")
+        for step_tokens in [0, *args.step_tokens]:
+            result = measure(['steps', str(step_tokens), str(path)])
+            print(f"{step_tokens or 'parse()':<10}{result['seconds']:>10.2f}"
+                  f"{size_mb / result['seconds']:>10.2f}{result['p99_stall_ms']:>14.1f}"
+                  f"{result['max_stall_ms']:>14.1f}")
+
+
+def run_analysis_child(mode: str, path: Path) -> dict:
+    """Builds the symbol table and runs the semantic checks one way, run inside the child"""
+    program = Parser(Tokenizer(path.read_text()).tokenize()).parse()
+    # Keep collections from rescanning the AST, which would swamp the walks
+    gc.collect()
+    gc.freeze()
+    sym_table = SymbolTable()
+    start = time.perf_counter()
+    if mode == 'fused':
+        FusedAnalyzer(program, sym_table).analyze()
+    else:
+        sym_table.build_symbol_table(program)
+        SemanticAnalyzer(program, sym_table).analyze()
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'scopes': sym_table.next_id}
+
+
+def bench_analysis(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_large_functions(path, args.functions, args.statements)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB")
+        print(f"{'analysis':<10}{'seconds':>10}{'scopes':>10}{'vs passes':>12}")
+        for run in range(args.runs):
+            passes = measure(['analysis', 'passes', str(path)])
+            fused = measure(['analysis', 'fused', str(path)])
+            for mode, result in (('passes', passes), ('fused', fused)):
+                print(f"{mode:<10}{result['seconds']:>10.3f}{result['scopes']:>10}"
+                      f"{passes['seconds'] / result['seconds']:>12.2f}")
+
+
+_PASSES = ('symbol_table', 'semantic', 'fused', 'fold', 'tac', 'pretty_ast')
+
+
+def run_passes_child(name: str, path: Path) -> dict:
+    """Times one pass over the AST of path, run inside the child"""
+    program = Parser(Tokenizer(path.read_text()).tokenize()).parse()
+    sym_table = SymbolTable()
+    if name in ('semantic', 'tac'):
+        sym_table.build_symbol_table(program)
+    gc.collect()
+    gc.freeze()
+    start = time.perf_counter()
+    if name == 'symbol_table':
+        sym_table.build_symbol_table(program)
+    elif name == 'semantic':
+        SemanticAnalyzer(program, sym_table).analyze()
+    elif name == 'fused':
+        FusedAnalyzer(program, sym_table).analyze()
+    elif name == 'fold':
+        fold_ast_constants(program)
+    elif name == 'tac':
+        TAC().generate_tac(program, sym_table)
+    else:
+        pretty_ast(program)
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_passes(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        deep = Path(tmp) / 'deep.c'
+        generate_deep_source(deep, args.depth)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB, deep.c: depth {args.depth}")
+        print(f"{'pass':<14}{'seconds':>10}{'MB/s':>10}{'deep s':>10}")
+        for name in _PASSES:
+            result = measure(['passes', name, str(path)])
+            deep_result = measure(['passes', name, str(deep)])
+            print(f"{name:<14}{result['seconds']:>10.3f}{size_mb / result['seconds']:>10.2f}"
+                  f"{deep_result['seconds']:>10.3f}")
+
+
+def run_init_child(mode: str, path: Path) -> dict:
+    """Times one initialization check over path, run inside the child"""
+    program = Parser(Tokenizer(path.read_text()).tokenize()).parse()
+    sym_table = SymbolTable()
+    sym_table.build_symbol_table(program)
+    tac = TAC()
+    if mode == 'cfg':
+        tac.generate_tac(program, sym_table)
+    gc.collect()
+    gc.freeze()
+    start = time.perf_counter()
+    if mode == 'cfg':
+        uninitialized_uses(tac)
+    else:
+        SemanticAnalyzer(program, sym_table).check_uninitialized_usage()
+    elapsed = time.perf_counter() - start
+    blocks = sum(len(func.blocks) for func in tac.functions)
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'blocks': blocks}
+
+
+def bench_init(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'statements':<12}{'ast s':>10}{'cfg s':>10}{'blocks':>10}{'cfg us/block':>14}")
+        for statements in args.statements:
+            path = Path(tmp) / f'init{statements}.c'
+            generate_large_functions(path, args.functions, statements)
+            ast = measure(['init', 'ast', str(path)])
+            cfg = measure(['init', 'cfg', str(path)])
+            print(f"{statements:<12}{ast['seconds']:>10.3f}{cfg['seconds']:>10.3f}{cfg['blocks']:>10}"
+                  f"{cfg['seconds'] / cfg['blocks'] * 1e6:>14.2f}")
+
+
+def run_ir_child(mode: str, path: Path) -> dict:
+    """Measures one TAC representation or times the -o1 fixpoint, run inside the child"""
+    program = Parser(Tokenizer(path.read_text()).tokenize()).parse()
+    sym_table = SymbolTable()
+    sym_table.build_symbol_table(program)
+    tac = TAC()
+    if mode == 'tac':
+        tracemalloc.start()
+    tac.generate_tac(program, sym_table)
+    count = sum(len(block.instr_list) for func in tac.functions for block in func.blocks)
+    result = {'instructions': count}
+    if mode in ('tac', 'ir'):
+        if mode == 'ir':
+            tracemalloc.start()
+            ir = to_ir(tac)
+        result['bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    elif mode == 'arrays':
+        result['bytes'] = IRArrays.from_tac(tac).nbytes()
+    else:
+        gc.collect()
+        gc.freeze()
+        start = time.perf_counter()
+        post = copy.deepcopy(tac)
+        if mode == 'deepcopy':
+            # Rounds compared on the Instructions, as -o1 did before IRArrays
+            pre = tac
+            while True:
+                constant_fold(post)
+                copy_and_constant_propagation(post)
+                dead_code_elimination(post)
+                if tac_equals(pre, post, include_meta=True):
+                    break
+                pre = copy.deepcopy(post)
+        else:
+            snapshot = IRArrays.from_tac(post)
+            while True:
+                constant_fold(post)
+                copy_and_constant_propagation(post)
+                dead_code_elimination(post)
+                optimized = IRArrays.from_tac(post)
+                if optimized == snapshot:
+                    break
+                snapshot = optimized
+        result['seconds'] = time.perf_counter() - start
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def bench_ir(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'statements':<12}{'instrs':>8}{'TAC B/i':>9}{'IR B/i':>8}{'array B/i':>11}"
+              f"{'copy -o1 s':>12}{'RSS MB':>8}{'array -o1 s':>13}{'RSS MB':>8}")
+        for statements in args.statements:
+            path = Path(tmp) / f'ir{statements}.c'
+            generate_large_functions(path, args.functions, statements)
+            sizes = [measure(['ir', mode, str(path)]) for mode in ('tac', 'ir', 'arrays')]
+            count = sizes[0]['instructions']
+            deepcopy = measure(['ir', 'deepcopy', str(path)])
+            arrays = measure(['ir', 'snapshot', str(path)])
+            print(f"{statements:<12}{count:>8}"
+                  + "".join(f"{size['bytes'] / count:>{width}.1f}"
+                            for size, width in zip(sizes, (9, 8, 11)))
+                  + f"{deepcopy['seconds']:>12.2f}{deepcopy['peak_rss_mb']:>8.1f}"
+                  f"{arrays['seconds']:>13.2f}{arrays['peak_rss_mb']:>8.1f}")
+
+
+def run_stream_child(mode: str, path: Path, output: Path) -> dict:
+    """Compiles path with -o1 whole or a unit at a time, run inside the child"""
+    start = time.perf_counter()
+    tokens = Tokenizer(path.read_text()).iter_tokens()
+    with open(output, 'w') as file:
+        if mode == 'stream':
+            StreamingCompiler(optimize=True).write(Parser(tokens).iter_units(), file)
+        else:
+            # The steps of main.run_compiler with -o1, without printing the TAC
+            program = Parser(tokens).parse()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            fold_ast_constants(program)
+            tac = TAC(value_numbering=True)
+            tac.generate_tac(program, sym_table)
+            optimized = optimize_tac(copy.deepcopy(tac))
+            for line in tac_to_asm(optimized, register_optimization(optimized)):
+                file.write(f"{line}\n")
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_stream(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'functions':<11}{'MB':>6}{'whole s':>10}{'RSS MB':>9}{'stream s':>10}{'RSS MB':>9}")
+        output = Path(tmp) / 'out.asm'
+        for functions in args.functions:
+            path = Path(tmp) / f'stream{functions}.c'
+            generate_large_functions(path, functions, args.statements)
+            size_mb = path.stat().st_size / (1024 * 1024)
+            whole = measure(['stream', 'whole', str(path), str(output)])
+            stream = measure(['stream', 'stream', str(path), str(output)])
+            print(f"{functions:<11}{size_mb:>6.1f}{whole['seconds']:>10.2f}{whole['peak_rss_mb']:>9.1f}"
+                  f"{stream['seconds']:>10.2f}{stream['peak_rss_mb']:>9.1f}")
+
+
+def run_ssa_child(path: Path) -> dict:
+    """Times SSA construction and destruction of every function in path, run inside the child"""
+    program = Parser(Tokenizer(path.read_text()).tokenize()).parse()
+    sym_table = SymbolTable()
+    sym_table.build_symbol_table(program)
+    tac = TAC()
+    tac.generate_tac(program, sym_table)
+    gc.collect()
+    gc.freeze()
+    start = time.perf_counter()
+    forms = [construct_ssa(func, tac.names) for func in tac.functions]
+    built = time.perf_counter()
+    blocks = sum(len(func.blocks) for func in tac.functions)
+    phis = sum(len(block_phis) for ssa in forms for block_phis in ssa.phis)
+    for ssa in forms:
+        destruct_ssa(ssa)
+    elapsed = time.perf_counter() - built
+    return {'construct_seconds': built - start, 'destruct_seconds': elapsed,
+            'blocks': blocks, 'phis': phis, 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_ssa(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'statements':<12}{'blocks':>8}{'phis':>8}{'build s':>10}{'destroy s':>11}"
+              f"{'us/block':>10}{'RSS MB':>8}")
+        for statements in args.statements:
+            path = Path(tmp) / f'ssa{statements}.c'
+            generate_large_functions(path, args.functions, statements)
+            result = measure(['ssa', str(path)])
+            total = result['construct_seconds'] + result['destruct_seconds']
+            print(f"{statements:<12}{result['blocks']:>8}{result['phis']:>8}"
+                  f"{result['construct_seconds']:>10.3f}{result['destruct_seconds']:>11.3f}"
+                  f"{total / result['blocks'] * 1e6:>10.2f}{result['peak_rss_mb']:>8.1f}")
+
+
+def dataclass_ast_bytes(program) -> int:
+    """Size of the AST objects and their lists, tokens are shared and not counted"""
+    total = 0
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        total += sys.getsizeof(node)
+        values = node if isinstance(node, list) else (
+            getattr(node, name) for name in NODE_FIELDS[NODE_KIND_BY_TYPE[type(node)]])
+        for value in values:
+            if isinstance(value, list) or type(value) in NODE_KIND_BY_TYPE:
+                stack.append(value)
+    return total
+
+
+def walk_dataclasses(program) -> int:
+    count = 0
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        count += 1
+        for name in NODE_FIELDS[NODE_KIND_BY_TYPE[type(node)]]:
+            value = getattr(node, name)
+            if isinstance(value, list) or type(value) in NODE_KIND_BY_TYPE:
+                stack.append(value)
+    return count
+
+
+def walk_arena(arena: Arena) -> int:
+    kinds = arena.kinds
+    return sum(1 for index in arena.walk() if kinds[index] < NodeKind.LIST)
+
+
+def walk_cursors(arena: Arena) -> int:
+    count = 0
+    stack = [arena.root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        count += 1
+        for value in node.children:
+            if isinstance(value, (list, Cursor)):
+                stack.append(value)
+    return count
+
+
+def run_arena_child(mode: str, path: Path) -> dict:
+    """Measures AST size and a full traversal of one representation, run inside the child"""
+    tokens = Tokenizer(path.read_text()).tokenize()
+    program = Parser(tokens).parse()
+    start = time.perf_counter()
+    if mode == 'dataclass':
+        size = dataclass_ast_bytes(program)
+        build = 0.0
+    else:
+        arena = Arena.from_ast(program, tokens)
+        build = time.perf_counter() - start
+        del program
+        # The token list the arena indexes is its own cost, the Tokens are shared
+        size = arena.nbytes() + sys.getsizeof(arena.tokens)
+    start = time.perf_counter()
+    if mode == 'dataclass':
+        count = walk_dataclasses(program)
+    elif mode == 'arena':
+        count = walk_arena(arena)
+    else:
+        count = walk_cursors(arena)
+    walk = time.perf_counter() - start
+    return {'build_seconds': build, 'walk_seconds': walk, 'ast_mb': size / (1024 * 1024),
+            'peak_rss_mb': peak_rss_mb(), 'count': count}
+
+
+def bench_arena(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.input) if args.input else Path(tmp) / 'generated.c'
+        if not args.input:
+            generate_source(path, args.size_mb)
+        size_mb = path.stat().st_size / (1024 * 1024)
+        print(f"{path.name}: {size_mb:.1f} MB")
+        print(f"{'ast':<11}{'nodes':>10}{'AST MB':>10}{'build s':>10}{'walk s':>10}"
+              f"{'peak RSS MB':>14}")
+        for mode in ('dataclass', 'arena', 'cursor'):
+            result = measure(['arena', mode, str(path)])
+            print(f"{mode:<11}{result['count']:>10}{result['ast_mb']:>10.1f}"
+                  f"{result['build_seconds']:>10.2f}{result['walk_seconds']:>10.2f}"
+                  f"{result['peak_rss_mb']:>14.1f}")
+
+
+def run_child(argv: list[str]) -> None:
+    bench, *rest = argv
+    if bench == 'mmap':
+        mode, stage, path = rest
+        result = run_mmap_child(mode, stage, Path(path))
+    elif bench == 'lexer':
+        engine, path = rest
+        result = run_lexer_child(engine, Path(path))
+    elif bench == 'parser':
+        path, lazy = rest
+        result = run_parser_child(Path(path), lazy == '1')
+    elif bench == 'lalr':
+        engine, path = rest
+        result = run_lalr_child(engine, Path(path))
+    elif bench == 'parallel':
+        workers, path = rest
+        result = run_parallel_child(int(workers), Path(path))
+    elif bench == 'arena':
+        mode, path = rest
+        result = run_arena_child(mode, Path(path))
+    elif bench == 'analysis':
+        mode, path = rest
+        result = run_analysis_child(mode, Path(path))
+    elif bench == 'passes':
+        name, path = rest
+        result = run_passes_child(name, Path(path))
+    elif bench == 'init':
+        mode, path = rest
+        result = run_init_child(mode, Path(path))
+    elif bench == 'ir':
+        mode, path = rest
+        result = run_ir_child(mode, Path(path))
+    elif bench == 'stream':
+        mode, path, output = rest
+        result = run_stream_child(mode, Path(path), Path(output))
+    elif bench == 'ssa':
+        path, = rest
+        result = run_ssa_child(Path(path))
+    elif bench == 'steps':
+        step_tokens, path = rest
+        result = run_steps_child(int(step_tokens), Path(path))
+    else:
+        raise ValueError(f"Unknown benchmark '{bench}'")
+    print(json.dumps(result))
+
+
+def create_arguments() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Compiler benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    mmap_parser = sub.add_parser(
+        'mmap', help='Peak RSS and throughput of mmap input against read_text')
+    mmap_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=16,
+        help='Size of the generated input in megabytes',
+    )
+    mmap_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    mmap_parser.add_argument(
+        '--stage',
+        choices=('lex', 'parse'),
+        default='lex',
+        help='Stop after lexing or after parsing',
+    )
+    mmap_parser.set_defaults(func=bench_mmap)
+
+    lexer_parser = sub.add_parser(
+        'lexer', help='Throughput of the dfa and numpy lexer engines against the regex engine')
+    lexer_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=16,
+        help='Size of the generated input in megabytes',
+    )
+    lexer_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    lexer_parser.set_defaults(func=bench_lexer)
+
+    parser_parser = sub.add_parser(
+        'parser', help='Parse throughput over a large generated program')
+    parser_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=8,
+        help='Size of the generated input in megabytes',
+    )
+    parser_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    parser_parser.add_argument(
+        '--runs',
+        type=int,
+        default=3,
+        help='Number of measurements',
+    )
+    parser_parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Skip function bodies and only parse the top level',
+    )
+    parser_parser.set_defaults(func=bench_parser)
+
+    lalr_parser = sub.add_parser(
+        'lalr', help='Parse throughput of the LALR(1) parser against the hand written parser')
+    lalr_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=8,
+        help='Size of the generated input in megabytes',
+    )
+    lalr_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    lalr_parser.add_argument(
+        '--runs',
+        type=int,
+        default=3,
+        help='Number of measurements of each parser',
+    )
+    lalr_parser.set_defaults(func=bench_lalr)
+
+    parallel_parser = sub.add_parser(
+        'parallel', help='Wall clock speedup of parse_parallel by worker count')
+    parallel_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=8,
+        help='Size of the generated input in megabytes',
+    )
+    parallel_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    parallel_parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)],
+        help='Worker counts to measure, powers of two up to the core count by default',
+    )
+    parallel_parser.set_defaults(func=bench_parallel)
+
+    arena_parser = sub.add_parser(
+        'arena', help='AST size and traversal time of the arena AST against dataclasses')
+    arena_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=6,
+        help='Size of the generated input in megabytes, 6 MB is about 1M nodes',
+    )
+    arena_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    arena_parser.set_defaults(func=bench_arena)
+
+    steps_parser = sub.add_parser(
+        'steps', help='Event loop stalls while parse_async runs next to other tasks')
+    steps_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=4,
+        help='Size of the generated input in megabytes',
+    )
+    steps_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    steps_parser.add_argument(
+        '--step-tokens',
+        type=int,
+        nargs='+',
+        default=[1024, 4096, 16384],
+        help='Step sizes to measure, each is compared against a plain parse()',
+    )
+    steps_parser.set_defaults(func=bench_steps)
+
+    analysis_parser = sub.add_parser(
+        'analysis', help='Symbol table and semantic checks in one fused walk against four passes')
+    analysis_parser.add_argument(
+        '--functions',
+        type=int,
+        default=20,
+        help='Number of generated functions',
+    )
+    analysis_parser.add_argument(
+        '--statements',
+        type=int,
+        default=2000,
+        help='Repetitions of the statement template in each function',
+    )
+    analysis_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    analysis_parser.add_argument(
+        '--runs',
+        type=int,
+        default=3,
+        help='Number of measurements of each analysis',
+    )
+    analysis_parser.set_defaults(func=bench_analysis)
+
+    passes_parser = sub.add_parser(
+        'passes', help='Time of each AST pass over a large program and a deeply nested one')
+    passes_parser.add_argument(
+        '--size-mb',
+        type=int,
+        default=1,
+        help='Size of the generated input in megabytes',
+    )
+    passes_parser.add_argument(
+        '--input',
+        type=Path,
+        help='Benchmark an existing file instead of a generated one',
+    )
+    passes_parser.add_argument(
+        '--depth',
+        type=int,
+        default=2000,
+        help='Nesting depth of the deep program, past the recursion limit',
+    )
+    passes_parser.set_defaults(func=bench_passes)
+
+    init_parser = sub.add_parser(
+        'init', help='Initialization check on the AST against the dataflow check on the TAC')
+    init_parser.add_argument(
+        '--functions',
+        type=int,
+        default=4,
+        help='Number of generated functions',
+    )
+    init_parser.add_argument(
+        '--statements',
+        type=int,
+        nargs='+',
+        default=[500, 1000, 2000, 4000],
+        help='Repetitions of the statement template in each function, one measurement each',
+    )
+    init_parser.set_defaults(func=bench_init)
+
+    ir_parser = sub.add_parser(
+        'ir', help='Bytes per instruction of each TAC representation and time of the -o1 passes')
+    ir_parser.add_argument(
+        '--functions',
+        type=int,
+        default=1,
+        help='Number of generated functions',
+    )
+    ir_parser.add_argument(
+        '--statements',
+        type=int,
+        nargs='+',
+        default=[250, 500, 1000],
+        help='Repetitions of the statement template in each function, one measurement each',
+    )
+    ir_parser.set_defaults(func=bench_ir)
+
+    stream_parser = sub.add_parser(
+        'stream', help='Time and peak RSS of -o1 compiling a unit at a time against the whole program')
+    stream_parser.add_argument(
+        '--functions',
+        type=int,
+        nargs='+',
+        default=[16, 32, 64],
+        help='Numbers of generated functions, one measurement each',
+    )
+    stream_parser.add_argument(
+        '--statements',
+        type=int,
+        default=20,
+        help='Repetitions of the statement template in each function',
+    )
+    stream_parser.set_defaults(func=bench_stream)
+
+    ssa_parser = sub.add_parser(
+        'ssa', help='Time of building and leaving SSA form for every function')
+    ssa_parser.add_argument(
+        '--functions',
+        type=int,
+        default=4,
+        help='Number of generated functions',
+    )
+    ssa_parser.add_argument(
+        '--statements',
+        type=int,
+        nargs='+',
+        default=[500, 1000, 2000, 4000],
+        help='Repetitions of the statement template in each function, one measurement each',
+    )
+    ssa_parser.set_defaults(func=bench_ssa)
+    return parser
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2:])
+    else:
+        args = create_arguments().parse_args()
+        args.func(args)
@@ -1,6 +1,5 @@
 import argparse
 import sys
-import copy
 from pathlib import Path
 from src import (
     LexerError,
@@ -10,18 +9,20 @@ from src import (
     TACError,
     ASMError,
     Tokenizer,
+    MappedTokenizer,
     Parser,
+    LALRParser,
     SymbolTable,
     TAC,
-    SemanticAnalyzer,
+    FusedAnalyzer,
+    check_initialization,
     pretty_ast,
-    constant_fold,
-    copy_and_constant_propagation,
-    dead_code_elimination,
-    tac_equals,
+    fold_ast_constants,
+    optimize_tac,
     pretty_tac,
     register_optimization,
     tac_to_asm,
+    StreamingCompiler,
 )
 
 
@@ -75,52 +76,89 @@ def create_arguments() -> argparse.ArgumentParser:
         action='store_true',
         help='Generate Assembly',
     )
+    parser.add_argument(
+        '-mmap',
+        required=False,
+        action='store_true',
+        help='Lex the input through a memory map instead of reading it into memory',
+    )
+    parser.add_argument(
+        '--parser',
+        required=False,
+        choices=('descent', 'lalr'),
+        default='descent',
+        help='Hand written parser or the LALR(1) parser generated from grammar.txt. Defaults to descent',
+    )
+    parser.add_argument(
+        '--init-check',
+        required=False,
+        choices=('ast', 'cfg'),
+        default='ast',
+        help='Check that variables are initialized before use by scope on the AST, '
+             'or along every path of the TAC control flow graph. Defaults to ast',
+    )
+    parser.add_argument(
+        '--stream',
+        required=False,
+        action='store_true',
+        help='Compile and write one function at a time, holding one function in memory. '
+             '-o1 optimizes without printing the TAC, -l -a -t and -o0 are not available',
+    )
     return parser
 
 
-def run_compiler(input_path: Path, output_path: Path, print_outputs: list) -> None:
+def run_compiler(input_path: Path, output_path: Path, print_outputs: list, use_mmap: bool = False,
+                 parser_kind: str = 'descent', init_check: str = 'ast') -> None:
 
     try:
-        source = input_path.read_text()
+        if use_mmap:
+            tokenizer = MappedTokenizer(input_path)
+        else:
+            tokenizer = Tokenizer(input_path.read_text())
     except FileNotFoundError:
         print(f'Input File Not Found: {input_path}')
         sys.exit(1)
 
-    try:
-        tokenizer = Tokenizer(source)
-        token_list = tokenizer.tokenize()
-    except LexerError as err:
-        print(f'Lexer error: {err}')
-        sys.exit(1)
+    # Tokens are lexed lazily as the parser consumes them
+    tokens = tokenizer.iter_tokens()
 
     if print_outputs[0]:
+        try:
+            tokens = list(tokens)
+        except LexerError as err:
+            print(f'Lexer error: {err}')
+            sys.exit(1)
         print('Token List: \n\n')
-        for token in token_list:
+        for token in tokens:
             print(token)
         print('\n\n')
 
     try:
-        parser = Parser(token_list)
+        parser = LALRParser(tokens) if parser_kind == 'lalr' else Parser(tokens)
         ast = parser.parse()
+    except LexerError as err:
+        print(f'Lexer error: {err}')
+        sys.exit(1)
     except ParserError as err:
         print(f'Parser error: {err}')
         sys.exit(1)
 
+    # Tokens hold their own decoded values, the mapping is not needed after parsing
+    if use_mmap:
+        tokenizer.close()
+
     if print_outputs[1]:
         print('AST:\n')
         print(pretty_ast(ast))
         print('\n')
 
+    # The symbol table is built in the same walk as the semantic checks
     try:
         sym_table = SymbolTable()
-        sym_table.build_symbol_table(ast)
+        FusedAnalyzer(ast, sym_table, check_uninitialized=init_check == 'ast').analyze()
     except SymbolTableError as err:
         print(f'Symbol Table error: {err}')
         sys.exit(1)
-
-    try:
-        analyzer = SemanticAnalyzer(ast, sym_table)
-        analyzer.analyze()
     except SemanticError as err:
         print(f'Semantic error: {err}')
         sys.exit(1)
@@ -128,31 +166,36 @@ def run_compiler(input_path: Path, output_path: Path, print_outputs: list) -> No
     if print_outputs[2]:
         print(f'Symbol Table\n\n{sym_table.dump()}\n\n')
 
+    # -o0 prints the TAC of the program as written. -o1 folds literal
+    # subtrees and shares repeated subexpressions while the TAC is built, so
+    # the optimizer starts from fewer temporaries, whether or not -o0 is
+    # printed too. Folding rewrites the AST, so the unoptimized TAC is
+    # generated first
+    optimize = print_outputs[4]
     try:
-        tac = TAC()
-        tac.generate_tac(ast, sym_table)
+        tac = None
+        if print_outputs[3] or not optimize:
+            tac = TAC()
+            tac.generate_tac(ast, sym_table)
+        if optimize:
+            fold_ast_constants(ast)
+            optimized = TAC(value_numbering=True)
+            optimized.generate_tac(ast, sym_table)
     except TACError as err:
         print(f"Three Address Code error: {err}")
         sys.exit(1)
 
+    if init_check == 'cfg':
+        try:
+            check_initialization(tac if tac is not None else optimized)
+        except SemanticError as err:
+            print(f'Semantic error: {err}')
+            sys.exit(1)
+
     used_tac = tac
-    if print_outputs[4]:
+    if optimize:
         try:
-            pre_optimized = tac
-            post_optimized = copy.deepcopy(pre_optimized)
-            while (True):
-                constant_fold(post_optimized)
-                copy_and_constant_propagation(post_optimized)
-                dead_code_elimination(post_optimized)
-                # print("\nPre OP")
-                # print(pretty_tac(pre_optimized))
-                # print("\nPost OP")
-                # print(pretty_tac(post_optimized))
-                if (tac_equals(pre_optimized, post_optimized, include_meta=True)):
-                    break
-                else:
-                    pre_optimized = copy.deepcopy(post_optimized)
-            used_tac = post_optimized
+            used_tac = optimize_tac(optimized)
         except TACError as err:
             print(f"Three Address Code error: {err}")
             sys.exit(1)
@@ -187,6 +230,55 @@ def run_compiler(input_path: Path, output_path: Path, print_outputs: list) -> No
         sys.exit(1)
 
 
+def run_streaming_compiler(input_path: Path, output_path: Path, optimize: bool, print_asm: bool,
+                           use_mmap: bool = False, init_check: str = 'ast') -> None:
+    """Compiles like run_compiler one translation unit at a time, see src/streaming.py"""
+    try:
+        if use_mmap:
+            tokenizer = MappedTokenizer(input_path)
+        else:
+            tokenizer = Tokenizer(input_path.read_text())
+    except FileNotFoundError:
+        print(f'Input File Not Found: {input_path}')
+        sys.exit(1)
+
+    units = Parser(tokenizer.iter_tokens()).iter_units()
+    compiler = StreamingCompiler(optimize, init_check)
+    try:
+        file = open(output_path, 'w')
+    except OSError as err:
+        print(err)
+        sys.exit(1)
+    error = None
+    with file:
+        try:
+            for line in compiler.compile(units):
+                file.write(f"{line}\n")
+                if print_asm:
+                    print(line)
+        except LexerError as err:
+            error = f'Lexer error: {err}'
+        except ParserError as err:
+            error = f'Parser error: {err}'
+        except SymbolTableError as err:
+            error = f'Symbol Table error: {err}'
+        except SemanticError as err:
+            error = f'Semantic error: {err}'
+        except TACError as err:
+            error = f"Three Address Code error: {err}"
+        except ASMError as err:
+            error = f'Error in Generating ASM: {err}'
+        except OSError as err:
+            error = str(err)
+    if use_mmap:
+        tokenizer.close()
+    if error is not None:
+        # No partial assembly is left behind
+        output_path.unlink(missing_ok=True)
+        print(error)
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     parser = create_arguments()
     args = parser.parse_args()
@@ -196,4 +288,9 @@ if __name__ == '__main__':
         Path.cwd() / args.write) if args.write else (Path.cwd() / 'output.txt')
     input_path = Path.cwd() / args.input
 
-    run_compiler(input_path, output_path, print_outputs)
+    if args.stream:
+        if args.l or args.a or args.t or args.o0 or args.parser != 'descent':
+            parser.error('--stream can not be combined with -l, -a, -t, -o0 or --parser lalr')
+        run_streaming_compiler(input_path, output_path, args.o1, args.asm, args.mmap, args.init_check)
+    else:
+        run_compiler(input_path, output_path, print_outputs, args.mmap, args.parser, args.init_check)
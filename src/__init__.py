@@ -1,15 +1,25 @@
 from .lexer import *
 from .parser import *
+from .ast_arena import *
+from .visitor import *
+from .lalr import *
 from .tokens import *
+from .interning import *
 from .symbol_table import *
 from .errors import *
 from .tac import *
 from .tac_diff import *
+from .ir import *
 from .print_structures import *
 from .asm import *
 from .optimizations.constant_fold import *
+from .optimizations.ast_constant_fold import *
 from .optimizations.copy_and_constant_propagation import *
 from .optimizations.dead_code_elimination import *
 from .optimizations.cfg import *
+from .optimizations.definite_initialization import *
 from .optimizations.register_optimization import *
+from .optimizations.optimize import *
+from .optimizations.ssa import *
+from .streaming import *
 from src.semantic_analyzer import *
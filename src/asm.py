@@ -1,6 +1,7 @@
 from src.tac import TAC, Instruction
-from src.tokens import Token, SYMBOLS
+from src.tokens import Token, TokenKind, SYMBOL_TEXT
 from src.errors import ASMError
+from src.interning import NameTable
 """
 Windows X86 ASM
 
@@ -26,11 +27,15 @@ class RegAllocator:
     """Handles variable to register allocation
     """
 
-    def __init__(self, reg_map: dict[str, int]):
+    def __init__(self, reg_map: list[int], names: NameTable):
+        # Locations are looked up by name, the instructions hold names
         self.reg_map = dict()
         self.max_reg = len(REGISTERS) - 1  # 0 indexed
         self.offset = 8
-        for var, reg_num in reg_map.items():
+        for var_id, reg_num in enumerate(reg_map):
+            if (reg_num < 0):
+                continue
+            var = names.name_of(var_id)
             if (reg_num > self.max_reg):
                 self.reg_map[var] = f"[rbp - {self.offset}]"
                 self.offset += 8
@@ -45,9 +50,9 @@ class RegAllocator:
 
     def get_loc(self, token: Token) -> str:
         """Gets register of token if variable, returns number if number"""
-        if token.type == 'NUMBER':
+        if token.kind == TokenKind.NUMBER:
             return token.value
-        elif token.type == 'IDENTIFIER':
+        elif token.kind == TokenKind.IDENTIFIER:
             loc = self.reg_map.get(token.value)
             if (loc is None):
                 raise ASMError(
@@ -69,17 +74,17 @@ class RegAllocator:
         return size
 
 
-def tac_to_asm(tac: TAC, reg_map: dict[str, int]) -> list[str]:
+def tac_to_asm(tac: TAC, reg_map: list[int]) -> list[str]:
     """Takes in a Three Adress Code and creates Assembly
 
     Args:
         tac (TAC): Three Adress Code generated by tac.py
-        reg_map (dict[str, int]): register mapping generated by register_optimization.py
+        reg_map (list[int]): register of each name ID generated by register_optimization.py
 
     Returns:
         str: a list of strings that represents x84 Assembly for Windows X86
     """
-    reg_alloc = RegAllocator(reg_map)
+    reg_alloc = RegAllocator(reg_map, tac.names)
     asm = []
     func_list = tac.functions
     params = [param
@@ -196,6 +201,24 @@ def assign_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator) ->
         binary_instr(instr, asm, reg_alloc)
 
 
+# Two operand instructions, store = left <op> right
+_ARITHMETIC_OPS = {
+    TokenKind.PLUS: 'add',
+    TokenKind.MINUS: 'sub',
+    TokenKind.MULTIPLY: 'imul',
+}
+
+# Comparisons, store = flag set by cmp left, right
+_COMPARE_OPS = {
+    TokenKind.LESSTHAN: 'setl',
+    TokenKind.GREATERTHAN: 'setg',
+    TokenKind.EQUAL: 'sete',
+    TokenKind.NOTEQUAL: 'setne',
+    TokenKind.LESSTHANEQUAL: 'setle',
+    TokenKind.GREATERTHANEQUAL: 'setge',
+}
+
+
 def binary_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator):
     """Handles all binary operations"""
     assert isinstance(instr.res, Token)
@@ -206,13 +229,8 @@ def binary_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator):
     store_reg = reg_alloc.get_loc(instr.res)
     left_reg = reg_alloc.get_loc(instr.left)
     right_reg_temp = reg_alloc.get_loc(instr.right)
-    op_type = instr.op.type
-    op_symbol = None
-    # Find Symbol Name
-    for key, value in SYMBOLS.items():
-        if (value == instr.op.type):
-            op_symbol = key
-            break
+    op_kind = instr.op.kind
+    op_symbol = SYMBOL_TEXT[op_kind]
     # Operation hint
     asm.append(
         f"\t; {instr.res.value}"
@@ -232,19 +250,11 @@ def binary_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator):
     else:
         right_reg = right_reg_temp
 
-    if op_type == 'PLUS':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tadd {store_reg}, {right_reg}")
-
-    elif op_type == 'MINUS':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tsub {store_reg}, {right_reg}")
-
-    elif op_type == 'MULTIPLY':
+    if op_kind in _ARITHMETIC_OPS:
         asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\timul {store_reg}, {right_reg}")
+        asm.append(f"\t{_ARITHMETIC_OPS[op_kind]} {store_reg}, {right_reg}")
 
-    elif op_type == 'DIVIDE':
+    elif op_kind == TokenKind.DIVIDE:
         # Use rax for division
         asm.append(f"\tmov rax, {left_reg}")
         asm.append(f"\tcqo")
@@ -256,7 +266,7 @@ def binary_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator):
             asm.append(f"\tidiv {right_reg}")
         asm.append(f"\tmov {store_reg}, rax")
 
-    elif op_type == 'MODULUS':
+    elif op_kind == TokenKind.MODULUS:
         # Use rax for division
         asm.append(f"\tmov rax, {left_reg}")
         asm.append(f"\tcqo")
@@ -269,52 +279,22 @@ def binary_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator):
         # rdx for remainder
         asm.append(f"\tmov {store_reg}, rdx")
 
-    elif op_type == 'LESSTHAN':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsetl al")
-        asm.append(f"\tmovzx {store_reg}, al")
-
-    elif op_type == 'GREATERTHAN':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsetg al")
-        asm.append(f"\tmovzx {store_reg}, al")
-
-    elif op_type == 'EQUAL':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsete al")
-        asm.append(f"\tmovzx {store_reg}, al")
-
-    elif op_type == 'NOTEQUAL':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsetne al")
-        asm.append(f"\tmovzx {store_reg}, al")
-
-    elif op_type == 'LESSTHANEQUAL':
-        asm.append(f"\tmov {store_reg}, {left_reg}")
-        asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsetle al")
-        asm.append(f"\tmovzx {store_reg}, al")
-
-    elif op_type == 'GREATERTHANEQUAL':
+    elif op_kind in _COMPARE_OPS:
         asm.append(f"\tmov {store_reg}, {left_reg}")
         asm.append(f"\tcmp {store_reg}, {right_reg}")
-        asm.append(f"\tsetge al")
+        asm.append(f"\t{_COMPARE_OPS[op_kind]} al")
         asm.append(f"\tmovzx {store_reg}, al")
 
-    elif op_type == 'INCREMENT':
+    elif op_kind == TokenKind.INCREMENT:
         asm.append(f"\tmov {store_reg}, {left_reg}")
         asm.append(f"\tinc {store_reg}")
 
-    elif op_type == 'DECREMENT':
+    elif op_kind == TokenKind.DECREMENT:
         asm.append(f"\tmov {store_reg}, {left_reg}")
         asm.append(f"\tdec {store_reg}")
 
     else:
-        asm.append(f"\t; UNIMPLEMENTED OPERATION: {op_type}")
+        asm.append(f"\t; UNIMPLEMENTED OPERATION: {instr.op.type}")
 
 
 def conditional_instr(instr: Instruction, asm: list[str], reg_alloc: RegAllocator) -> None:
@@ -0,0 +1,301 @@
+import dataclasses
+from array import array
+from enum import IntEnum
+from operator import attrgetter
+from typing import Any, Iterator, Optional, Sequence
+from src import ast_nodes
+from src.ast_nodes import Program
+from src.tokens import Token
+
+"""
+Flat arena representation of the AST
+
+Every node lives in a set of parallel arrays instead of being its own object:
+    kinds        NodeKind of the node
+    token        index into Arena.tokens of the node's token, -1 if it has none
+    child_start  node i's field slots are children[child_start[i]:child_start[i + 1]]
+    children     one slot per dataclass field
+A slot holds the index of a child node, NONE_SLOT for a missing field or
+OWN_TOKEN_SLOT for the node's own token. Fields holding lists become LIST nodes, and tokens
+that are not a node's own token become TOKEN nodes.
+
+Nodes are stored children first, so a child's index is always below its
+parent's and the root is the last node. Cursor wraps an index and reads like
+the dataclass it stands for, including isinstance checks, so the symbol table,
+semantic analyzer and TAC generator can walk an arena unchanged.
+"""
+
+
+# Every AST dataclass, a node's NodeKind is its index
+NODE_TYPES = tuple(
+    value for value in vars(ast_nodes).values()
+    if dataclasses.is_dataclass(value) and value.__module__ == ast_nodes.__name__
+)
+NodeKind = IntEnum(
+    'NodeKind',
+    (*(node_type.__name__ for node_type in NODE_TYPES), 'LIST', 'TOKEN'),
+    start=0,
+    module=__name__,
+)
+NODE_KINDS = tuple(NodeKind)
+NODE_KIND_BY_TYPE = {node_type: NODE_KINDS[i] for i, node_type in enumerate(NODE_TYPES)}
+# Field names of each node kind in declaration order, empty for LIST and TOKEN
+NODE_FIELDS = tuple(
+    tuple(f.name for f in dataclasses.fields(node_type)) for node_type in NODE_TYPES
+) + ((), ())
+_FIELD_SLOTS = tuple({name: slot for slot, name in enumerate(names)} for names in NODE_FIELDS)
+
+
+def _field_getter(names: tuple[str, ...]):
+    # Reads every field of a node into a tuple in one call
+    if len(names) > 1:
+        return attrgetter(*names)
+    if names:
+        name, = names
+        return lambda node: (getattr(node, name),)
+    return lambda node: ()
+
+
+_FIELD_GETTERS = tuple(_field_getter(names) for names in NODE_FIELDS)
+
+NONE_SLOT = -1
+OWN_TOKEN_SLOT = -2
+
+
+def _subclass_kind(node_type: type) -> NodeKind:
+    # Subclasses such as LazyFunctionDefinition are stored as the dataclass
+    # they extend, and come back as that dataclass from to_ast
+    for base in node_type.__mro__:
+        if base in NODE_KIND_BY_TYPE:
+            NODE_KIND_BY_TYPE[node_type] = NODE_KIND_BY_TYPE[base]
+            return NODE_KIND_BY_TYPE[base]
+    raise TypeError(f"{node_type.__name__} is not an AST node")
+
+
+class Arena:
+    """An AST stored as parallel arrays, see the module docstring for the layout"""
+    __slots__ = ('kinds', 'token', 'child_start', 'children', 'tokens', '_token_index')
+
+    def __init__(self, tokens: Optional[Sequence[Token]] = None):
+        self.kinds = array('B')
+        self.token = array('i')
+        self.child_start = array('i', [0])
+        self.children = array('i')
+        self.tokens: list[Token] = list(tokens) if tokens is not None else []
+        # id of each token to its index in tokens, built by from_ast
+        self._token_index: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @classmethod
+    def from_arrays(cls, kinds: array, token: array, child_start: array, children: array,
+                    tokens: Sequence[Token]) -> 'Arena':
+        """Rebuilds an arena from its arrays, such as ones sent from another process"""
+        arena = cls(tokens)
+        arena.kinds = kinds
+        arena.token = token
+        arena.child_start = child_start
+        arena.children = children
+        return arena
+
+    @property
+    def root(self) -> 'Cursor':
+        return Cursor(self, len(self.kinds) - 1)
+
+    def nbytes(self) -> int:
+        """Size of the node arrays, not counting the tokens they index"""
+        return sum(a.itemsize * len(a)
+                   for a in (self.kinds, self.token, self.child_start, self.children))
+
+    def slots(self, index: int) -> array:
+        return self.children[self.child_start[index]:self.child_start[index + 1]]
+
+    def value(self, index: int, slot: int) -> Any:
+        """Decodes a slot of node index into a Cursor, Token, list or None"""
+        if slot >= 0:
+            kind = self.kinds[slot]
+            if kind == NodeKind.LIST:
+                return [self.value(slot, item) for item in self.slots(slot)]
+            if kind == NodeKind.TOKEN:
+                return self.tokens[self.token[slot]]
+            return Cursor(self, slot)
+        if slot == OWN_TOKEN_SLOT:
+            return self.tokens[self.token[index]]
+        return None
+
+    def walk(self, index: Optional[int] = None) -> Iterator[int]:
+        """Indices of the nodes under index in pre-order, LIST and TOKEN nodes included"""
+        kinds = self.kinds
+        children = self.children
+        child_start = self.child_start
+        stack = [len(kinds) - 1 if index is None else index]
+        while stack:
+            index = stack.pop()
+            yield index
+            for slot in reversed(children[child_start[index]:child_start[index + 1]]):
+                if slot >= 0:
+                    stack.append(slot)
+
+    @classmethod
+    def from_ast(cls, program: Program, tokens: Optional[Sequence[Token]] = None) -> 'Arena':
+        """Flattens a dataclass AST
+
+        When tokens is the token list the program was parsed from, node tokens
+        index into it, otherwise tokens are collected in the order they appear
+        """
+        arena = cls(tokens)
+        arena._token_index = {id(tok): i for i, tok in enumerate(arena.tokens)}
+        kinds = arena.kinds
+        node_token = arena.token
+        child_start = arena.child_start
+        children = arena.children
+        token_list = arena.tokens
+        token_index = arena._token_index
+
+        def token_of(tok: Token) -> int:
+            index = token_index.get(id(tok))
+            if index is None:
+                index = token_index[id(tok)] = len(token_list)
+                token_list.append(tok)
+            return index
+
+        # A node's field values are read and its token and None fields
+        # encoded when it is first popped. Nodes without child nodes are
+        # finished there, the others are pushed back with their slots and the
+        # positions of the child slots still to fill, which their indices on
+        # top of results fill once the children are finished
+        stack: list[tuple] = [(program, None, None, 0, 0)]
+        results: list[int] = []
+        list_kind = NodeKind.LIST
+        token_kind = NodeKind.TOKEN
+        while stack:
+            node, slots, holes, own, kind = stack.pop()
+            if slots is None:
+                if type(node) is list:
+                    kind = list_kind
+                    values = node
+                else:
+                    kind = NODE_KIND_BY_TYPE.get(type(node))
+                    if kind is None:
+                        kind = _subclass_kind(type(node))
+                    values = _FIELD_GETTERS[kind](node)
+                slots = []
+                holes = []
+                pending = []
+                own = NONE_SLOT
+                for value in values:
+                    if value is None:
+                        slots.append(NONE_SLOT)
+                    elif type(value) is Token:
+                        # The first token of a node is its own, LIST nodes have none
+                        if own == NONE_SLOT and kind != list_kind:
+                            own = token_of(value)
+                            slots.append(OWN_TOKEN_SLOT)
+                        else:
+                            slots.append(len(kinds))
+                            kinds.append(token_kind)
+                            node_token.append(token_of(value))
+                            child_start.append(len(children))
+                    else:
+                        holes.append(len(slots))
+                        slots.append(NONE_SLOT)
+                        pending.append(value)
+                if pending:
+                    stack.append((node, slots, holes, own, kind))
+                    stack.extend([(value, None, None, 0, 0) for value in reversed(pending)])
+                    continue
+            else:
+                count = len(holes)
+                for hole, index in zip(holes, results[len(results) - count:]):
+                    slots[hole] = index
+                del results[len(results) - count:]
+            results.append(len(kinds))
+            kinds.append(kind)
+            node_token.append(own)
+            children.extend(slots)
+            child_start.append(len(children))
+        return arena
+
+    def to_ast(self) -> Program:
+        """Rebuilds the dataclass AST, sharing this arena's Token objects"""
+        kinds = self.kinds
+        token = self.token
+        tokens = self.tokens
+        child_start = self.child_start
+        # built[0] is the current node's own token and built[1] None, so with
+        # every slot shifted by 2 a node's field values are built[slot] for
+        # each of its slots. Children come before their parents, so one pass
+        # in index order always finds a node's children already built
+        built: list[Any] = [None, None]
+        shifted = array('i', [slot + 2 for slot in self.children])
+        lookup = built.__getitem__
+        list_kind = NodeKind.LIST
+        token_kind = NodeKind.TOKEN
+        for index in range(len(kinds)):
+            kind = kinds[index]
+            own = token[index]
+            if own != NONE_SLOT:
+                built[0] = tokens[own]
+                if kind == token_kind:
+                    built.append(built[0])
+                    continue
+            values = map(lookup, shifted[child_start[index]:child_start[index + 1]])
+            if kind == list_kind:
+                built.append(list(values))
+            else:
+                built.append(NODE_TYPES[kind](*values))
+        return built[-1]
+
+
+class Cursor:
+    """A node of an Arena that reads like its dataclass
+
+    Fields are read by name, node.left or node.func_body.items, and
+    isinstance(node, BinaryExpression) holds for a BinaryExpression node.
+    Lists are rebuilt on every access, keep a reference when reading one
+    repeatedly.
+    """
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena: Arena, index: int):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def kind(self) -> NodeKind:
+        return NODE_KINDS[self.arena.kinds[self.index]]
+
+    @property
+    def token(self) -> Optional[Token]:
+        # A field named token shadows this, both hold the node's own token
+        token = self.arena.token[self.index]
+        return self.arena.tokens[token] if token != NONE_SLOT else None
+
+    @property
+    def children(self) -> list[Any]:
+        """Decoded field values in declaration order"""
+        arena = self.arena
+        return [arena.value(self.index, slot) for slot in arena.slots(self.index)]
+
+    @property
+    def __class__(self):
+        return NODE_TYPES[self.arena.kinds[self.index]]
+
+    def __getattr__(self, name: str) -> Any:
+        arena = self.arena
+        index = self.index
+        slot = _FIELD_SLOTS[arena.kinds[index]].get(name)
+        if slot is None:
+            raise AttributeError(f"{NODE_KINDS[arena.kinds[index]].name} has no field '{name}'")
+        return arena.value(index, arena.children[arena.child_start[index] + slot])
+
+    def __eq__(self, other) -> bool:
+        return (type(other) is Cursor
+                and other.arena is self.arena and other.index == self.index)
+
+    def __hash__(self) -> int:
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self) -> str:
+        return f'Cursor({self.kind.name} #{self.index})'
@@ -1,16 +1,21 @@
 from src.tokens import Token
-from typing import Optional
+from typing import Optional, Sequence
 
 
 class CompilerError(Exception):
     """Base class for all compiler errors"""
 
-    def __init__(self, message: str, token: Optional[Token] = None, source_lines: Optional[list[str]] = None):
+    def __init__(self, message: str, token: Optional[Token] = None, source_lines: Optional[Sequence[str]] = None):
         self.message = message
         self.token = token
         self.source_lines = source_lines
         super().__init__(self.__str__())
 
+    # Exceptions pickle their args, which would lose the token. Source lines
+    # are left behind, the receiving side can attach its own
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.token))
+
     def __str__(self) -> str:
         if self.token is None or not hasattr(self.token, 'line_num'):
             return f"{self.__class__.__name__}: {self.message}"
@@ -58,3 +63,8 @@ class ASMError(CompilerError):
 class SemanticError(CompilerError):
     """Raised for semantic errors (type checking, undefined variables, etc.)"""
     pass
+
+
+class GrammarError(CompilerError):
+    """Raised when grammar.txt can not be turned into LALR(1) tables"""
+    pass
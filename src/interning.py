@@ -0,0 +1,33 @@
+"""
+Dense integer IDs for the names the IR refers to
+
+SymbolTable adds every function, parameter and variable name as it is
+declared and TAC adds the temps, incoming parameters and labels it makes,
+so every name in the TAC has an ID below len(table). Passes keep their
+per-name state in lists and bitsets indexed by ID instead of dicts and
+sets of strings, and turn IDs back into names only for output.
+"""
+
+
+class NameTable:
+    """Interns names, each new name gets the next ID"""
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """The ID of name, adding it if it is new"""
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def name_of(self, name_id: int) -> str:
+        return self.names[name_id]
@@ -0,0 +1,283 @@
+from array import array
+from enum import IntEnum
+from typing import Any, Optional
+from src.errors import TACError
+from src.interning import NameTable
+from src.tac import (
+    TAC, Instruction, BasicBlock, FunctionBlock,
+    LABEL_OP, GOTO_OP, IF_OP, FOR_OP, WHILE_OP, RETURN_OP, CALL_OP, PARAM_RES,
+)
+from src.tokens import Token, TokenKind, IDENTIFIER, NUMBER, PRECEDENCE, PREFIX_KINDS, SYMBOL_TEXT
+
+"""
+Compact representation of the TAC
+
+An IRInstruction holds an Opcode and three typed operands. The Opcode
+merges an Instruction's instr_type and op, ASSIGN becomes COPY when it has
+no operator and the operator's opcode when it has one. An operand is an
+int, index << 2 | OperandKind:
+    TEMP, VAR   index of the name in the TAC's NameTable
+    IMM         index of the literal's text in TAC.constants
+    LABEL       index of a label or function name in the NameTable
+and NO_OPERAND for an empty slot.
+
+IRArrays stores the same fields for a whole program in parallel arrays,
+for passes that go over every instruction in bulk, such as the
+optimizer's check that a round of passes changed nothing.
+"""
+
+
+# Instruction types that are not an ASSIGN, after COPY
+_STRUCTURAL = ('COPY', 'DECL', 'PARAM', 'CALL', 'LABEL', 'GOTO', 'IF', 'FOR', 'WHILE', 'RETURN')
+# Operators an ASSIGN can apply, infix operators and prefix operators
+_OPERATOR_KINDS = tuple(kind for kind in TokenKind
+                        if 2 <= PRECEDENCE[kind] <= 11 or kind in PREFIX_KINDS)
+
+Opcode = IntEnum(
+    'Opcode',
+    (*_STRUCTURAL, *(kind.name for kind in _OPERATOR_KINDS)),
+    start=0,
+    module=__name__,
+)
+FIRST_OPERATOR = Opcode[_OPERATOR_KINDS[0].name]
+
+_OPCODE_BY_TYPE = {name: Opcode[name] for name in _STRUCTURAL[1:]}
+# Opcode of each operator TokenKind, None for other kinds
+_OPCODE_BY_KIND: tuple[Optional[Opcode], ...] = tuple(
+    Opcode[kind.name] if kind in _OPERATOR_KINDS else None for kind in TokenKind)
+# op Token of each Opcode when it is turned back into an Instruction
+_OP_TOKENS: tuple[Optional[Token], ...] = (
+    None, None, None, CALL_OP, LABEL_OP, GOTO_OP, IF_OP, FOR_OP, WHILE_OP, RETURN_OP,
+    *(Token(kind, SYMBOL_TEXT[kind]) for kind in _OPERATOR_KINDS),
+)
+
+
+class OperandKind(IntEnum):
+    TEMP = 0
+    VAR = 1
+    IMM = 2
+    LABEL = 3
+
+
+NO_OPERAND = -1
+_TEMP = OperandKind.TEMP.value
+_VAR = OperandKind.VAR.value
+_IMM = OperandKind.IMM.value
+_LABEL = OperandKind.LABEL.value
+
+
+def operand_kind(operand: int) -> OperandKind:
+    return OperandKind(operand & 3)
+
+
+def operand_index(operand: int) -> int:
+    return operand >> 2
+
+
+class IRInstruction:
+    """An Instruction as an Opcode and typed operands, see the module docstring"""
+    __slots__ = ('opcode', 'res', 'left', 'right')
+
+    def __init__(self, opcode: Opcode, res: int = NO_OPERAND,
+                 left: int = NO_OPERAND, right: int = NO_OPERAND):
+        self.opcode = opcode
+        self.res = res
+        self.left = left
+        self.right = right
+
+
+class IRFunction:
+    __slots__ = ('name', 'params', 'blocks')
+
+    def __init__(self, name: int, params: list[int], blocks: list[list[IRInstruction]]):
+        # Name IDs of the function and of its incoming parameters
+        self.name = name
+        self.params = params
+        self.blocks = blocks
+
+
+class IRProgram:
+    __slots__ = ('names', 'constants', 'globals', 'functions')
+
+    def __init__(self, names: NameTable, constants: NameTable):
+        self.names = names
+        self.constants = constants
+        self.globals: list[IRInstruction] = []
+        self.functions: list[IRFunction] = []
+
+
+class _Encoder:
+    """Turns Instruction fields into an opcode and operand ints"""
+
+    def __init__(self, names: NameTable, constants: NameTable):
+        self.names = names
+        self.constants = constants
+
+    def opcode(self, instr: Instruction) -> Opcode:
+        if instr.instr_type == 'ASSIGN':
+            op = instr.op
+            if op is None:
+                return Opcode.COPY
+            opcode = _OPCODE_BY_KIND[op.kind]
+            if opcode is None:
+                raise TACError(f"Operator '{op.value}' has no opcode", op)
+            return opcode
+        opcode = _OPCODE_BY_TYPE.get(instr.instr_type)
+        if opcode is None:
+            raise TACError(f"Instruction type '{instr.instr_type}' has no opcode", None)
+        return opcode
+
+    def operand(self, value: Any) -> int:
+        if value is None:
+            return NO_OPERAND
+        if value.__class__ is str:
+            return self.names.intern(value) << 2 | _LABEL
+        if value.__class__ is Token:
+            kind = value.kind
+            if kind == TokenKind.IDENTIFIER:
+                name = value.value
+                return self.names.intern(name) << 2 | (_TEMP if name.startswith('%t') else _VAR)
+            if kind == TokenKind.NUMBER:
+                return self.constants.intern(value.value) << 2 | _IMM
+            if kind == TokenKind.PARAM:
+                # A PARAM's res is always PARAM_RES
+                return NO_OPERAND
+        raise TACError(f"Operand {value!r} can not be encoded", value if isinstance(value, Token) else None)
+
+    def instruction(self, instr: Instruction) -> IRInstruction:
+        operand = self.operand
+        return IRInstruction(self.opcode(instr), operand(instr.res),
+                             operand(instr.left), operand(instr.right))
+
+
+def to_ir(tac: TAC) -> IRProgram:
+    """The compact form of tac, which shares tac's NameTable"""
+    program = IRProgram(tac.names, tac.constants)
+    encode = _Encoder(tac.names, tac.constants).instruction
+    program.globals = [encode(instr) for instr in tac.globals]
+    for func in tac.functions:
+        program.functions.append(IRFunction(
+            tac.names.intern(func.name.value),
+            [tac.names.intern(param) for param in func.params],
+            [[encode(instr) for instr in block.instr_list] for block in func.blocks]))
+    return program
+
+
+def _decode_operand(operand: int, names: NameTable, constants: NameTable) -> Any:
+    if operand < 0:
+        return None
+    kind = operand & 3
+    index = operand >> 2
+    if kind == _IMM:
+        return Token(NUMBER, constants.names[index])
+    if kind == _LABEL:
+        return names.names[index]
+    return Token(IDENTIFIER, names.names[index])
+
+
+def _decode(instr: IRInstruction, names: NameTable, constants: NameTable) -> Instruction:
+    opcode = instr.opcode
+    instr_type = 'ASSIGN' if opcode == Opcode.COPY or opcode >= FIRST_OPERATOR else opcode.name
+    res = PARAM_RES if opcode == Opcode.PARAM else _decode_operand(instr.res, names, constants)
+    return Instruction(instr_type, res,
+                       _decode_operand(instr.left, names, constants),
+                       _decode_operand(instr.right, names, constants),
+                       _OP_TOKENS[opcode])
+
+
+def to_tac(program: IRProgram) -> TAC:
+    """Instructions back from program, without the source positions of their tokens"""
+    names, constants = program.names, program.constants
+    tac = TAC()
+    tac.names = names
+    tac.constants = constants
+    tac.globals = [_decode(instr, names, constants) for instr in program.globals]
+    for ir_func in program.functions:
+        func = FunctionBlock(Token(IDENTIFIER, names.name_of(ir_func.name)), [], None)
+        func.params = [names.name_of(param) for param in ir_func.params]
+        for ir_block in ir_func.blocks:
+            block = BasicBlock()
+            block.instr_list = [_decode(instr, names, constants) for instr in ir_block]
+            func.blocks.append(block)
+        tac.functions.append(func)
+    return tac
+
+
+class IRArrays:
+    """Every instruction of a program as parallel arrays
+
+    Instruction i is opcodes[i], res[i], left[i] and right[i]. Block b is
+    instructions block_starts[b] to block_starts[b + 1], block 0 holds the
+    globals and function f is blocks function_starts[f] to
+    function_starts[f + 1].
+    """
+    __slots__ = ('opcodes', 'res', 'left', 'right', 'block_starts', 'function_starts')
+
+    def __init__(self):
+        self.opcodes = array('B')
+        self.res = array('q')
+        self.left = array('q')
+        self.right = array('q')
+        self.block_starts = array('i', [0])
+        self.function_starts = array('i')
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, IRArrays):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in
+                   (getattr(self, name) for name in self.__slots__))
+
+    def instruction(self, index: int) -> IRInstruction:
+        return IRInstruction(Opcode(self.opcodes[index]), self.res[index],
+                             self.left[index], self.right[index])
+
+    @classmethod
+    def from_tac(cls, tac: TAC) -> 'IRArrays':
+        """Encodes tac directly, without making an IRInstruction for each instruction"""
+        arrays = cls()
+        encoder = _Encoder(tac.names, tac.constants)
+        opcode, operand = encoder.opcode, encoder.operand
+        opcodes, res, left, right = arrays.opcodes, arrays.res, arrays.left, arrays.right
+        block_starts = arrays.block_starts
+
+        def add_block(instr_list: list[Instruction]):
+            for instr in instr_list:
+                opcodes.append(opcode(instr))
+                res.append(operand(instr.res))
+                left.append(operand(instr.left))
+                right.append(operand(instr.right))
+            block_starts.append(len(opcodes))
+
+        add_block(tac.globals)
+        for func in tac.functions:
+            arrays.function_starts.append(len(block_starts) - 1)
+            for block in func.blocks:
+                add_block(block.instr_list)
+        arrays.function_starts.append(len(block_starts) - 1)
+        return arrays
+
+    @classmethod
+    def from_ir(cls, program: IRProgram) -> 'IRArrays':
+        arrays = cls()
+
+        def add_block(instrs: list[IRInstruction]):
+            for instr in instrs:
+                arrays.opcodes.append(instr.opcode)
+                arrays.res.append(instr.res)
+                arrays.left.append(instr.left)
+                arrays.right.append(instr.right)
+            arrays.block_starts.append(len(arrays.opcodes))
+
+        add_block(program.globals)
+        for func in program.functions:
+            arrays.function_starts.append(len(arrays.block_starts) - 1)
+            for block in func.blocks:
+                add_block(block)
+        arrays.function_starts.append(len(arrays.block_starts) - 1)
+        return arrays
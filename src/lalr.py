@@ -0,0 +1,699 @@
+import hashlib
+import pickle
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from src import ast_nodes
+from src.errors import GrammarError, ParserError
+from src.ast_nodes import Program
+from src.tokens import (
+    Token,
+    TokenKind,
+    TokenStream,
+    KIND_BY_TYPE,
+    KEYWORD_KINDS,
+    SYMBOL_KINDS,
+    SYMBOL_TEXT,
+    TOKEN_PREC,
+    ASSIGNMENT_KINDS,
+)
+
+"""
+LALR(1) parser generated from grammar.txt
+
+build_tables reads the grammar, expands its EBNF into plain productions and
+builds LALR(1) action and goto tables: LR(0) item sets, with lookaheads found
+by spontaneous generation and propagation between kernel items. Shift/reduce
+conflicts are settled by the %left, %right and %nonassoc declarations the
+way yacc does, and the ones left over must number exactly %expect.
+
+load_tables caches the tables on disk keyed by a hash of the grammar, so
+only the first run after grammar.txt changes pays for building them.
+LALRParser runs the tables with an explicit state stack, building the same
+AST as the hand written Parser from each production's => action.
+"""
+
+
+GRAMMAR_PATH = Path(__file__).resolve().parent.parent / 'grammar.txt'
+_CACHE_DIR = Path(__file__).resolve().parent / '__pycache__'
+
+# Terminals are TokenKind values, _END follows the last token and the
+# nonterminals are numbered after it
+_END = len(TokenKind)
+_FIRST_NONTERMINAL = _END + 1
+# Lookahead placeholder while finding which lookaheads propagate
+_PROPAGATE = -1
+_ACCEPT = '$accept'
+
+
+# ----------------------------------------------------------------------
+# Reading grammar.txt
+# ----------------------------------------------------------------------
+
+_GRAMMAR_TOKEN = re.compile(r'''
+    \s*(?:
+      (?P<nonterminal><\w+>)
+    | "(?P<text>[^"]+)"
+    | (?P<name>[A-Z_][A-Z0-9_]*)
+    | (?P<op>::=|[()|*+?])
+    | %prec\s+(?P<prec>\w+)
+    | =>(?P<action>.*)
+    )''', re.VERBOSE)
+_DIRECTIVE = re.compile(r'%(left|right|nonassoc|expect)\b(.*)')
+
+
+@dataclass(slots=True)
+class _Alternative:
+    # items are ('symbol', name) or ('group', alternatives), each with the
+    # repeat suffix that followed it
+    items: list
+    prec: Optional[str] = None
+    action: Optional[str] = None
+    line: int = 0
+
+
+@dataclass(slots=True)
+class Production:
+    """One BNF production, rhs holds symbol names"""
+    lhs: str
+    rhs: tuple[str, ...]
+    action: Optional[str]
+    prec: Optional[str]
+
+
+@dataclass(slots=True)
+class Grammar:
+    # The first rule's nonterminal, the whole program
+    start: str
+    productions: list[Production]
+    # Symbol name to (level, associativity), level 1 binds loosest
+    precedence: dict[str, tuple[int, str]]
+    expect: int
+
+
+def _terminal(text: str, line: int) -> str:
+    kind = KEYWORD_KINDS.get(text, SYMBOL_KINDS.get(text))
+    if kind is None:
+        raise GrammarError(f'grammar.txt line {line}: "{text}" is not a keyword or symbol')
+    return kind.name
+
+
+def _read_rules(text: str):
+    """Splits grammar.txt into directives and rules of EBNF alternatives"""
+    precedence: dict[str, tuple[int, str]] = {}
+    expect = 0
+    tokens: list[tuple[str, str, int]] = []
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        directive = _DIRECTIVE.match(stripped)
+        if directive:
+            kind, rest = directive.groups()
+            if kind == 'expect':
+                expect = int(rest)
+                continue
+            level = len({level for level, _ in precedence.values()}) + 1
+            for match in _GRAMMAR_TOKEN.finditer(rest):
+                if match['text']:
+                    precedence[_terminal(match['text'], number)] = (level, kind)
+                elif match['name']:
+                    precedence[match['name']] = (level, kind)
+            continue
+        pos = 0
+        while pos < len(line):
+            match = _GRAMMAR_TOKEN.match(line, pos)
+            if match is None or match.end() == pos:
+                if line[pos:].strip():
+                    raise GrammarError(f'grammar.txt line {number}: can not read "{line[pos:].strip()}"')
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            value = match[kind]
+            if kind == 'text':
+                kind, value = 'name', _terminal(value, number)
+            tokens.append((kind, value, number))
+    return tokens, precedence, expect
+
+
+class _RuleReader:
+    # Recursive descent over the few tokens of grammar.txt
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ('end', '', 0)
+
+    def _expect(self, kind: str, value: Optional[str] = None):
+        tok = self._peek()
+        if tok[0] != kind or (value is not None and tok[1] != value):
+            raise GrammarError(f'grammar.txt line {tok[2]}: expected {value or kind}, found "{tok[1]}"')
+        self.pos += 1
+        return tok
+
+    def _rule_start(self) -> bool:
+        return self._peek()[0] == 'nonterminal' and self._peek(1)[1] == '::='
+
+    def rules(self) -> list[tuple[str, list[_Alternative]]]:
+        rules = []
+        while self._peek()[0] != 'end':
+            name = self._expect('nonterminal')[1]
+            self._expect('op', '::=')
+            rules.append((name, self._alternatives(top=True)))
+        return rules
+
+    def _alternatives(self, top: bool) -> list[_Alternative]:
+        alternatives = [self._alternative(top)]
+        while self._peek()[1] == '|' and self._peek()[0] == 'op':
+            self.pos += 1
+            alternatives.append(self._alternative(top))
+        return alternatives
+
+    def _alternative(self, top: bool) -> _Alternative:
+        alternative = _Alternative([], line=self._peek()[2])
+        while True:
+            kind, value, line = self._peek()
+            if kind == 'end' or (top and self._rule_start()):
+                break
+            if kind == 'op' and value in '|)':
+                break
+            self.pos += 1
+            if kind == 'prec' and top:
+                alternative.prec = value
+            elif kind == 'action' and top:
+                alternative.action = value.strip()
+            elif kind in ('nonterminal', 'name'):
+                alternative.items.append([('symbol', value), ''])
+            elif kind == 'op' and value == '(':
+                group = self._alternatives(top=False)
+                self._expect('op', ')')
+                alternative.items.append([('group', group), ''])
+            elif kind == 'op' and value in '*+?' and alternative.items and not alternative.items[-1][1]:
+                alternative.items[-1][1] = value
+            else:
+                raise GrammarError(f'grammar.txt line {line}: unexpected "{value}"')
+        return alternative
+
+
+def _item_name(item) -> str:
+    (kind, value), suffix = item
+    if kind == 'symbol':
+        return value + suffix
+    alternatives = ' | '.join(' '.join(_item_name(i) for i in alt.items) for alt in value)
+    return f'( {alternatives} ){suffix}'
+
+
+def _single_terminals(alternatives: list[_Alternative]) -> bool:
+    return all(len(alt.items) == 1 and alt.items[0][0][0] == 'symbol'
+               and not alt.items[0][1] and not alt.items[0][0][1].startswith('<')
+               for alt in alternatives)
+
+
+def _action_source(action: Optional[str], size: int, line: int) -> Optional[str]:
+    # $n becomes v[n - 1], v being the values of the production's items
+    if action is None:
+        if size != 1:
+            raise GrammarError(f'grammar.txt line {line}: an alternative of {size} items needs an action')
+        return None
+
+    def value(match):
+        index = int(match[1])
+        if not 1 <= index <= size:
+            raise GrammarError(f'grammar.txt line {line}: ${index} but the alternative has {size} items')
+        return f'v[{index - 1}]'
+    return re.sub(r'\$(\d+)', value, action)
+
+
+def read_grammar(text: str) -> Grammar:
+    """Reads grammar.txt and expands its EBNF into BNF productions"""
+    tokens, precedence, expect = _read_rules(text)
+    productions: list[Production] = []
+    generated: set[str] = set()
+
+    def expand(lhs: str, alternative: _Alternative) -> None:
+        # A group of single terminals, ( "+" | "-" ), becomes one production
+        # per terminal so each keeps that terminal's precedence
+        variants = [[]]
+        for item in alternative.items:
+            (kind, value), suffix = item
+            if kind == 'group' and not suffix and _single_terminals(value):
+                choices = [alt.items[0][0][1] for alt in value]
+            else:
+                choices = [symbol(item)]
+            variants = [variant + [choice] for variant in variants for choice in choices]
+        action = _action_source(alternative.action, len(alternative.items), alternative.line)
+        for rhs in variants:
+            productions.append(Production(lhs, tuple(rhs), action, alternative.prec))
+
+    def symbol(item) -> str:
+        # Name of the symbol standing for an item, adding productions for
+        # groups and repeats the first time each is seen
+        (kind, value), suffix = item
+        name = _item_name(item)
+        if kind == 'group':
+            element = _item_name([item[0], ''])
+            if element not in generated:
+                generated.add(element)
+                for alt in value:
+                    size = len(alt.items)
+                    source = None if size == 1 else f'${size}' if size else 'None'
+                    expand(element, _Alternative(alt.items, action=source, line=alt.line))
+        else:
+            element = value
+        if not suffix:
+            return element
+        if name in generated:
+            return name
+        generated.add(name)
+        if suffix == '*':
+            productions.append(Production(name, (), '[]', None))
+            productions.append(Production(name, (name, element), '_append(v)', None))
+        elif suffix == '+':
+            productions.append(Production(name, (element,), '[v[0]]', None))
+            productions.append(Production(name, (name, element), '_append(v)', None))
+        elif suffix == '?':
+            productions.append(Production(name, (), 'None', None))
+            productions.append(Production(name, (element,), None, None))
+        return name
+
+    rules = _RuleReader(tokens).rules()
+    if not rules:
+        raise GrammarError('grammar.txt has no rules')
+    for lhs, alternatives in rules:
+        for alternative in alternatives:
+            expand(lhs, alternative)
+    return Grammar(rules[0][0], productions, precedence, expect)
+
+
+def check_precedence(precedence: dict[str, tuple[int, str]]) -> None:
+    """Raises GrammarError unless the declarations order operators as TOKEN_PREC does
+
+    Both parsers must group expressions the same way, so two operators
+    declared in the grammar must compare the same in TOKEN_PREC, and
+    assignments, which the Pratt parser folds to the right, must be %right.
+    """
+    def compare(a: int, b: int) -> int:
+        return (a > b) - (a < b)
+
+    shared = [name for name in precedence if name in TOKEN_PREC]
+    for first in shared:
+        for second in shared:
+            if (compare(precedence[first][0], precedence[second][0])
+                    != compare(TOKEN_PREC[first], TOKEN_PREC[second])):
+                raise GrammarError(
+                    f'grammar.txt orders {first} and {second} differently from TOKEN_PREC')
+        if first in KIND_BY_TYPE and KIND_BY_TYPE[first] in ASSIGNMENT_KINDS and precedence[first][1] != 'right':
+            raise GrammarError(f'grammar.txt must declare assignment {first} %right')
+
+
+# ----------------------------------------------------------------------
+# LALR(1) tables
+# ----------------------------------------------------------------------
+
+@dataclass(slots=True)
+class ParseTables:
+    """Action and goto tables with the productions they reduce by
+
+    action[state] maps a terminal to a state to shift to, or to ~p to reduce
+    by production p, production 0 being acceptance. goto[state] maps a
+    nonterminal to the state entered after reducing to it.
+    """
+    action: list[dict[int, int]]
+    goto: list[dict[int, int]]
+    lhs: list[int]
+    length: list[int]
+    # Python expression building each production's value from the list v
+    # of its items' values, None to pass a single value up
+    sources: list[Optional[str]]
+    nonterminals: list[str]
+    conflicts: int
+    reduce: list[Optional[Callable]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        namespace = dict(vars(ast_nodes))
+        namespace['_append'] = _append
+        self.reduce = [None if source is None else eval(f'lambda v: {source}', namespace)
+                       for source in self.sources]
+
+    def __getstate__(self):
+        return (self.action, self.goto, self.lhs, self.length,
+                self.sources, self.nonterminals, self.conflicts)
+
+    def __setstate__(self, state):
+        (self.action, self.goto, self.lhs, self.length,
+         self.sources, self.nonterminals, self.conflicts) = state
+        self.__post_init__()
+
+
+def _append(v):
+    # Action of a repeat production X* ::= X* X
+    items = v[0]
+    items.append(v[1])
+    return items
+
+
+def build_tables(text: str) -> ParseTables:
+    """Builds LALR(1) tables from the text of grammar.txt"""
+    grammar = read_grammar(text)
+    check_precedence(grammar.precedence)
+    productions = [Production(_ACCEPT, (grammar.start,), None, None)] + grammar.productions
+
+    names = [_ACCEPT] + list(dict.fromkeys(p.lhs for p in grammar.productions))
+    number = {name: _FIRST_NONTERMINAL + i for i, name in enumerate(names)}
+    for p in productions:
+        for name in p.rhs:
+            if name.startswith('<') and name not in number:
+                raise GrammarError(f'grammar.txt uses {name} without a rule for it')
+            if name not in number and name not in KIND_BY_TYPE:
+                raise GrammarError(f'grammar.txt uses unknown token {name}')
+    lhs = [number[p.lhs] for p in productions]
+    rhs = [tuple(number[name] if name in number else KIND_BY_TYPE[name] for name in p.rhs)
+           for p in productions]
+    by_lhs: dict[int, list[int]] = {}
+    for index, head in enumerate(lhs):
+        by_lhs.setdefault(head, []).append(index)
+
+    # Nullable nonterminals and FIRST sets, to a fixpoint
+    nullable: set[int] = set()
+    first: dict[int, set[int]] = {head: set() for head in by_lhs}
+    changed = True
+    while changed:
+        changed = False
+        for index, head in enumerate(lhs):
+            for symbol in rhs[index]:
+                if symbol < _FIRST_NONTERMINAL:
+                    if symbol not in first[head]:
+                        first[head].add(symbol)
+                        changed = True
+                    break
+                if not first[symbol] <= first[head]:
+                    first[head] |= first[symbol]
+                    changed = True
+                if symbol not in nullable:
+                    break
+            else:
+                if head not in nullable:
+                    nullable.add(head)
+                    changed = True
+
+    # FIRST of what follows the symbol after the dot, and whether it can be empty
+    rest: list[list[tuple[frozenset[int], bool]]] = []
+    for symbols in rhs:
+        row = []
+        for dot in range(len(symbols)):
+            found: set[int] = set()
+            empty = True
+            for symbol in symbols[dot + 1:]:
+                if symbol < _FIRST_NONTERMINAL:
+                    found.add(symbol)
+                    empty = False
+                    break
+                found |= first[symbol]
+                if symbol not in nullable:
+                    empty = False
+                    break
+            row.append((frozenset(found), empty))
+        rest.append(row)
+
+    def closure(kernel: dict[tuple[int, int], set[int]]) -> dict[int, set[int]]:
+        # Lookaheads of the B ::= . gamma items a kernel brings in, which all
+        # productions of B share, keyed by B
+        heads: dict[int, set[int]] = {}
+        work: list[int] = []
+
+        def add(head: int, lookaheads) -> None:
+            known = heads.get(head)
+            if known is None:
+                heads[head] = set(lookaheads)
+                work.append(head)
+            elif not lookaheads <= known:
+                known |= lookaheads
+                work.append(head)
+
+        for (index, dot), lookaheads in kernel.items():
+            symbols = rhs[index]
+            if dot < len(symbols) and symbols[dot] >= _FIRST_NONTERMINAL:
+                found, empty = rest[index][dot]
+                add(symbols[dot], found | lookaheads if empty else found)
+        while work:
+            head = work.pop()
+            lookaheads = heads[head]
+            for index in by_lhs[head]:
+                symbols = rhs[index]
+                if symbols and symbols[0] >= _FIRST_NONTERMINAL:
+                    found, empty = rest[index][0]
+                    add(symbols[0], found | lookaheads if empty else found)
+        return heads
+
+    # LR(0) item sets, identified by their kernels
+    kernels: list[tuple[tuple[int, int], ...]] = [((0, 0),)]
+    state_of = {kernels[0]: 0}
+    transitions: list[dict[int, int]] = []
+    for kernel in kernels:
+        heads = closure({item: set() for item in kernel})
+        moves: dict[int, list[tuple[int, int]]] = {}
+        for index, dot in kernel:
+            if dot < len(rhs[index]):
+                moves.setdefault(rhs[index][dot], []).append((index, dot + 1))
+        for head in heads:
+            for index in by_lhs[head]:
+                if rhs[index]:
+                    moves.setdefault(rhs[index][0], []).append((index, 1))
+        edges = {}
+        for symbol, items in moves.items():
+            target = tuple(sorted(set(items)))
+            if target not in state_of:
+                state_of[target] = len(kernels)
+                kernels.append(target)
+            edges[symbol] = state_of[target]
+        transitions.append(edges)
+
+    # Kernel item lookaheads, generated spontaneously inside a state or
+    # propagated from the kernel item an item was reached from
+    lookahead: dict[tuple[int, tuple[int, int]], set[int]] = {
+        (state, item): set() for state, kernel in enumerate(kernels) for item in kernel}
+    lookahead[(0, (0, 0))].add(_END)
+    propagate: dict[tuple[int, tuple[int, int]], list] = {}
+    for state, kernel in enumerate(kernels):
+        edges = transitions[state]
+        for item in kernel:
+            source = (state, item)
+            targets = propagate.setdefault(source, [])
+            index, dot = item
+            if dot < len(rhs[index]):
+                targets.append((edges[rhs[index][dot]], (index, dot + 1)))
+            for head, found in closure({item: {_PROPAGATE}}).items():
+                for production in by_lhs[head]:
+                    if not rhs[production]:
+                        continue
+                    target = (edges[rhs[production][0]], (production, 1))
+                    if _PROPAGATE in found:
+                        targets.append(target)
+                    lookahead[target] |= found - {_PROPAGATE}
+    changed = True
+    while changed:
+        changed = False
+        for source, targets in propagate.items():
+            found = lookahead[source]
+            for target in targets:
+                if not found <= lookahead[target]:
+                    lookahead[target] |= found
+                    changed = True
+
+    # Precedence of each production, from %prec or its last terminal
+    levels = grammar.precedence
+    production_prec = []
+    for p in productions:
+        name = p.prec
+        if name is None:
+            name = next((s for s in reversed(p.rhs) if s in KIND_BY_TYPE), None)
+        production_prec.append(levels.get(name) if name else None)
+    token_prec = {KIND_BY_TYPE[name]: value for name, value in levels.items() if name in KIND_BY_TYPE}
+
+    action: list[dict[int, int]] = []
+    goto: list[dict[int, int]] = []
+    conflicts: list[str] = []
+    for state, kernel in enumerate(kernels):
+        edges = transitions[state]
+        row = {symbol: target for symbol, target in edges.items() if symbol < _FIRST_NONTERMINAL}
+        goto.append({symbol - _FIRST_NONTERMINAL: target
+                     for symbol, target in edges.items() if symbol >= _FIRST_NONTERMINAL})
+        reductions: list[tuple[int, set[int]]] = [
+            (index, lookahead[(state, (index, dot))])
+            for index, dot in kernel if dot == len(rhs[index])]
+        for head, found in closure({item: lookahead[(state, item)] for item in kernel}).items():
+            reductions.extend((index, found) for index in by_lhs[head] if not rhs[index])
+        reduced: dict[int, int] = {}
+        for index, found in reductions:
+            for terminal in found:
+                if terminal in reduced:
+                    other = reduced[terminal]
+                    raise GrammarError(
+                        f'grammar.txt has a reduce/reduce conflict between {_describe(productions[other])}'
+                        f' and {_describe(productions[index])} before {_terminal_name(terminal)}')
+                reduced[terminal] = index
+                if terminal not in row:
+                    row[terminal] = ~index
+                    continue
+                rule = production_prec[index]
+                token = token_prec.get(terminal)
+                if rule is None or token is None:
+                    # Shift, as yacc does, and count it against %expect
+                    conflicts.append(f'{_describe(productions[index])} before {_terminal_name(terminal)}')
+                elif rule[0] > token[0] or (rule[0] == token[0] and token[1] == 'left'):
+                    row[terminal] = ~index
+                elif rule[0] == token[0] and token[1] == 'nonassoc':
+                    del row[terminal]
+        action.append(row)
+
+    if len(conflicts) != grammar.expect:
+        raise GrammarError(
+            f'grammar.txt expects {grammar.expect} shift/reduce conflicts, found {len(conflicts)}: '
+            + '; '.join(conflicts))
+    return ParseTables(
+        action=action,
+        goto=goto,
+        lhs=[head - _FIRST_NONTERMINAL for head in lhs],
+        length=[len(symbols) for symbols in rhs],
+        sources=[p.action for p in productions],
+        nonterminals=names,
+        conflicts=len(conflicts),
+    )
+
+
+def _terminal_name(terminal: int) -> str:
+    return '$end' if terminal == _END else TokenKind(terminal).name
+
+
+def _describe(production: Production) -> str:
+    return f"{production.lhs} ::= {' '.join(production.rhs) or '(empty)'}"
+
+
+_loaded: dict[Path, ParseTables] = {}
+
+
+def load_tables(path: Path = GRAMMAR_PATH, cache: bool = True) -> ParseTables:
+    """Tables for the grammar at path, from the disk cache when it has them
+
+    The cache file is named by a hash of the grammar, the token kinds and
+    this module, so changing any of them builds and caches new tables.
+    """
+    if cache and path in _loaded:
+        return _loaded[path]
+    text = path.read_text(encoding='utf-8-sig')
+    key = hashlib.sha256(b'\n'.join((
+        Path(__file__).read_bytes(),
+        ' '.join(kind.name for kind in TokenKind).encode(),
+        text.encode(),
+    ))).hexdigest()[:16]
+    cache_file = _CACHE_DIR / f'lalr-{key}.pickle'
+    tables = None
+    if cache:
+        try:
+            with open(cache_file, 'rb') as f:
+                tables = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            tables = None
+    if tables is None:
+        tables = build_tables(text)
+        if cache:
+            try:
+                cache_file.parent.mkdir(exist_ok=True)
+                partial = cache_file.with_suffix('.tmp')
+                with open(partial, 'wb') as f:
+                    pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+                partial.replace(cache_file)
+            except OSError:
+                pass
+    if cache:
+        _loaded[path] = tables
+    return tables
+
+
+# ----------------------------------------------------------------------
+# Table driven parser
+# ----------------------------------------------------------------------
+
+class LALRParser:
+    """Shift-reduce parser running the tables generated from grammar.txt
+
+    Builds the same AST as Parser. Nothing recurses, nesting depth only
+    grows the state and value stacks. Expressions missing an operand, such
+    as "- ;", which Parser lets through as a None operand, are errors here.
+    """
+
+    def __init__(self, tokens: Iterable[Token], tables: Optional[ParseTables] = None):
+        self._tokens = tokens
+        self.tables = tables if tables is not None else load_tables()
+        self.pos = 0
+        # A TokenStream can show the offending source line in errors
+        self.source_lines = tokens.lines if isinstance(
+            tokens, TokenStream) else None
+
+    def parse(self) -> Program:
+        tables = self.tables
+        action = tables.action
+        goto = tables.goto
+        lhs = tables.lhs
+        length = tables.length
+        reduce = tables.reduce
+        states = [0]
+        values: list = []
+        state = 0
+        stream = iter(self._tokens)
+        tok = next(stream, None)
+        kind = _END if tok is None else tok.kind
+        last = tok
+        pos = 0
+        while True:
+            code = action[state].get(kind)
+            if code is None:
+                self.pos = pos
+                self._raise_error(tok or last, state)
+            if code >= 0:
+                # Shift
+                values.append(tok)
+                states.append(code)
+                state = code
+                pos += 1
+                last = tok
+                tok = next(stream, None)
+                kind = _END if tok is None else tok.kind
+                continue
+            production = ~code
+            if production == 0:
+                self.pos = pos
+                return values[-1]
+            size = length[production]
+            build = reduce[production]
+            if build is None:
+                # A single value passes up unchanged
+                states.pop()
+            elif size:
+                value = build(values[-size:])
+                del values[-size:]
+                del states[-size:]
+                values.append(value)
+            else:
+                values.append(build(()))
+            state = goto[states[-1]][lhs[production]]
+            states.append(state)
+
+    def _raise_error(self, tok: Optional[Token], state: int):
+        expected = ', '.join(sorted(
+            _expected_text(kind) for kind in self.tables.action[state]))
+        raise ParserError(
+            f'There was an error parsing token {tok} at pos {self.pos}, expected one of {expected}',
+            tok,
+            self.source_lines
+        )
+
+
+def _expected_text(kind: int) -> str:
+    if kind == _END:
+        return 'end of input'
+    text = SYMBOL_TEXT[kind]
+    return f"'{text}'" if text else TokenKind(kind).name
@@ -1,14 +1,20 @@
+import mmap
+import os
 import re
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Iterator, Optional, Union
 from src.errors import LexerError
+from src.lexer_numpy import Prescan, prescan
 from src.tokens import (
     Token,
+    TokenKind,
+    TokenStream,
     SYMBOLS,
-    STRING_LITERAL,
-    CHAR_LITERAL,
-    NUMBER,
+    SYMBOL_KINDS,
+    KEYWORD_KINDS,
     KEYWORDS,
-    IDENTIFIER,
-    EOF
 )
 
 _SYMBOL_PATTERN = "|".join(re.escape(sym)
@@ -21,7 +27,7 @@ _NUMBER_PATTERN = r"""
   | (?:\d+(?:[eE][+-]?\d+)?[fFlL]?)
 """
 
-_TOKEN_REGEX = re.compile(
+_TOKEN_PATTERN = (
     r"(?P<WHITESPACE>[ \t]+)"
     r"|(?P<NEWLINE>\r?\n)"
     r"|(?P<COMMENT>//[^\n]*)"
@@ -31,83 +37,589 @@ _TOKEN_REGEX = re.compile(
     r"|(?P<NUMBER>" + _NUMBER_PATTERN + r")"
     r"|(?P<IDENTIFIER>[A-Za-z_]\w*)"
     r"|(?P<SYMBOL>" + _SYMBOL_PATTERN + r")"
-    r"|(?P<MISMATCH>.)",
-    re.VERBOSE,
+    r"|(?P<MISMATCH>.)"
 )
 
+_TOKEN_REGEX = re.compile(_TOKEN_PATTERN, re.VERBOSE)
+# Same pattern over raw bytes for memory mapped input, \w and \d only match ASCII
+_BYTES_TOKEN_REGEX = re.compile(_TOKEN_PATTERN.encode(), re.VERBOSE)
+
+_SKIPPED_GROUPS = frozenset({"WHITESPACE", "NEWLINE", "COMMENT", "ML_COMMENT"})
+
+_IDENTIFIER = TokenKind.IDENTIFIER
+_NUMBER = TokenKind.NUMBER
+_STRING_LITERAL = TokenKind.STRING_LITERAL
+_CHAR_LITERAL = TokenKind.CHAR_LITERAL
+_QUOTED_KINDS = (_STRING_LITERAL, _CHAR_LITERAL)
+
+# Raw lexeme to (kind, text) so keywords and symbols are never decoded
+_KEYWORD_BYTES = {text.encode(): (KEYWORD_KINDS[text], text) for text in KEYWORDS}
+_SYMBOL_BYTES = {text.encode(): (SYMBOL_KINDS[text], text) for text in SYMBOLS}
+
+# Characters past the end of a match the token regex may examine, e.g. '1e+x'
+# tries an exponent before settling on '1', so an edit this close to a token's
+# end can change how that token lexes
+_LOOKAHEAD = 3
+
+# Already lexed pages of a mapping are dropped from memory in chunks this big
+_RELEASE_CHUNK = 1 << 24
+
+
+# Character classes for the first character of a token in the DFA scanner
+_C_OTHER = 0
+_C_IDENT = 1
+_C_SPACE = 2
+_C_NEWLINE = 3
+_C_RETURN = 4
+_C_SLASH = 5
+_C_DIGIT = 6
+_C_DOT = 7
+_C_QUOTE = 8
+_C_APOSTROPHE = 9
+_C_SYMBOL = 10
+
+
+def _char_classes() -> list[int]:
+    """Class of every ASCII character, indexed by ord"""
+    classes = [_C_OTHER] * 128
+    for sym in SYMBOLS:
+        classes[ord(sym[0])] = _C_SYMBOL
+    for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_":
+        classes[ord(c)] = _C_IDENT
+    for c in "0123456789":
+        classes[ord(c)] = _C_DIGIT
+    classes[ord(" ")] = classes[ord("\t")] = _C_SPACE
+    classes[ord("\n")] = _C_NEWLINE
+    classes[ord("\r")] = _C_RETURN
+    classes[ord("/")] = _C_SLASH
+    classes[ord(".")] = _C_DOT
+    classes[ord('"')] = _C_QUOTE
+    classes[ord("'")] = _C_APOSTROPHE
+    return classes
+
+
+def _symbol_trie() -> dict[str, tuple[Optional[TokenKind], dict]]:
+    """Trie of SYMBOLS, each node is (kind ending here or None, children)"""
+    root: dict[str, tuple[Optional[TokenKind], dict]] = {}
+    for sym, kind in SYMBOL_KINDS.items():
+        children = root
+        for depth, c in enumerate(sym):
+            node_kind, grandchildren = children.get(c, (None, {}))
+            if depth == len(sym) - 1:
+                node_kind = kind
+            children[c] = (node_kind, grandchildren)
+            children = grandchildren
+    return root
+
+
+_CHAR_CLASS = _char_classes()
+_SYMBOL_TRIE = _symbol_trie()
+_WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_0123456789")
+_DIGITS = frozenset("0123456789")
+_HEX_DIGITS = frozenset("0123456789ABCDEFabcdef")
+
+
+# The helpers below mirror the regex, including where it is not C, so both
+# engines produce the same tokens. \d and \w are Unicode aware like in re
+
+def _digits_end(src: str, j: int, n: int) -> int:
+    """End of a run of decimal digits starting at j"""
+    while j < n:
+        c = src[j]
+        if c in _DIGITS or (c > "\x7f" and c.isdecimal()):
+            j += 1
+        else:
+            break
+    return j
+
+
+def _exponent_end(src: str, j: int, n: int, marks: str) -> int:
+    """End of an optional exponent like e+10 at j, j itself if there is none"""
+    if j < n and src[j] in marks:
+        k = j + 1
+        if k < n and src[k] in "+-":
+            k += 1
+        end = _digits_end(src, k, n)
+        if end > k:
+            return end
+    return j
+
+
+def _number_end(src: str, i: int, n: int) -> int:
+    """End of the number starting at i, trying the regex alternatives in order"""
+    # 0x1F, 0x1.8p3
+    if (src[i] == "0" and i + 2 < n and src[i + 1] in "xX"
+            and src[i + 2] in _HEX_DIGITS):
+        j = i + 3
+        while j < n and src[j] in _HEX_DIGITS:
+            j += 1
+        if j < n and src[j] == ".":
+            j += 1
+            while j < n and src[j] in _HEX_DIGITS:
+                j += 1
+        return _exponent_end(src, j, n, "pP")
+    # 1.5e3f, .5, 15
+    if src[i] == ".":
+        j = _digits_end(src, i + 1, n)
+    else:
+        j = _digits_end(src, i, n)
+        if j < n and src[j] == ".":
+            j = _digits_end(src, j + 1, n)
+    j = _exponent_end(src, j, n, "eE")
+    if j < n and src[j] in "fFlL":
+        j += 1
+    return j
+
+
+def _string_end(src: str, i: int, n: int) -> int:
+    """End of the string literal starting at i, -1 if it is not closed"""
+    j = i + 1
+    while True:
+        quote = src.find('"', j)
+        if quote == -1:
+            return -1
+        backslash = src.find("\\", j, quote)
+        if backslash == -1:
+            return quote + 1
+        # An escape takes any character but a newline
+        if src[backslash + 1] == "\n":
+            return -1
+        j = backslash + 2
+
+
+def _char_end(src: str, i: int, n: int) -> int:
+    """End of the character literal starting at i, -1 if it is malformed"""
+    if i + 1 >= n:
+        return -1
+    if src[i + 1] == "\\":
+        j = i + 3
+        if j >= n or src[i + 2] == "\n":
+            return -1
+    elif src[i + 1] == "'":
+        return -1
+    else:
+        j = i + 2
+    if j < n and src[j] == "'":
+        return j + 1
+    return -1
+
+
+_ENGINES = ("regex", "dfa", "numpy")
+
 
 class Tokenizer:
-    """Regex based tokenizer for a subset of C"""
+    """Tokenizer for a subset of C
 
-    def __init__(self, src: str):
+    engine="regex" matches one alternation of named groups per token,
+    engine="dfa" dispatches on a first character class table and walks a
+    symbol trie for the longest operator. engine="numpy" runs the dfa scanner
+    over identifier, whitespace and newline boundaries found by a vectorized
+    prescan, falling back to plain dfa without numpy or for non-ASCII
+    sources. All engines give the same tokens.
+    """
+
+    def __init__(self, src: str, engine: str = "regex"):
+        if engine not in _ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}', expected one of {_ENGINES}")
         self.src = src
         self.length = len(src)
-        self.lines = self.src.splitlines()
+        self.engine = engine
+        self.prescan: Optional[Prescan] = prescan(src) if engine == "numpy" else None
+
+    @property
+    def lines(self) -> list[str]:
+        """Source split into lines, only built when an error message needs it"""
+        return self.src.splitlines()
 
     def tokenize(self) -> list[Token]:
-        tokens: list[Token] = []
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> Iterator[Token]:
+        """Lazily yields tokens so the full token list never has to exist"""
+        src = self.src
         line = 0
-        col = 0
-        i = 0
+        line_start = 0
+        last = 0
+        line_starts = self.prescan.line_starts if self.prescan is not None else None
+        for token_type, start, end in self._scan():
+            if line_starts is not None:
+                # Every newline offset is known, find the line directly
+                line = bisect_right(line_starts, start, line) - 1
+                line_start = line_starts[line]
+            else:
+                # Line and column only move forward, so count the gap since the
+                # previous token instead of every lexeme
+                newline_count = src.count("\n", last, start)
+                if newline_count:
+                    line += newline_count
+                    line_start = src.rfind("\n", last, start) + 1
+                last = start
+            if token_type in _QUOTED_KINDS:
+                value = src[start + 1:end - 1]
+            else:
+                value = src[start:end]
+            yield Token(token_type, value, line, start - line_start)
+
+    def token_stream(self) -> TokenStream:
+        """Lexes the source into a compact TokenStream of offsets"""
+        stream = TokenStream(self.src)
+        append = stream.append
+        for kind, start, end in self._scan():
+            append(kind, start, end)
+        if self.prescan is not None:
+            stream._line_starts = array('i', self.prescan.line_starts)
+        return stream
+
+    def _scan(self, i: int = 0) -> Iterator[tuple[TokenKind, int, int]]:
+        """Yields (token kind, start, end) for every token from offset i, ending with EOF"""
+        if self.engine == "numpy" and self.prescan is not None:
+            return self._scan_dfa(i, self.prescan)
+        if self.engine != "regex":
+            return self._scan_dfa(i)
+        return self._scan_regex(i)
+
+    def _scan_regex(self, i: int) -> Iterator[tuple[TokenKind, int, int]]:
+        src = self.src
 
         while i < self.length:
-            tok_match = _TOKEN_REGEX.match(self.src, i)
+            tok_match = _TOKEN_REGEX.match(src, i)
             if not tok_match:
                 raise LexerError(
-                    f"unexpected character '{self.src[i]}'",
-                    self.src[i]
+                    f"unexpected character '{src[i]}'",
+                    src[i]
                 )
 
             tok_typ = tok_match.lastgroup
-            lexeme = tok_match.group()
-            start_line = line
-            start_col = col
+            start = i
             i = tok_match.end()
 
-            if tok_typ in {"WHITESPACE", "COMMENT"}:
-                col += len(lexeme)
+            if tok_typ in _SKIPPED_GROUPS:
                 continue
+            if tok_typ == "IDENTIFIER":
+                yield KEYWORD_KINDS.get(tok_match.group(), _IDENTIFIER), start, i
+            elif tok_typ == "SYMBOL":
+                yield SYMBOL_KINDS[tok_match.group()], start, i
+            elif tok_typ == "NUMBER":
+                yield _NUMBER, start, i
+            elif tok_typ == "STRING":
+                yield _STRING_LITERAL, start, i
+            elif tok_typ == "CHAR":
+                yield _CHAR_LITERAL, start, i
+            elif tok_typ == "MISMATCH":
+                lexeme = tok_match.group()
+                raise LexerError(
+                    f"unexpected token '{lexeme}'",
+                    lexeme
+                )
 
-            if tok_typ == "ML_COMMENT":
-                newline_count = lexeme.count("\n")
-                if newline_count:
-                    line += newline_count
-                    col = len(lexeme.rsplit("\n", 1)[-1])
+        yield TokenKind.EOF, self.length, self.length
+
+    def _scan_dfa(self, i: int, runs: Optional[Prescan] = None) -> Iterator[tuple[TokenKind, int, int]]:
+        src = self.src
+        n = self.length
+        char_class = _CHAR_CLASS
+        word_chars = _WORD_CHARS
+        keyword_kinds = KEYWORD_KINDS
+        trie = _SYMBOL_TRIE
+        # With a prescan identifier and whitespace runs end at a known offset,
+        # word and space index the next run that can contain i
+        if runs is not None:
+            word_ends = runs.word_ends
+            space_ends = runs.space_ends
+            word = bisect_right(word_ends, i)
+            space = bisect_right(space_ends, i)
+
+        while i < n:
+            c = src[i]
+            code = ord(c)
+            if code < 128:
+                cls = char_class[code]
+            else:
+                cls = _C_DIGIT if c.isdecimal() else _C_OTHER
+
+            if cls == _C_IDENT:
+                if runs is not None:
+                    # Usually the next run, but comments and literals skip
+                    # whole runs and numbers can end inside one as in 1e5x
+                    if word_ends[word] <= i:
+                        word += 1
+                        if word_ends[word] <= i:
+                            word = bisect_right(word_ends, i, word)
+                    j = word_ends[word]
+                else:
+                    j = i + 1
+                    while j < n:
+                        c = src[j]
+                        if c in word_chars or (c > "\x7f" and c.isalnum()):
+                            j += 1
+                        else:
+                            break
+                yield keyword_kinds.get(src[i:j], _IDENTIFIER), i, j
+                i = j
+                continue
+            if cls == _C_SPACE:
+                if runs is not None:
+                    if space_ends[space] <= i:
+                        space += 1
+                        if space_ends[space] <= i:
+                            space = bisect_right(space_ends, i, space)
+                    i = space_ends[space]
                 else:
-                    col += len(lexeme)
+                    i += 1
+                    while i < n and (src[i] == " " or src[i] == "\t"):
+                        i += 1
                 continue
+            if cls == _C_NEWLINE:
+                i += 1
+                continue
+            if cls == _C_DIGIT:
+                j = _number_end(src, i, n)
+                yield _NUMBER, i, j
+                i = j
+                continue
+            if cls == _C_SLASH and i + 1 < n:
+                if src[i + 1] == "/":
+                    j = src.find("\n", i)
+                    i = n if j == -1 else j
+                    continue
+                if src[i + 1] == "*":
+                    j = src.find("*/", i + 2)
+                    if j != -1:
+                        i = j + 2
+                        continue
+                    # Unterminated comments fall through to '/'
+            elif cls == _C_DOT:
+                if i + 1 < n and (src[i + 1] in _DIGITS
+                                  or (src[i + 1] > "\x7f" and src[i + 1].isdecimal())):
+                    j = _number_end(src, i, n)
+                    yield _NUMBER, i, j
+                    i = j
+                    continue
+            elif cls == _C_QUOTE:
+                j = _string_end(src, i, n)
+                if j != -1:
+                    yield _STRING_LITERAL, i, j
+                    i = j
+                    continue
+                cls = _C_OTHER
+            elif cls == _C_APOSTROPHE:
+                j = _char_end(src, i, n)
+                if j != -1:
+                    yield _CHAR_LITERAL, i, j
+                    i = j
+                    continue
+                cls = _C_OTHER
+            elif cls == _C_RETURN:
+                if i + 1 < n and src[i + 1] == "\n":
+                    i += 2
+                    continue
+                cls = _C_OTHER
+
+            if cls == _C_OTHER:
+                raise LexerError(
+                    f"unexpected token '{c}'",
+                    c
+                )
+
+            # Longest symbol through the trie
+            kind, children = trie[c]
+            end = j = i + 1
+            while j < n and src[j] in children:
+                next_kind, children = children[src[j]]
+                j += 1
+                if next_kind is not None:
+                    kind = next_kind
+                    end = j
+            yield kind, i, end
+            i = end
+
+        yield TokenKind.EOF, n, n
+
+
+def relex(stream: TokenStream, offset: int, removed: int, inserted: str) -> TokenStream:
+    """Lexes an edited source by reusing the tokens of the previous version
+
+    The edit replaces removed characters at offset with inserted. Tokens far
+    enough before the edit are kept, lexing restarts at the last safe boundary
+    before it and stops as soon as a new token starts where a shifted old token
+    started, since lexing from there on is the same as before. The tail is
+    kept with its offsets shifted, line and column follow from the offsets.
+    """
+    old_src = stream.src
+    if offset < 0 or removed < 0 or offset + removed > len(old_src):
+        raise ValueError(f"edit at {offset} removing {removed} is outside the source")
+    src = old_src[:offset] + inserted + old_src[offset + removed:]
+    delta = len(inserted) - removed
+    edit_end = offset + len(inserted)
+    old_starts = stream.starts
+    old_ends = stream.ends
+
+    # Keep tokens whose lookahead ends before the edit, restart where the
+    # last of them ends so gaps holding comments are lexed again
+    kept = bisect_left(old_ends, offset - _LOOKAHEAD + 1)
+    # An unterminated '/*' lexes as '/' '*' and only stays that way while no
+    # '*/' follows it, restart before the first one if the edit creates one.
+    # A '/*' is unterminated if it starts after the last '*/' or overlaps it
+    if src.find("*/", max(offset - 1, 0), edit_end + 1) != -1:
+        last_close = old_src.rfind("*/")
+        first_open = old_src.find("/*", max(last_close - 1, 0), offset)
+        if first_open != -1:
+            kept = min(kept, bisect_right(old_ends, first_open))
+    restart = old_ends[kept - 1] if kept else 0
+
+    new = TokenStream(src)
+    new.codes = stream.codes[:kept]
+    new.starts = old_starts[:kept]
+    new.ends = old_ends[:kept]
+    old = kept
+    old_count = len(old_starts)
+    for kind, start, end in Tokenizer(src)._scan(restart):
+        if start >= edit_end:
+            # Resynchronise once a new token lines up with a shifted old one
+            old_start = start - delta
+            while old < old_count and old_starts[old] < old_start:
+                old += 1
+            if old < old_count and old_starts[old] == old_start:
+                break
+        new.append(kind, start, end)
+    else:
+        return new
+
+    new.codes.extend(stream.codes[old:])
+    new.starts.extend(map(delta.__add__, old_starts[old:]))
+    new.ends.extend(map(delta.__add__, old_ends[old:]))
+
+    # Shift an already built line index instead of rebuilding it
+    if stream._line_starts is not None:
+        old_lines = stream._line_starts
+        line_starts = old_lines[:bisect_right(old_lines, offset)]
+        pos = inserted.find("\n")
+        while pos != -1:
+            line_starts.append(offset + pos + 1)
+            pos = inserted.find("\n", pos + 1)
+        line_starts.extend(map(delta.__add__, old_lines[bisect_right(old_lines, offset + removed):]))
+        new._line_starts = line_starts
+    return new
+
+
+class MappedTokenizer:
+    """Tokenizer over a memory mapped source file
+
+    Runs a bytes version of the token regex directly over the mapping so a
+    very large file is never read or decoded as a whole. Keywords and symbols
+    take their text from the token tables, only identifier, number and literal
+    lexemes are decoded. Sources are read as UTF-8, identifiers and numbers
+    are ASCII only and columns count bytes.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        # Empty files cannot be mapped
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._map = None
+            self.length = 0
+        else:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.length = len(self._map)
+
+    def __enter__(self) -> 'MappedTokenizer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    @property
+    def lines(self) -> list[str]:
+        """Source split into lines, only built when an error message needs it"""
+        if self._map is None:
+            return []
+        return self._map[:].decode('utf-8', 'replace').splitlines()
+
+    def tokenize(self) -> list[Token]:
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> Iterator[Token]:
+        """Lazily yields tokens straight from the mapped bytes"""
+        data = self._map if self._map is not None else b''
+        match = _BYTES_TOKEN_REGEX.match
+        release = getattr(data, 'madvise', None) if hasattr(mmap, 'MADV_DONTNEED') else None
+        length = self.length
+        # Identifiers repeat a lot, decode each distinct name once
+        names: dict[bytes, str] = {}
+        line = 0
+        line_start = 0
+        released = 0
+        i = 0
+
+        while i < length:
+            tok_match = match(data, i)
+            if not tok_match:
+                lexeme = data[i:i + 1].decode('utf-8', 'replace')
+                raise LexerError(
+                    f"unexpected character '{lexeme}'",
+                    lexeme
+                )
+
+            tok_typ = tok_match.lastgroup
+            start = i
+            i = tok_match.end()
 
             if tok_typ == "NEWLINE":
                 line += 1
-                col = 0
+                line_start = i
+                # Read only pages behind the scan are reloaded from the file
+                # if they are needed again, so they can be dropped
+                if release is not None and i - released > 2 * _RELEASE_CHUNK:
+                    release(mmap.MADV_DONTNEED, released, _RELEASE_CHUNK)
+                    released += _RELEASE_CHUNK
+                continue
+            if tok_typ == "WHITESPACE" or tok_typ == "COMMENT":
+                continue
+            if tok_typ == "ML_COMMENT":
+                lexeme = tok_match.group()
+                newline_count = lexeme.count(b"\n")
+                if newline_count:
+                    line += newline_count
+                    line_start = start + lexeme.rfind(b"\n") + 1
                 continue
 
-            if tok_typ == "STRING":
-                tokens.append(
-                    Token(STRING_LITERAL, lexeme[1:-1], start_line, start_col))
-            elif tok_typ == "CHAR":
-                tokens.append(
-                    Token(CHAR_LITERAL, lexeme[1:-1], start_line, start_col))
-            elif tok_typ == "NUMBER":
-                tokens.append(Token(NUMBER, lexeme, start_line, start_col))
-            elif tok_typ == "IDENTIFIER":
-                token_type = KEYWORDS.get(lexeme, IDENTIFIER)
-                tokens.append(Token(token_type, lexeme, start_line, start_col))
+            column = start - line_start
+            if tok_typ == "IDENTIFIER":
+                lexeme = tok_match.group()
+                keyword = _KEYWORD_BYTES.get(lexeme)
+                if keyword is not None:
+                    yield Token(keyword[0], keyword[1], line, column)
+                    continue
+                name = names.get(lexeme)
+                if name is None:
+                    name = names[lexeme] = lexeme.decode('ascii')
+                yield Token(_IDENTIFIER, name, line, column)
             elif tok_typ == "SYMBOL":
-                tokens.append(
-                    Token(SYMBOLS[lexeme], lexeme, start_line, start_col))
+                kind, text = _SYMBOL_BYTES[tok_match.group()]
+                yield Token(kind, text, line, column)
+            elif tok_typ == "NUMBER":
+                yield Token(_NUMBER, tok_match.group().decode('ascii'), line, column)
+            elif tok_typ == "STRING" or tok_typ == "CHAR":
+                lexeme = tok_match.group()
+                kind = _STRING_LITERAL if tok_typ == "STRING" else _CHAR_LITERAL
+                yield Token(kind, lexeme[1:-1].decode('utf-8', 'replace'), line, column)
+                # String literals may run over a line break
+                newline_count = lexeme.count(b"\n")
+                if newline_count:
+                    line += newline_count
+                    line_start = start + lexeme.rfind(b"\n") + 1
             elif tok_typ == "MISMATCH":
+                lexeme = tok_match.group().decode('utf-8', 'replace')
                 raise LexerError(
                     f"unexpected token '{lexeme}'",
-                    self.src[i]
+                    lexeme
                 )
 
-            newline_count = lexeme.count("\n")
-            if newline_count:
-                line += newline_count
-                col = len(lexeme.rsplit("\n", 1)[-1])
-            else:
-                col += len(lexeme)
-
-        tokens.append(Token(EOF, '', line, col))
-        return tokens
+        yield Token(TokenKind.EOF, '', line, length - line_start)
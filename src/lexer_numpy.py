@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Vectorized pre-classification for the lexer
+
+Classifies every byte of an ASCII source at once with numpy and finds the
+boundaries of identifier and whitespace runs and every newline, so the
+scanner can jump straight to the end of a run instead of stepping through it.
+numpy is optional, prescan returns None when it is missing.
+"""
+
+
+HAVE_NUMPY = np is not None
+
+_WORD_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_0123456789"
+_SPACE_CHARS = b" \t"
+
+
+@dataclass(slots=True)
+class Prescan:
+    """Run boundaries of a source, all offsets are exclusive run ends"""
+    word_ends: list[int]
+    space_ends: list[int]
+    line_starts: list[int]
+
+
+def _lookup(chars: bytes):
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(chars, dtype=np.uint8)] = True
+    return table
+
+
+if HAVE_NUMPY:
+    _IS_WORD = _lookup(_WORD_CHARS)
+    _IS_SPACE = _lookup(_SPACE_CHARS)
+
+
+def _run_ends(mask) -> list[int]:
+    """End offset of every run of True in mask"""
+    edges = np.diff(mask.view(np.int8), append=np.int8(0))
+    return (np.flatnonzero(edges == -1) + 1).tolist()
+
+
+def prescan(src: str) -> Optional[Prescan]:
+    """Classifies src in one pass, None without numpy or for non-ASCII sources
+
+    Byte offsets only equal string offsets for ASCII, and \\w matches more
+    than the byte table outside it, so other sources take the pure Python path.
+    """
+    if not HAVE_NUMPY or not src.isascii():
+        return None
+    buf = np.frombuffer(src.encode("ascii"), dtype=np.uint8)
+    newlines = np.flatnonzero(buf == ord("\n")) + 1
+    return Prescan(
+        word_ends=_run_ends(_IS_WORD[buf]),
+        space_ends=_run_ends(_IS_SPACE[buf]),
+        line_starts=[0] + newlines.tolist(),
+    )
@@ -0,0 +1,128 @@
+import re
+from typing import Any, Optional
+from src.ast_nodes import Program, BinaryExpression, PrefixExpression, Literal
+from src.tokens import Token, TokenKind
+from src.visitor import Visitor, node_fields
+from src.optimizations.constant_fold import c_div, c_mod
+
+"""
+Constant folding on the AST
+
+Folds BinaryExpression and PrefixExpression nodes whose operands are integer
+literals into the Literal they evaluate to, before TAC generation, so
+2 * 3 + 4 reaches the TAC as 10 instead of two temporaries for constant_fold
+and copy_and_constant_propagation to collapse over several rounds.
+
+Values are 64-bit two's complement: results wrap, division truncates toward
+zero and % takes the sign of the dividend as in C, through the c_div and
+c_mod helpers constant_fold folds TAC with. Anything C leaves
+undefined, division by zero and shifts outside 0..63, is left unfolded.
+constant_fold then rejects a division or modulo by a literal zero wherever
+it is, reachable or not, so under -o1 a divisor that folds to zero, such
+as 10 / !16, is a compile error as 10 / 0 always was.
+"""
+
+
+_INT_MIN = -(1 << 63)
+_INT_RANGE = 1 << 64
+
+# Unsuffixed decimal, hex and octal literals, folded results may be negative
+_INT_LITERAL = re.compile(r'-?(?:0[xX](?P<hex>[0-9a-fA-F]+)|0(?P<oct>[0-7]*)|(?P<dec>[1-9][0-9]*))')
+
+
+def _wrap(value: int) -> int:
+    return (value - _INT_MIN) % _INT_RANGE + _INT_MIN
+
+
+# Folding function for each operator kind, None when the result is undefined
+_BINARY_FOLDS = {
+    TokenKind.PLUS: lambda a, b: a + b,
+    TokenKind.MINUS: lambda a, b: a - b,
+    TokenKind.MULTIPLY: lambda a, b: a * b,
+    TokenKind.DIVIDE: lambda a, b: c_div(a, b) if b else None,
+    TokenKind.MODULUS: lambda a, b: c_mod(a, b) if b else None,
+    TokenKind.LEFTSHIFT: lambda a, b: a << b if 0 <= b < 64 else None,
+    TokenKind.RIGHTSHIFT: lambda a, b: a >> b if 0 <= b < 64 else None,
+    TokenKind.LESSTHAN: lambda a, b: int(a < b),
+    TokenKind.GREATERTHAN: lambda a, b: int(a > b),
+    TokenKind.LESSTHANEQUAL: lambda a, b: int(a <= b),
+    TokenKind.GREATERTHANEQUAL: lambda a, b: int(a >= b),
+    TokenKind.EQUAL: lambda a, b: int(a == b),
+    TokenKind.NOTEQUAL: lambda a, b: int(a != b),
+    TokenKind.BITAND: lambda a, b: a & b,
+    TokenKind.BITOR: lambda a, b: a | b,
+    TokenKind.BITXOR: lambda a, b: a ^ b,
+    TokenKind.LOGAND: lambda a, b: int(bool(a) and bool(b)),
+    TokenKind.LOGOR: lambda a, b: int(bool(a) or bool(b)),
+}
+
+_PREFIX_FOLDS = {
+    TokenKind.PLUS: lambda a: a,
+    TokenKind.MINUS: lambda a: -a,
+    TokenKind.BITNOT: lambda a: ~a,
+    TokenKind.LOGNOT: lambda a: int(a == 0),
+}
+
+
+def _literal_value(node: Any) -> Optional[int]:
+    if type(node) is not Literal or node.token.kind != TokenKind.NUMBER:
+        return None
+    match = _INT_LITERAL.fullmatch(node.token.value)
+    if match is None:
+        return None
+    if match['hex']:
+        value = int(match['hex'], 16)
+    elif match['dec']:
+        value = int(match['dec'])
+    else:
+        value = int(match['oct'] or '0', 8)
+    return _wrap(-value if node.token.value[0] == '-' else value)
+
+
+def _fold(node: Any) -> Optional[Literal]:
+    """The Literal an operator node with literal operands evaluates to, else None"""
+    node_type = type(node)
+    if node_type is BinaryExpression:
+        operator = node.operator
+        fold = _BINARY_FOLDS.get(operator.kind)
+        left = _literal_value(node.left)
+        right = _literal_value(node.right)
+        if fold is None or left is None or right is None:
+            return None
+        result = fold(left, right)
+    elif node_type is PrefixExpression:
+        operator = node.prefix
+        fold = _PREFIX_FOLDS.get(operator.kind)
+        operand = _literal_value(node.operand)
+        if fold is None or operand is None:
+            return None
+        result = fold(operand)
+    else:
+        return None
+    if result is None:
+        return None
+    return Literal(Token(TokenKind.NUMBER, str(_wrap(result)),
+                         operator.line_num, operator.char_num))
+
+
+class _ConstantFolder(Visitor):
+    # Nodes are left after their children, so a parent sees its operands
+    # already folded
+    def leave_default(self, node: Any) -> None:
+        for name in node_fields(node.__class__):
+            value = getattr(node, name)
+            if type(value) is list:
+                for index, child in enumerate(value):
+                    folded = _fold(child)
+                    if folded is not None:
+                        value[index] = folded
+            else:
+                folded = _fold(value)
+                if folded is not None:
+                    setattr(node, name, folded)
+
+
+def fold_ast_constants(program: Program) -> Program:
+    """Folds literal operator subtrees of a dataclass AST in place"""
+    _ConstantFolder().visit(program)
+    return program
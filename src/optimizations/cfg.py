@@ -47,3 +47,23 @@ def _cfg_builder(func: FunctionBlock) -> list[CFGNode]:
         elif term.instr_type not in {'RETURN'} and i + 1 < len(nodes):
             node.add_succ(nodes[i + 1])
     return nodes
+
+
+def reverse_postorder(succs: list[list[int]]) -> list[int]:
+    """Blocks reachable from block 0, each after its predecessors except along back edges"""
+    seen = [False] * len(succs)
+    seen[0] = True
+    postorder = []
+    stack = [(0, iter(succs[0]))]
+    while stack:
+        block_index, remaining = stack[-1]
+        for succ in remaining:
+            if not seen[succ]:
+                seen[succ] = True
+                stack.append((succ, iter(succs[succ])))
+                break
+        else:
+            stack.pop()
+            postorder.append(block_index)
+    postorder.reverse()
+    return postorder
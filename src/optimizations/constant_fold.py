@@ -1,5 +1,5 @@
 from src.tac import TAC, Instruction
-from src.tokens import Token
+from src.tokens import Token, TokenKind
 from src.errors import TACError
 
 
@@ -16,6 +16,31 @@ def constant_fold(tac: TAC) -> TAC:
     return tac
 
 
+def c_div(a: int, b: int) -> int:
+    """Integer division truncating toward zero, as C divides"""
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def c_mod(a: int, b: int) -> int:
+    """Remainder with the sign of the dividend, as C takes it"""
+    return a - b * c_div(a, b)
+
+
+# Folding function for each operator kind, taking and returning ints
+# Does not handle different number types
+_FOLD_OPS = {
+    TokenKind.PLUS: lambda a, b: a + b,
+    TokenKind.MINUS: lambda a, b: a - b,
+    TokenKind.MULTIPLY: lambda a, b: a * b,
+    TokenKind.DIVIDE: c_div,
+    TokenKind.MODULUS: c_mod,
+    TokenKind.LESSTHAN: lambda a, b: int(a < b),
+    TokenKind.GREATERTHAN: lambda a, b: int(a > b),
+    TokenKind.EQUAL: lambda a, b: int(a == b),
+}
+
+
 def fold_instr(instr: Instruction):
     """Applies Constant Folding to an individual instruction"""
     if (instr.left is None
@@ -24,66 +49,27 @@ def fold_instr(instr: Instruction):
             or instr.op is None
             or not isinstance(instr.left, Token)
             or not isinstance(instr.right, Token)
-            or instr.left.type != 'NUMBER'
-            or instr.right.type != 'NUMBER'
+            or instr.left.kind != TokenKind.NUMBER
+            or instr.right.kind != TokenKind.NUMBER
             ):
         return
-    # Does not handle different number types
-    if (instr.op.type == "PLUS"):
-        instr.left = Token('NUMBER', str(
-            int(instr.left.value) + int(instr.right.value)))
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "MINUS"):
-        instr.left = Token('NUMBER', str(
-            int(instr.left.value) - int(instr.right.value)))
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "MULTIPLY"):
-        instr.left = Token('NUMBER', str(
-            int(int(instr.left.value) * int(instr.right.value))))
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "DIVIDE"):
-        if (int(instr.right.value) == 0):
-            raise TACError(
-                f"Division by zero detected during constant folding: "
-                f"{instr.left.value} / 0",
-                instr.op
-            )
-        instr.left = Token('NUMBER', str(
-            int(int(instr.left.value) / int(instr.right.value))))
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "MODULUS"):
-        if (int(instr.right.value) == 0):
-            raise TACError(
-                f"Modulo by zero detected during constant folding: "
-                f"{instr.left.value} % 0",
-                instr.op
-            )
-        instr.left = Token('NUMBER', str(
-            int(int(instr.left.value) % int(instr.right.value))))
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "LESSTHAN"):
-        if (int(instr.left.value) < int(instr.right.value)):
-            instr.left = Token('NUMBER', '1')
-        else:
-            instr.left = Token('NUMBER', '0')
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == "GREATERTHAN"):
-        if (int(instr.left.value) > int(instr.right.value)):
-            instr.left = Token('NUMBER', '1')
-        else:
-            instr.left = Token('NUMBER', '0')
-        instr.right = None
-        instr.op = None
-    elif (instr.op.type == 'EQUAL'):
-        if (int(instr.left.value) == int(instr.right.value)):
-            instr.left = Token('NUMBER', '1')
-        else:
-            instr.left = Token('NUMBER', '0')
-        instr.right = None
-        instr.op = None
+    fold = _FOLD_OPS.get(instr.op.kind)
+    if (fold is None):
+        return
+    left = int(instr.left.value)
+    right = int(instr.right.value)
+    if (right == 0 and instr.op.kind == TokenKind.DIVIDE):
+        raise TACError(
+            f"Division by zero detected during constant folding: "
+            f"{instr.left.value} / 0",
+            instr.op
+        )
+    if (right == 0 and instr.op.kind == TokenKind.MODULUS):
+        raise TACError(
+            f"Modulo by zero detected during constant folding: "
+            f"{instr.left.value} % 0",
+            instr.op
+        )
+    instr.left = Token(TokenKind.NUMBER, str(fold(left, right)))
+    instr.right = None
+    instr.op = None
@@ -1,6 +1,7 @@
+from typing import Callable
 from src.optimizations.cfg import CFGNode, build_cfg
-from src.tokens import Token
-from src.tac import TAC, BasicBlock
+from src.tokens import Token, TokenKind
+from src.tac import TAC, BasicBlock, GOTO_OP
 
 """
 block ?:
@@ -16,15 +17,21 @@ block ?:
     RETURN  res=<value temp/literal>, left=None, right=None, op=Token('RETURN','return')
 """
 
+# State of each name ID in a var_tracker bytearray
+_UNSEEN = 0
+_DECLARED = 1
+_USED = 2
+
 
 def dead_code_elimination(tac: TAC) -> TAC:
     cfg = build_cfg(tac)
+    intern = tac.names.intern
     for node_list in cfg:
         if (len(node_list) == 0):
             continue
         queue: list[CFGNode] = [node_list[0]]
         visited: set[CFGNode] = set()
-        var_tracker: dict[str, int] = dict()
+        var_tracker = bytearray(len(tac.names))
         label_redirects: dict[str, str] = dict()
         # loop through cfg nodes to mark used variables
         # eliminate dead code based on var_tracker
@@ -34,13 +41,13 @@ def dead_code_elimination(tac: TAC) -> TAC:
             for succ in node.succ:
                 if succ not in visited and succ not in queue:
                     queue.append(succ)
-            get_variables(node.block, var_tracker, label_redirects)
+            get_variables(node.block, var_tracker, label_redirects, intern)
 
         # remove unused nodes
-        remove_unused(tac, var_tracker, label_redirects)
+        remove_unused(tac, var_tracker, label_redirects, intern)
         # remove unreached blocks
         cfg = build_cfg(tac)
-        for node_list in cfg:
+        for func, node_list in zip(tac.functions, cfg):
             unreachable_blocks = set(node_list)
             if (len(node_list) == 0):
                 continue
@@ -54,13 +61,14 @@ def dead_code_elimination(tac: TAC) -> TAC:
                     if succ not in visited and succ not in queue:
                         queue.append(succ)
             for block in unreachable_blocks:
-                tac.functions[0].blocks.remove(block.block)
+                func.blocks.remove(block.block)
     return tac
 
 
 def get_variables(block: BasicBlock,
-                  var_tracker: dict[str, int],
-                  label_redirects: dict[str, str]):
+                  var_tracker: bytearray,
+                  label_redirects: dict[str, str],
+                  intern: Callable[[str], int]):
     """Get variables and labels and tracks declared and used"""
     # prechek if label followed by goto
     goto_redirect(block, label_redirects)
@@ -68,26 +76,22 @@ def get_variables(block: BasicBlock,
         if (instr.instr_type in ('DECL', 'ASSIGN')):
             # Get result and mark as declared
             assert (isinstance(instr.res, Token))
-            res = var_tracker.get(instr.res.value)
-            if (res is None):
-                var_tracker[instr.res.value] = 0
+            res = intern(instr.res.value)
+            if (var_tracker[res] == _UNSEEN):
+                var_tracker[res] = _DECLARED
             # If left is identifier, mark as used
             if (is_ident(instr.left)):
                 assert (isinstance(instr.left, Token))
-                left_val = var_tracker.get(instr.left.value)
-                if (left_val is not None):
-                    var_tracker[instr.left.value] = 1
+                mark_used(var_tracker, intern(instr.left.value))
             # If right is identifier, mark as used
             if (is_ident(instr.right)):
                 assert (isinstance(instr.right, Token))
-                right_val = var_tracker.get(instr.right.value)
-                if (right_val is not None):
-                    var_tracker[instr.right.value] = 1
+                mark_used(var_tracker, intern(instr.right.value))
 
         if (instr.instr_type == "IF"):
             # is the condition constant?
             assert (isinstance(instr.res, Token))
-            if (instr.res.type == "NUMBER"):
+            if (instr.res.kind == TokenKind.NUMBER):
                 # remove if and replace with goto
                 if (instr.res.value != '0'):
                     # true, goto left
@@ -96,7 +100,7 @@ def get_variables(block: BasicBlock,
                     instr.res = instr.left
                     instr.left = None
                     instr.right = None
-                    instr.op = Token('GOTO', 'goto')
+                    instr.op = GOTO_OP
                 else:
                     # false, goto right
                     instr.instr_type = "GOTO"
@@ -104,30 +108,32 @@ def get_variables(block: BasicBlock,
                     instr.res = instr.right
                     instr.left = None
                     instr.right = None
-                    instr.op = Token('GOTO', 'goto')
+                    instr.op = GOTO_OP
 
         if (instr.instr_type in ('IF', 'FOR', 'WHILE')):
             # If condition is identifier, mark identifier as used
             if (is_ident(instr.res)):
                 assert (isinstance(instr.res, Token))
-                cond_val = var_tracker.get(instr.res.value)
-                if (cond_val is not None):
-                    var_tracker[instr.res.value] = 1
+                mark_used(var_tracker, intern(instr.res.value))
 
         if (instr.instr_type == 'RETURN'):
             # If return value is identifier, mark identifier as used
             if (is_ident(instr.res)):
                 assert (isinstance(instr.res, Token))
-                ret_val = var_tracker.get(instr.res.value)
-                if (ret_val is not None):
-                    var_tracker[instr.res.value] = 1
+                mark_used(var_tracker, intern(instr.res.value))
     return var_tracker, label_redirects
 
 
+def mark_used(var_tracker: bytearray, var: int) -> None:
+    # Only variables already declared are tracked
+    if (var_tracker[var] != _UNSEEN):
+        var_tracker[var] = _USED
+
+
 def is_ident(instr: Token | str | None) -> bool:
     if (instr is None):
         return False
-    return isinstance(instr, Token) and instr.type == 'IDENTIFIER'
+    return isinstance(instr, Token) and instr.kind == TokenKind.IDENTIFIER
 
 
 def goto_redirect(block: BasicBlock, label_redirects: dict[str, str]) -> None:
@@ -146,7 +152,8 @@ def goto_redirect(block: BasicBlock, label_redirects: dict[str, str]) -> None:
         label_redirects[label_name] = goto_target
 
 
-def remove_unused(tac: TAC, var_tracker: dict, label_redirects: dict) -> None:
+def remove_unused(tac: TAC, var_tracker: bytearray, label_redirects: dict,
+                  intern: Callable[[str], int]) -> None:
     """Remove all marked unused variables and handles goto redirects"""
     for func in tac.functions:
         for block in func.blocks:
@@ -159,8 +166,7 @@ def remove_unused(tac: TAC, var_tracker: dict, label_redirects: dict) -> None:
                 # remove unused decl/assign
                 if (instr.instr_type in ('DECL', 'ASSIGN')):
                     assert (isinstance(instr.res, Token))
-                    res = var_tracker.get(instr.res.value)
-                    if (res == 0):
+                    if (var_tracker[intern(instr.res.value)] == _DECLARED):
                         block.instr_list.remove(instr)
                 # update goto targets
                 if (instr.instr_type == 'GOTO'):
@@ -0,0 +1,181 @@
+from src.errors import SemanticError
+from src.semantic_analyzer import uninitialized_error
+from src.tac import TAC, FunctionBlock, Instruction
+from src.optimizations.cfg import reverse_postorder
+from src.tokens import Token, TokenKind
+
+"""
+Definite initialization of local variables, checked on the control flow
+graph of the TAC instead of the AST.
+
+A variable is initialized at an instruction when every path from the
+function's entry to it assigns the variable, so a branch that assigns on
+both sides, a loop body read before the loop assigns, or a goto past an
+assignment are all judged by the paths the code can really take.
+
+The local names of each function are interned as single bits, so a set of
+initialized variables is one int. Each block keeps the bits it assigns and
+the bits set on entry to it, which is the AND of its predecessors' bits on
+exit. The blocks reachable from the entry are revisited in reverse
+postorder until nothing changes, which is once plus once per level of loop
+nesting, and a last pass over each block reports the reads of a variable
+whose bit is not set.
+"""
+
+_BRANCHES = frozenset({'IF', 'FOR', 'WHILE'})
+# Instructions after which the rest of a block is never reached
+_TERMINATORS = _BRANCHES | {'GOTO', 'RETURN'}
+_INCDEC_KINDS = (TokenKind.INCREMENT, TokenKind.DECREMENT)
+
+
+def check_initialization(tac: TAC) -> None:
+    """Raises the first error uninitialized_uses finds"""
+    errors = uninitialized_uses(tac)
+    if errors:
+        raise errors[0]
+
+
+def uninitialized_uses(tac: TAC) -> list[SemanticError]:
+    """Reads of local variables that are not assigned on every path to them
+
+    One error for the first such read of each variable in each function,
+    in source order
+    """
+    errors = []
+    for func in tac.functions:
+        errors += _function_uses(func)
+    errors.sort(key=lambda err: (err.token.line_num, err.token.char_num))
+    return errors
+
+
+def _local_bits(func: FunctionBlock) -> dict[str, int]:
+    # Every name declared in the function's scopes gets its own bit. Names
+    # shadowed in an inner block share it, like the AST check's name sets
+    name = func.name.value
+    scopes = [scope for scope in func.symbol_table.global_scope.children
+              if scope.name == name]
+    bits: dict[str, int] = {}
+    while scopes:
+        scope = scopes.pop()
+        for symbol_name in scope.symbols:
+            if symbol_name not in bits:
+                bits[symbol_name] = 1 << len(bits)
+        scopes += scope.children
+    return bits
+
+
+def _function_uses(func: FunctionBlock) -> list[SemanticError]:
+    bits = _local_bits(func)
+    blocks = func.blocks
+    if not bits or not blocks:
+        return []
+    count = len(blocks)
+
+    labels = {}
+    for i, block in enumerate(blocks):
+        instrs = block.instr_list
+        if instrs and instrs[0].instr_type == 'LABEL':
+            labels[instrs[0].res] = i
+
+    # Per block, the successors, the bits its reached instructions assign
+    # and how many of its instructions are reached
+    succs: list[list[int]] = []
+    gens: list[int] = []
+    ends: list[int] = []
+    for i, block in enumerate(blocks):
+        instrs = block.instr_list
+        gen = 0
+        succ = None
+        end = len(instrs)
+        for j, instr in enumerate(instrs):
+            kind = instr.instr_type
+            if kind == 'ASSIGN' or kind == 'DECL':
+                gen |= bits.get(instr.res.value, 0)
+            elif kind in _TERMINATORS:
+                if kind == 'GOTO':
+                    targets = (instr.res,)
+                elif kind in _BRANCHES:
+                    targets = (instr.left, instr.right)
+                else:
+                    targets = ()
+                succ = [labels[label] for label in targets if label in labels]
+                end = j + 1
+                break
+        if succ is None:
+            succ = [i + 1] if i + 1 < count else []
+        succs.append(succ)
+        gens.append(gen)
+        ends.append(end)
+
+    order = reverse_postorder(succs)
+    position = [-1] * count
+    for k, block_index in enumerate(order):
+        position[block_index] = k
+    preds: list[list[int]] = [[] for _ in range(count)]
+    for block_index in order:
+        for succ in succs[block_index]:
+            preds[succ].append(block_index)
+
+    # Nothing is known to be initialized on entry, everything is until a
+    # path shows otherwise
+    full = (1 << len(bits)) - 1
+    ins = [0] * count
+    outs = [full] * count
+    pending = [True] * len(order)
+    left = len(order)
+    while left:
+        for k, block_index in enumerate(order):
+            if not pending[k]:
+                continue
+            pending[k] = False
+            left -= 1
+            if block_index == 0:
+                entry = 0
+            else:
+                entry = full
+                for pred in preds[block_index]:
+                    entry &= outs[pred]
+            ins[block_index] = entry
+            out = entry | gens[block_index]
+            if out != outs[block_index]:
+                outs[block_index] = out
+                for succ in succs[block_index]:
+                    if not pending[position[succ]]:
+                        pending[position[succ]] = True
+                        left += 1
+
+    errors = []
+    reported = 0
+    for block_index in sorted(order):
+        instrs = blocks[block_index].instr_list
+        initialized = ins[block_index]
+        for j in range(ends[block_index]):
+            instr = instrs[j]
+            kind = instr.instr_type
+            if kind == 'ASSIGN' or kind == 'DECL' or kind == 'PARAM':
+                reads = (instr.left, instr.right)
+            elif kind in _TERMINATORS:
+                reads = (instr.res,)
+            else:
+                continue
+            for operand in reads:
+                if operand.__class__ is Token and operand.kind == TokenKind.IDENTIFIER:
+                    bit = bits.get(operand.value, 0)
+                    if bit and not (initialized | reported) & bit:
+                        reported |= bit
+                        errors.append(uninitialized_error(operand, _use(instrs, j, operand)))
+            if kind == 'ASSIGN' or kind == 'DECL':
+                initialized |= bits.get(instr.res.value, 0)
+    return errors
+
+
+def _use(instrs: list[Instruction], j: int, operand: Token) -> str:
+    # How the read at instrs[j] appears in the source, for the message
+    instr = instrs[j]
+    if instr.instr_type == 'ASSIGN' and isinstance(instr.op, Token):
+        if instr.op.kind in _INCDEC_KINDS:
+            return 'used in increment/decrement'
+        # x op= y reads x into a temp, then assigns the same token back
+        if any(later.res is operand for later in instrs[j + 1:]):
+            return 'used in compound assignment'
+    return 'used'
@@ -0,0 +1,22 @@
+from src.ir import IRArrays
+from src.tac import TAC
+from src.optimizations.constant_fold import constant_fold
+from src.optimizations.copy_and_constant_propagation import copy_and_constant_propagation
+from src.optimizations.dead_code_elimination import dead_code_elimination
+
+
+def optimize_tac(tac: TAC) -> TAC:
+    """Runs the -o1 passes over tac in rounds until a round changes nothing
+
+    Rounds are compared on the array encoding instead of a copy of the
+    whole TAC per round
+    """
+    snapshot = IRArrays.from_tac(tac)
+    while (True):
+        constant_fold(tac)
+        copy_and_constant_propagation(tac)
+        dead_code_elimination(tac)
+        optimized = IRArrays.from_tac(tac)
+        if (optimized == snapshot):
+            return tac
+        snapshot = optimized
@@ -1,83 +1,90 @@
 from src.tac import TAC, Instruction, Token, BasicBlock
-from src.optimizations.cfg import CFGNode, build_cfg
-import copy
+from src.tokens import TokenKind
+from src.optimizations.cfg import build_cfg
+from typing import Callable, Iterator
 
 # https://www.youtube.com/watch?v=eeXk_ec1n6g
 # https://www.geeksforgeeks.org/dsa/graph-coloring-set-2-greedy-algorithm/
 
-"""Generates an InterferenceGraph and tracks variable liveness"""
+"""
+Generates an InterferenceGraph and tracks variable liveness
+
+Variables are name IDs from the TAC's NameTable. Liveness gives the
+variables of each function bits of their own, in the order the function
+first uses them, so every live set is one int.
+"""
 
 
 class InterferenceGraph:
     """Holds edges and nodes for variable interference"""
 
-    def __init__(self):
-        self.edges: set[tuple[str, str]] = set()
-        self.nodes: set[str] = set()
+    def __init__(self, size: int):
+        # Neighbors of each name ID, None for IDs that are not nodes
+        self.neighbors: list[set[int] | None] = [None] * size
+
+    @property
+    def nodes(self) -> list[int]:
+        return [var for var, adjacent in enumerate(self.neighbors) if adjacent is not None]
 
-    def add_node(self, var: str) -> None:
-        self.nodes.add(var)
+    def add_node(self, var: int) -> None:
+        if self.neighbors[var] is None:
+            self.neighbors[var] = set()
 
-    def add_edge(self, var1: str, var2: str) -> None:
+    def add_edge(self, var1: int, var2: int) -> None:
         if (var1 == var2):
             return
-        if (var2, var1) in self.edges:
-            return
-        self.edges.add((var1, var2))
-        self.nodes.add(var1)
-        self.nodes.add(var2)
+        self.add_node(var1)
+        self.add_node(var2)
+        self.neighbors[var1].add(var2)
+        self.neighbors[var2].add(var1)
 
 
-def register_optimization(tac: TAC) -> dict[str, int]:
-    """Takes in a Three Adress Code and finds close to optimal register allocation"""
+def register_optimization(tac: TAC) -> list[int]:
+    """Takes in a Three Adress Code and finds close to optimal register allocation
+
+    Returns the register number of each name ID, -1 for IDs without one
+    """
     funcs_live_list = liveness_analysis(tac)
     func_list = tac.functions
-    graph = InterferenceGraph()
+    names = tac.names
+    graph = InterferenceGraph(len(names))
     # building interference graph
-    for func_block, live_list in zip(func_list, funcs_live_list):
+    for func_block, (live_list, local_ids) in zip(func_list, funcs_live_list):
+        # Paramaters are filtered out
+        params = 0
+        for bit, var in enumerate(local_ids):
+            if names.name_of(var).startswith('%param'):
+                params |= 1 << bit
+        # Bits of the variables each defined variable interferes with
+        interferes: dict[int, int] = {}
         instr_list = [instr
                       for block in func_block.blocks
                       for instr in block.instr_list]
         for instr, liveness in zip(instr_list, live_list):
-            out_set = liveness[1]
             defined_var = def_var(instr)
             if (defined_var is None):
                 continue
             # Filter out paramaters
             if (defined_var.startswith('%param')):
                 continue
-            graph.add_node(defined_var)
-            for out_var in out_set:
-                if (out_var.startswith('%param')):
-                    continue
-                if (out_var != defined_var):
-                    graph.add_edge(defined_var, out_var)
+            var = names.intern(defined_var)
+            interferes[var] = interferes.get(var, 0) | liveness[1]
+        for var, out_bits in interferes.items():
+            graph.add_node(var)
+            for bit in _set_bits(out_bits & ~params):
+                graph.add_edge(var, local_ids[bit])
     return greedy_reg_alloc(graph)
 
 
-def greedy_reg_alloc(graph:  InterferenceGraph) -> dict[str, int]:
+def greedy_reg_alloc(graph: InterferenceGraph) -> list[int]:
     """Finds greedy solution to graph coloring problem"""
-    # helper funciton to sort edges
-    def get_edges(node: str):
-        return num_edges[node]
-    edges: dict[str, set[str]] = dict()
-    # make sure isolated nodes have a set
-    for node in graph.nodes:
-        edges[node] = set()
-    for left, right in graph.edges:
-        edges[left].add(right)
-        edges[right].add(left)
+    neighbors = graph.neighbors
     # Calculate and sort variables by number of edges
-    num_edges = {}
-    for node in graph.nodes:
-        num_edges[node] = len(edges[node])
-    num_edges_sorted = sorted(graph.nodes, key=get_edges, reverse=True)
-    registers: dict[str, int] = dict()
+    num_edges_sorted = sorted(graph.nodes, key=lambda node: len(neighbors[node]), reverse=True)
+    registers = [-1] * len(neighbors)
     # Allocated registers and "color graph"
     for node in num_edges_sorted:
-        reserved = {registers[reg_id]
-                    for reg_id in edges[node]
-                    if reg_id in registers}
+        reserved = {registers[reg_id] for reg_id in neighbors[node]}
         reg_id = 0
         while reg_id in reserved:
             reg_id += 1
@@ -94,117 +101,113 @@ def def_var(instr: Instruction) -> str | None:
         return None
 
 
+def _set_bits(bits: int) -> Iterator[int]:
+    """Indexes of the set bits of bits, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
 # Return is too jumbled for useful information from type hints
-def liveness_analysis(tac: TAC) -> list[list]:
-    """Finds liveness of blocks then individual instructions"""
+def liveness_analysis(tac: TAC) -> list[tuple[list, list[int]]]:
+    """Finds liveness of blocks then individual instructions
+
+    Per function, the (in, out) bits of each instruction and the name ID
+    of each bit
+    """
     cfg = build_cfg(tac)
+    names = tac.names
+    # Bit of each name ID in the current function, -1 for none yet
+    slots = [-1] * len(names)
     funcs_live_list = []
     # loop over every function's basic blocks
     for node_list in cfg:
         if (len(node_list) == 0):
             continue
-        # reverse list to do bottom up liveness for basic blocks
-        rev_node_list = copy.copy(node_list)
-        rev_node_list.reverse()
-        # dicts to hold CFGNode to liveness mappings
-        block_liveness_prev: dict[CFGNode, list[set[str]]] = dict()
-        block_liveness: dict[CFGNode, list[set[str]]] = dict()
-        while True:
-            # for ever basic block
-            for node in rev_node_list:
-                defined, used = track_variables_block(node.block)
-                # list of successors of current block
-                succ_list: list[CFGNode] = node.succ
-                out_set: set[str] = set()
-                # get all successors in variables
-                for succ in succ_list:
-                    succ_in = block_liveness.get(succ)
-                    if succ_in:
-                        out_set = out_set.union(succ_in[0])
-                # get all in variables for this block
-                in_set: set[str] = used.union(out_set - defined)
-                block_liveness[node] = [in_set, out_set]
-            if (block_liveness == block_liveness_prev):
-                break
-            block_liveness_prev = copy.copy(block_liveness)
+        local_ids: list[int] = []
+
+        def bit_of(name: str) -> int:
+            var = names.intern(name)
+            if var >= len(slots):
+                slots.extend([-1] * (var + 1 - len(slots)))
+            bit = slots[var]
+            if bit < 0:
+                bit = slots[var] = len(local_ids)
+                local_ids.append(var)
+            return 1 << bit
+
+        # defined and used bits of every instruction, then of every block
+        lines = [[track_variables_line(instr, bit_of) for instr in node.block.instr_list]
+                 for node in node_list]
+        blocks = [track_variables_block(line) for line in lines]
+        index = {node: i for i, node in enumerate(node_list)}
+        succs = [[index[succ] for succ in node.succ] for node in node_list]
+        # bottom up liveness for basic blocks, until nothing changes
+        block_in = [0] * len(node_list)
+        block_out = [0] * len(node_list)
+        changed = True
+        while changed:
+            changed = False
+            for i in reversed(range(len(node_list))):
+                defined, used = blocks[i]
+                out_bits = 0
+                for succ in succs[i]:
+                    out_bits |= block_in[succ]
+                in_bits = used | (out_bits & ~defined)
+                if in_bits != block_in[i] or out_bits != block_out[i]:
+                    block_in[i] = in_bits
+                    block_out[i] = out_bits
+                    changed = True
         # Get liveness for each line inside each block
-        line_liveness: list[tuple[set[str], set[str]]] = []
-        # Travel every instruction once
-        for node in node_list:
-            # Get instruction list and traverse it bottom up
-            instr_list = copy.copy(node.block.instr_list)
-            instr_list.reverse()
+        line_liveness: list[tuple[int, int]] = []
+        for i, line in enumerate(lines):
+            # traverse the block bottom up from the block's out bits
             instr_liveness = []
-            # Set out for last instruction as out for block
-            out_set = block_liveness[node][1]
-            for instr in instr_list:
-                defined, used = track_variables_line(instr)
-                in_set: set[str] = used.union(out_set - defined)
-                instr_liveness.append((in_set, out_set))
-                out_set = copy.copy(in_set)
+            out_bits = block_out[i]
+            for defined, used in reversed(line):
+                in_bits = used | (out_bits & ~defined)
+                instr_liveness.append((in_bits, out_bits))
+                out_bits = in_bits
             instr_liveness.reverse()
-            # Track line liveness by index of line_liveness
             line_liveness += instr_liveness
-        funcs_live_list.append(line_liveness)
+        for var in local_ids:
+            slots[var] = -1
+        funcs_live_list.append((line_liveness, local_ids))
     return funcs_live_list
 
 
-def track_variables_line(instr: Instruction) -> tuple[set[str], set[str]]:
-    """Track used and defined for a single instruction"""
-    defined: set[str] = set()
-    used: set[str] = set()
+def track_variables_line(instr: Instruction,
+                         bit_of: Callable[[str], int]) -> tuple[int, int]:
+    """Track used and defined bits for a single instruction"""
+    defined = 0
+    used = 0
     if (instr.instr_type in ('DECL', 'ASSIGN')):
-        if (not_in_dic(instr.left, defined)):
+        if (is_variable(instr.left)):
             assert (isinstance(instr.left, Token))
-            used.add(instr.left.value)
-        if (not_in_dic(instr.right, defined)):
+            used |= bit_of(instr.left.value)
+        if (is_variable(instr.right)):
             assert (isinstance(instr.right, Token))
-            used.add(instr.right.value)
+            used |= bit_of(instr.right.value)
         assert (isinstance(instr.res, Token))
-        defined.add(instr.res.value)
-    if instr.instr_type in ('IF', 'FOR', 'WHILE'):
-        if not_in_dic(instr.res, defined):
+        defined |= bit_of(instr.res.value)
+    if instr.instr_type in ('IF', 'FOR', 'WHILE', 'RETURN'):
+        if is_variable(instr.res):
             assert (isinstance(instr.res, Token))
-            used.add(instr.res.value)
-    if (instr.instr_type == 'RETURN'):
-        if (not_in_dic(instr.res, defined)):
-            assert (isinstance(instr.res, Token))
-            used.add(instr.res.value)
+            used |= bit_of(instr.res.value)
     return defined, used
 
 
-def track_variables_block(block: BasicBlock) -> tuple[set[str], set[str]]:
-    """Track used and defined for entire block"""
-    defined: set[str] = set()
-    used: set[str] = set()
-    for instr in block.instr_list:
-        if (instr.instr_type in ('DECL', 'ASSIGN')):
-            if (not_in_dic(instr.left, defined)):
-                assert (isinstance(instr.left, Token))
-                used.add(instr.left.value)
-            if (not_in_dic(instr.right, defined)):
-                assert (isinstance(instr.right, Token))
-                used.add(instr.right.value)
-            assert (isinstance(instr.res, Token))
-            defined.add(instr.res.value)
-        if instr.instr_type in ('IF', 'FOR', 'WHILE'):
-            if not_in_dic(instr.res, defined):
-                assert (isinstance(instr.res, Token))
-                used.add(instr.res.value)
-        if (instr.instr_type == 'RETURN'):
-            if (not_in_dic(instr.res, defined)):
-                assert (isinstance(instr.res, Token))
-                used.add(instr.res.value)
+def track_variables_block(line: list[tuple[int, int]]) -> tuple[int, int]:
+    """Track used and defined bits for entire block from those of its lines"""
+    defined = 0
+    used = 0
+    for line_defined, line_used in line:
+        # A use after the block defines the variable is not seen from outside
+        used |= line_used & ~defined
+        defined |= line_defined
     return defined, used
 
 
-def not_in_dic(instr: Token | str | None,
-               defined: set[str]
-               ) -> bool:
-    if (instr is None
-       or not isinstance(instr, Token)
-       or instr.type != 'IDENTIFIER'
-       or not hasattr(instr, 'value')
-       or instr.value in defined):
-        return False
-    return True
+def is_variable(instr: Token | str | None) -> bool:
+    return isinstance(instr, Token) and instr.kind == TokenKind.IDENTIFIER
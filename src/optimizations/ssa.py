@@ -0,0 +1,404 @@
+from typing import Callable
+from src.interning import NameTable
+from src.tac import FunctionBlock, BasicBlock, Instruction, LABEL_OP, GOTO_OP
+from src.tokens import Token, TokenKind, IDENTIFIER
+from src.optimizations.cfg import reverse_postorder
+
+"""
+Static single assignment form of a FunctionBlock
+
+construct_ssa rewrites a function in place so every variable is assigned
+once. The n-th assignment of x defines x.n, '.' is not part of any C name,
+and a read of x before any assignment keeps the name x, the value on entry.
+Where control flow merges, a PHI instruction after the block's LABEL picks
+the version coming from each predecessor:
+    PHI     res=<new version>, left=<list of versions, one per ssa.preds[block]>
+Only names read in some block before that block assigns them get PHIs
+(semi-pruned SSA), and globals are left alone since their value outlives
+the function.
+
+Before that, instructions after a block's first terminator and blocks that
+can not be reached are removed, and every edge from a branch to a block
+with several predecessors is split with a block of its own, so the copies
+out of SSA have somewhere to go.
+
+destruct_ssa replaces the PHIs of each block with copies at the end of its
+predecessors. The copies for one edge happen at once, so they are ordered
+and a cycle such as a swap goes through a fresh %swap temp.
+"""
+
+_BRANCHES = frozenset({'IF', 'FOR', 'WHILE'})
+_TERMINATORS = _BRANCHES | {'GOTO', 'RETURN'}
+_DEFINES = frozenset({'ASSIGN', 'DECL', 'CALL'})
+# Instructions that read their left and right operands, the rest of the
+# non-PHI instructions that read anything read their res
+_READS_OPERANDS = frozenset({'ASSIGN', 'DECL', 'PARAM'})
+
+
+class SSAForm:
+    """A function in SSA form and the control flow facts it was built from
+
+    Blocks are indexes into func.blocks. order is the reverse postorder from
+    the entry, idom the immediate dominator of each block (the entry is its
+    own) and frontiers the dominance frontier of each block.
+    """
+
+    def __init__(self, func: FunctionBlock, names: NameTable):
+        self.func = func
+        self.names = names
+        self.succs = _successors(func.blocks)
+        self.preds: list[list[int]] = [[] for _ in func.blocks]
+        for block, succs in enumerate(self.succs):
+            for succ in succs:
+                self.preds[succ].append(block)
+        self.order = reverse_postorder(self.succs)
+        self.idom = immediate_dominators(self.preds, self.order)
+        self.frontiers = dominance_frontiers(self.preds, self.idom)
+        self.children: list[list[int]] = [[] for _ in func.blocks]
+        for block in self.order[1:]:
+            self.children[self.idom[block]].append(block)
+        # The PHIs of each block and the variable each one merges
+        self.phis: list[list[Instruction]] = [[] for _ in func.blocks]
+        self.phi_vars: list[list[str]] = [[] for _ in func.blocks]
+        # Variables given versions, every local the function assigns
+        self.renamed: set[str] = set()
+
+
+def construct_ssa(func: FunctionBlock, names: NameTable) -> SSAForm:
+    """Rewrites func into SSA form, see the module docstring"""
+    _remove_unreachable(func)
+    _split_critical_edges(func, names)
+    ssa = SSAForm(func, names)
+    _place_phis(ssa)
+    _rename(ssa)
+    return ssa
+
+
+def destruct_ssa(ssa: SSAForm) -> FunctionBlock:
+    """Turns the PHIs of ssa back into ordinary copies, returns the function"""
+    blocks = ssa.func.blocks
+    fresh = _FreshNames(ssa.func, ssa.names, '%swap')
+    for block, phis in enumerate(ssa.phis):
+        if not phis:
+            continue
+        for i, pred in enumerate(ssa.preds[block]):
+            copies = sequentialize_copies([(phi.res, phi.left[i]) for phi in phis], fresh.token)
+            instrs = blocks[pred].instr_list
+            # A predecessor of a block with PHIs ends in a goto or falls through
+            at = len(instrs) - 1 if instrs and instrs[-1].instr_type == 'GOTO' else len(instrs)
+            instrs[at:at] = [Instruction('ASSIGN', dst, src) for dst, src in copies]
+        instrs = blocks[block].instr_list
+        del instrs[1:1 + len(phis)]
+        ssa.phis[block] = []
+        ssa.phi_vars[block] = []
+    return ssa.func
+
+
+def sequentialize_copies(copies: list[tuple[Token, Token]],
+                         new_temp: Callable[[], Token]) -> list[tuple[Token, Token]]:
+    """Orders copies that happen at once into (dst, src) copies done one by one
+
+    Every dst is a different variable. A copy waits until nothing still
+    reads its dst, and a cycle is broken by saving one value in a temp from
+    new_temp
+    """
+    # Where the value each source had before the copies is now, and the
+    # source of each destination
+    loc: dict[str, Token] = {}
+    pred: dict[str, Token] = {}
+    dst_of: dict[str, Token] = {}
+    for dst, src in copies:
+        if dst.value == src.value:
+            continue
+        loc[src.value] = src
+        pred[dst.value] = src
+        dst_of[dst.value] = dst
+    ready = [dst for dst in reversed(dst_of) if dst not in loc]
+    todo = list(dst_of)
+    result = []
+    while todo:
+        while ready:
+            dst = ready.pop()
+            src = pred[dst]
+            current = loc[src.value]
+            result.append((dst_of[dst], current))
+            loc[src.value] = dst_of[dst]
+            # The old value of src is kept in dst now, so src can be overwritten
+            if current.value == src.value and src.value in pred:
+                ready.append(src.value)
+        dst = todo.pop()
+        if loc[pred[dst].value].value != dst:
+            # dst is on a cycle, save its value and copy into it
+            temp = new_temp()
+            result.append((temp, dst_of[dst]))
+            loc[dst] = temp
+            ready.append(dst)
+    return result
+
+
+def immediate_dominators(preds: list[list[int]], order: list[int]) -> list[int]:
+    """The immediate dominator of each block in order, -1 for blocks not in it
+
+    Cooper, Harvey and Kennedy's iteration over the reverse postorder
+    """
+    position = [-1] * len(preds)
+    for k, block in enumerate(order):
+        position[block] = k
+    idom = [-1] * len(preds)
+    entry = order[0]
+    idom[entry] = entry
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            new_idom = -1
+            for pred in preds[block]:
+                if idom[pred] < 0:
+                    continue
+                if new_idom < 0:
+                    new_idom = pred
+                    continue
+                # Walk both up the dominator tree until they meet
+                finger = pred
+                while finger != new_idom:
+                    while position[finger] > position[new_idom]:
+                        finger = idom[finger]
+                    while position[new_idom] > position[finger]:
+                        new_idom = idom[new_idom]
+            if idom[block] != new_idom:
+                idom[block] = new_idom
+                changed = True
+    return idom
+
+
+def dominance_frontiers(preds: list[list[int]], idom: list[int]) -> list[set[int]]:
+    """The blocks where each block's dominance ends, from the merge points up"""
+    frontiers: list[set[int]] = [set() for _ in preds]
+    for block, block_preds in enumerate(preds):
+        if len(block_preds) < 2 or idom[block] < 0:
+            continue
+        for pred in block_preds:
+            runner = pred
+            while runner != idom[block] and idom[runner] >= 0:
+                frontiers[runner].add(block)
+                runner = idom[runner]
+    return frontiers
+
+
+class _FreshNames:
+    """Hands out names with prefix that the function does not use yet"""
+
+    def __init__(self, func: FunctionBlock, names: NameTable, prefix: str):
+        self.names = names
+        self.prefix = prefix
+        self.used = {operand.value if isinstance(operand, Token) else operand
+                     for block in func.blocks for instr in block.instr_list
+                     for operand in (instr.res, instr.left, instr.right)
+                     if isinstance(operand, (Token, str))}
+        self.count = 0
+
+    def name(self) -> str:
+        while True:
+            name = f'{self.prefix}{self.count}'
+            self.count += 1
+            if name not in self.used:
+                self.used.add(name)
+                self.names.intern(name)
+                return name
+
+    def token(self) -> Token:
+        return Token(IDENTIFIER, self.name())
+
+
+def _successors(blocks: list[BasicBlock]) -> list[list[int]]:
+    # Blocks end at their first terminator, _remove_unreachable makes sure
+    labels = {}
+    for i, block in enumerate(blocks):
+        instrs = block.instr_list
+        if instrs and instrs[0].instr_type == 'LABEL':
+            labels[instrs[0].res] = i
+    succs = []
+    for i, block in enumerate(blocks):
+        last = block.instr_list[-1] if block.instr_list else None
+        kind = last.instr_type if last is not None else None
+        if kind == 'GOTO':
+            targets = [labels[last.res]]
+        elif kind in _BRANCHES:
+            targets = [labels[last.left]]
+            if last.right != last.left:
+                targets.append(labels[last.right])
+        elif kind == 'RETURN':
+            targets = []
+        else:
+            targets = [i + 1] if i + 1 < len(blocks) else []
+        succs.append(targets)
+    return succs
+
+
+def _remove_unreachable(func: FunctionBlock) -> None:
+    # Drops what follows each block's first terminator, then the blocks no
+    # path from the entry reaches
+    if not func.blocks:
+        func.blocks.append(BasicBlock())
+    for block in func.blocks:
+        instrs = block.instr_list
+        for j, instr in enumerate(instrs):
+            if instr.instr_type in _TERMINATORS:
+                del instrs[j + 1:]
+                break
+    reached = set(reverse_postorder(_successors(func.blocks)))
+    func.blocks = [block for i, block in enumerate(func.blocks) if i in reached]
+
+
+def _split_critical_edges(func: FunctionBlock, names: NameTable) -> None:
+    # A branch to a block with several predecessors goes through a new
+    # block instead, placed right after the branch which never falls through
+    succs = _successors(func.blocks)
+    pred_count = [0] * len(func.blocks)
+    for targets in succs:
+        for succ in targets:
+            pred_count[succ] += 1
+    fresh = _FreshNames(func, names, '%E')
+    blocks = []
+    for i, block in enumerate(func.blocks):
+        blocks.append(block)
+        last = block.instr_list[-1] if block.instr_list else None
+        if last is None or last.instr_type not in _BRANCHES:
+            continue
+        split = {}
+        for succ in succs[i]:
+            if pred_count[succ] < 2:
+                continue
+            target = func.blocks[succ].instr_list[0].res
+            label = fresh.name()
+            edge = BasicBlock()
+            edge.instr_list = [Instruction('LABEL', label, None, None, LABEL_OP),
+                               Instruction('GOTO', target, None, None, GOTO_OP)]
+            blocks.append(edge)
+            split[target] = label
+        if split:
+            last.left = split.get(last.left, last.left)
+            last.right = split.get(last.right, last.right)
+    func.blocks = blocks
+
+
+def _is_local(operand, renamed: set[str]) -> bool:
+    return (operand.__class__ is Token and operand.kind == TokenKind.IDENTIFIER
+            and operand.value in renamed)
+
+
+def _global_names(func: FunctionBlock) -> set[str]:
+    table = func.symbol_table
+    if table is None:
+        return set()
+    return {name for name, symbol in table.global_scope.symbols.items()
+            if symbol.data.get('kind') == 'global'}
+
+
+def _place_phis(ssa: SSAForm) -> None:
+    blocks = ssa.func.blocks
+    globals_ = _global_names(ssa.func)
+    # Blocks assigning each variable, in order of first assignment, and the
+    # variables some block reads before assigning them
+    def_blocks: dict[str, list[int]] = {}
+    live_across: set[str] = set()
+    for block in ssa.order:
+        assigned = set()
+        for instr in blocks[block].instr_list:
+            kind = instr.instr_type
+            if kind in _READS_OPERANDS:
+                reads = (instr.left, instr.right)
+            elif kind in _TERMINATORS:
+                reads = (instr.res,)
+            else:
+                reads = ()
+            for operand in reads:
+                if (operand.__class__ is Token and operand.kind == TokenKind.IDENTIFIER
+                        and operand.value not in assigned):
+                    live_across.add(operand.value)
+            if kind in _DEFINES and instr.res.__class__ is Token:
+                name = instr.res.value
+                if name in globals_:
+                    continue
+                assigned.add(name)
+                sites = def_blocks.setdefault(name, [])
+                if not sites or sites[-1] != block:
+                    sites.append(block)
+    ssa.renamed = set(def_blocks)
+    for name, sites in def_blocks.items():
+        if name not in live_across:
+            continue
+        has_phi = set()
+        queued = set(sites)
+        work = list(sites)
+        while work:
+            block = work.pop()
+            for frontier in sorted(ssa.frontiers[block]):
+                if frontier in has_phi:
+                    continue
+                has_phi.add(frontier)
+                var = Token(IDENTIFIER, name)
+                ssa.phis[frontier].append(
+                    Instruction('PHI', var, [var] * len(ssa.preds[frontier])))
+                ssa.phi_vars[frontier].append(name)
+                if frontier not in queued:
+                    queued.add(frontier)
+                    work.append(frontier)
+    for block, phis in enumerate(ssa.phis):
+        # Merge points are jumped to, so they start with their LABEL
+        blocks[block].instr_list[1:1] = phis
+
+
+def _rename(ssa: SSAForm) -> None:
+    blocks = ssa.func.blocks
+    names = ssa.names
+    renamed = ssa.renamed
+    counters = dict.fromkeys(renamed, 0)
+    # The current version of each variable, the original name before any
+    stacks: dict[str, list[Token]] = {name: [] for name in renamed}
+    pred_index = [{pred: i for i, pred in enumerate(preds)} for preds in ssa.preds]
+
+    def current(operand):
+        if _is_local(operand, renamed):
+            stack = stacks[operand.value]
+            if stack:
+                return stack[-1]
+        return operand
+
+    def define(operand: Token, pushed: list[str]) -> Token:
+        name = operand.value
+        counters[name] += 1
+        version = f'{name}.{counters[name]}'
+        names.intern(version)
+        token = Token(IDENTIFIER, version, operand.line_num, operand.char_num)
+        stacks[name].append(token)
+        pushed.append(name)
+        return token
+
+    work: list[tuple[int, list[str] | None]] = [(ssa.order[0], None)]
+    while work:
+        block, pushed = work.pop()
+        if pushed is not None:
+            # Leaving the block's dominator subtree
+            for name in pushed:
+                stacks[name].pop()
+            continue
+        pushed = []
+        for instr in blocks[block].instr_list:
+            kind = instr.instr_type
+            if kind == 'PHI':
+                instr.res = define(instr.res, pushed)
+                continue
+            if kind in _READS_OPERANDS:
+                instr.left = current(instr.left)
+                instr.right = current(instr.right)
+            elif kind in _TERMINATORS:
+                instr.res = current(instr.res)
+            if kind in _DEFINES and _is_local(instr.res, renamed):
+                instr.res = define(instr.res, pushed)
+        for succ in ssa.succs[block]:
+            i = pred_index[succ][block]
+            for phi, name in zip(ssa.phis[succ], ssa.phi_vars[succ]):
+                phi.left[i] = current(Token(IDENTIFIER, name))
+        work.append((block, pushed))
+        work.extend((child, None) for child in reversed(ssa.children[block]))
@@ -1,13 +1,24 @@
-﻿from typing import List, Optional, Sequence
+﻿import asyncio
+import gc
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from types import GeneratorType
+from typing import Generator, Iterable, Iterator, List, Optional
+from src.ast_arena import Arena
 from src.errors import ParserError
 from src.tokens import (
     Token,
-    DECLARATION_SPECIFIERS,
-    TYPE_SPECIFIERS,
-    TOKEN_PREC,
-    PREFIX_OPERATORS,
-    POSTFIX_OPERATORS,
-    ASSIGNMENT_TOKENS
+    TokenKind,
+    TokenStream,
+    DECLARATION_SPECIFIER_KINDS,
+    TYPE_SPECIFIER_KINDS,
+    PRECEDENCE,
+    PREFIX_PRECEDENCE,
+    PREFIX_KINDS,
+    POSTFIX_KINDS,
+    ASSIGNMENT_KINDS
 )
 from src.ast_nodes import (
     Program,
@@ -47,39 +58,121 @@ from src.ast_nodes import (
 # AST tree is generated using custom classes found in ast_nodes.py
 # There is not a direct 1 to 1 on ast_node classes and grammer rules
 
+# Token classes tested against the current token's kind
+_LITERAL_KINDS = frozenset({TokenKind.NUMBER, TokenKind.STRING_LITERAL, TokenKind.CHAR_LITERAL})
+_DECLARATION_START_KINDS = DECLARATION_SPECIFIER_KINDS | TYPE_SPECIFIER_KINDS
+_INCDEC_KINDS = frozenset({TokenKind.INCREMENT, TokenKind.DECREMENT})
+_SWITCH_LABEL_KINDS = frozenset({TokenKind.CASE, TokenKind.DEFAULT})
+_SWITCH_SECTION_END_KINDS = _SWITCH_LABEL_KINDS | {TokenKind.RBRACE}
+# Argument and initializer expressions stop at a comma
+_ASSIGNMENT_PRECEDENCE = PRECEDENCE[TokenKind.COMMA] + 1
+
+# Expression parser frame actions, see Parser._expression
+_BINARY = 0
+_PREFIX = 1
+_PAREN = 2
+_CALL = 3
+
+# Consumed tokens kept behind the current position before the buffer is trimmed
+_BUFFER_TRIM = 256
+
+# Pause position of a parse that does not pause
+_NEVER = float('inf')
+
+
 class Parser:
-    '''Takes in a list of lexime tokens and returns a list of ast nodes'''
+    '''Takes in a stream of lexime tokens and returns a list of ast nodes'''
 
-    def __init__(self, tokens: List[Token]):
-        self.tokens = tokens
+    def __init__(self, tokens: Iterable[Token], lazy_bodies: bool = False):
+        # Tokens are pulled from the stream on demand into a small lookahead
+        # buffer, self._base is the absolute position of self._buffer[0]
+        self._stream = iter(tokens)
+        self._buffer: List[Token] = []
+        self._base = 0
+        # Positions that may be rewound to, tokens after the oldest are kept
+        self._marks: List[int] = []
         self.pos = 0
+        # Tokens parsed again after rewinding to a mark
+        self.backtracked_tokens = 0
         self.last_error: Optional[Token] = None
+        # A TokenStream can show the offending source line in errors
+        self.source_lines = tokens.lines if isinstance(
+            tokens, TokenStream) else None
+        # Lazy mode records function bodies and parses them on first access,
+        # by index range when the tokens can be indexed again later
+        self.lazy_bodies = lazy_bodies
+        self._sequence = tokens if isinstance(tokens, (list, TokenStream)) else None
+        # Stepped parsing pauses once self.pos reaches _pause_at, see parse_steps
+        self._step_tokens = 0
+        self._pause_at = _NEVER
 # Helper functions
 
+    def _fill(self, index: int) -> bool:
+        # Pulls tokens until buffer index exists, False if the stream ran out
+        while index >= len(self._buffer):
+            tok = next(self._stream, None)
+            if tok is None:
+                return False
+            self._buffer.append(tok)
+        return True
+
+    def _trim(self) -> None:
+        keep = self._marks[0] if self._marks else self.pos
+        drop = keep - self._base
+        if drop >= _BUFFER_TRIM:
+            del self._buffer[:drop]
+            self._base = keep
+
+    def _mark(self) -> int:
+        self._marks.append(self.pos)
+        return self.pos
+
+    def _release(self) -> None:
+        self._marks.pop()
+
+    def _rewind(self, start: int) -> None:
+        # Returns to a mark, the tokens since it will be consumed again
+        self.backtracked_tokens += self.pos - start
+        self.pos = start
+        self._release()
+
     def _cur(self) -> Token:
-        if self.pos >= len(self.tokens):
-            return self.tokens[-1]
-        return self.tokens[self.pos]
+        index = self.pos - self._base
+        if index < len(self._buffer) or self._fill(index):
+            return self._buffer[index]
+        return self._buffer[-1]
 
     def _advance(self) -> Token:
-        if self.pos < len(self.tokens) - 1:
+        index = self.pos - self._base + 1
+        if index < len(self._buffer) or self._fill(index):
             self.pos += 1
+            if index >= _BUFFER_TRIM:
+                self._trim()
         return self._cur()
 
-    def _match(self, *types: str) -> bool:
-        tok = self._cur()
-        if tok.type in types:
-            return True
-        return False
+    def _match(self, kind: TokenKind) -> bool:
+        return self._cur().kind == kind
+
+    def _match_in(self, kinds: frozenset[TokenKind]) -> bool:
+        return self._cur().kind in kinds
 
     def _peek(self) -> Token:
-        if self.pos + 1 >= len(self.tokens):
-            return self.tokens[self.pos + 1]
-        return self.tokens[self.pos + 1]
+        index = self.pos - self._base + 1
+        if self._fill(index):
+            return self._buffer[index]
+        return self._buffer[-1]
 
-    def _expect(self, types: Sequence[str]) -> Optional[Token]:
+    def _expect(self, kind: TokenKind) -> Optional[Token]:
         tok = self._cur()
-        if tok.type not in types:
+        if tok.kind != kind:
+            self.last_error = tok
+            return None
+        self._advance()
+        return tok
+
+    def _expect_in(self, kinds: frozenset[TokenKind]) -> Optional[Token]:
+        tok = self._cur()
+        if tok.kind not in kinds:
             self.last_error = tok
             return None
         self._advance()
@@ -89,64 +182,188 @@ class Parser:
     def parse(self) -> Program:
         return self._program()
 
+    def parse_steps(self, step_tokens: int = 4096) -> Generator[int, None, Program]:
+        """Parses like parse() in steps of about step_tokens tokens
+
+        A generator that pauses between statements once step_tokens more
+        tokens are consumed, yielding the number consumed so far, and returns
+        the Program. The rules waiting on a statement are already kept on an
+        explicit stack, so nothing is lost while paused. A single statement
+        longer than step_tokens is still parsed in one step.
+        """
+        self._step_tokens = step_tokens
+        self._pause_at = self.pos + step_tokens
+        try:
+            translation_units = []
+            while self._cur().kind != TokenKind.EOF:
+                unit = yield from self._translation_unit()
+                if unit is None:
+                    self._raise_error()
+                translation_units.append(unit)
+                yield from self._pause()
+            return Program(translation_units)
+        finally:
+            self._pause_at = _NEVER
+
+    async def parse_async(self, step_tokens: int = 4096) -> Program:
+        """Parses like parse(), letting the event loop run between steps
+
+        Each step of parse_steps is followed by asyncio.sleep(0), so parse
+        jobs and other tasks on one loop take turns every step_tokens tokens.
+        Tokens lexed on demand are lexed within the steps as well.
+        """
+        steps = self.parse_steps(step_tokens)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as stop:
+                return stop.value
+            await asyncio.sleep(0)
+
+    def parse_parallel(self, workers: Optional[int] = None) -> Program:
+        """Parses function bodies on a pool of worker processes
+
+        The top level is parsed here with bodies skipped, then the bodies are
+        batched into chunks and parsed by up to workers processes, os.cpu_count()
+        by default. Returns the same Program parse() does, and raises the same
+        ParserError for the first error in source order.
+        """
+        workers = workers or os.cpu_count() or 1
+        self.lazy_bodies = True
+        units = []
+        while self._cur().kind != TokenKind.EOF:
+            unit = self._run(self._translation_unit())
+            if unit is None:
+                # Any error in an earlier body comes first
+                for unit in units:
+                    if type(unit) is LazyFunctionDefinition:
+                        unit.func_body
+                self._raise_error()
+            units.append(unit)
+
+        lazy = [unit for unit in units if type(unit) is LazyFunctionDefinition]
+        if workers > 1 and len(lazy) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(_body_chunks(lazy, workers))
+                results = pool.map(_parse_chunk, [payload for _, _, payload in chunks])
+                try:
+                    for (chunk, tokens, _), arrays in zip(chunks, results):
+                        bodies = Arena.from_arrays(*arrays, tokens).to_ast()
+                        for unit, body in zip(chunk, bodies):
+                            unit.func_body = body
+                except ParserError as err:
+                    err.source_lines = self.source_lines
+                    raise
+        for index, unit in enumerate(units):
+            if type(unit) is LazyFunctionDefinition:
+                units[index] = FunctionDefinition(
+                    unit.func_type, unit.func_ident, unit.func_param, unit.func_body)
+        return Program(units)
+
+    # Parses the tokens of a single "{" ... "}" function body
+    def parse_body(self) -> CompoundStatement:
+        body = self._compound_statement()
+        if body is None:
+            self._raise_error()
+        return body
+
+    def _run(self, steps):
+        # Runs a parsing generator outside parse_steps, where it never pauses
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+        raise AssertionError('parser paused outside parse_steps')
+
+    def _pause(self):
+        # Yields to the parse_steps caller once the step's tokens are consumed
+        if self.pos >= self._pause_at:
+            self._pause_at = self.pos + self._step_tokens
+            yield self.pos
+
+    def _raise_error(self):
+        # Statement parsers can fail without a failed expect, so fall back
+        # to the current token for the location
+        token = self.last_error or self._cur()
+        raise ParserError(
+            f'There was an error parsing token {token} at pos {self.pos} cur {self._cur()}',
+            token,
+            self.source_lines
+        )
+
+    def iter_units(self) -> Iterator[FunctionDefinition | FunctionDeclaration | DeclarationStatement]:
+        """Parses like parse(), yielding each translation unit once it is parsed
+
+        The token buffer is trimmed as parsing goes and no unit is kept
+        here, so a caller that is done with each unit before asking for the
+        next holds one unit at a time. A ParserError is raised when the
+        caller reaches the unit it is in.
+        """
+        while self._cur().kind != TokenKind.EOF:
+            unit = self._run(self._translation_unit())
+            if unit is None:
+                self._raise_error()
+            yield unit
+
     # <Program> ::= <TranslationUnit>* EOF
     def _program(self) -> Program:
-        translation_units = []
-        while self._cur().type != 'EOF':
-            unit = self._translation_unit()
-            if unit is None:
-                error_token = self.last_error if self.last_error else self._cur()
-                raise ParserError(
-                    f'There was an error parsing token {self.last_error} at pos {self.pos} cur {self._cur()}',
-                    self.last_error
-                )
-            translation_units.append(unit)
-        return Program(translation_units)
+        return Program(list(self.iter_units()))
 
     # <TranslationUnit> ::= <Function> | <DeclarationStatement>
+    # Both start with <DeclarationTypes> IDENTIFIER, parse that once and let
+    # the next token decide, "(" for a function and "=" "," ";" otherwise
     def _translation_unit(self):
-        start = self.pos
-        func = self._function()
-        if func is not None:
-            return func
-        self.pos = start
-        decl = self._declaration_statement()
-        if decl is not None:
-            return decl
-        return None
+        decl_type = self._declaration_types()
+        if (decl_type is None):
+            return None
+        identifier = self._declarator()
+        if (identifier is None):
+            return None
+        if self._match(TokenKind.LPAREN):
+            return (yield from self._function(decl_type, identifier))
+        return self._declaration_rest(decl_type, identifier)
 
     # <DeclarationStatement> ::= <DeclarationTypes> <VarDeclarationList> ";"
     def _declaration_statement(self):
         decl_type = self._declaration_types()
         if (decl_type is None):
             return None
-        decl_list = self._var_declaration_list()
+        identifier = self._declarator()
+        if (identifier is None):
+            return None
+        return self._declaration_rest(decl_type, identifier)
+
+    # The rest of a <DeclarationStatement> after its first IDENTIFIER
+    def _declaration_rest(self, decl_type, identifier):
+        decl_list = self._var_declaration_list(identifier)
         if (decl_list is None):
             return None
-        if (self._expect('SEMICOLON') is None):
+        if (self._expect(TokenKind.SEMICOLON) is None):
             return None
         return DeclarationStatement(decl_type, decl_list)
 
     # <DeclarationTypes> ::= <DeclarationSpecifiers>* <DeclarationType>
     def _declaration_types(self):
         specifier_list = []
-        while self._cur().type in DECLARATION_SPECIFIERS:
-            specifier = self._expect(list(DECLARATION_SPECIFIERS))
-            specifier_list.append(specifier)
-        decl_type = self._expect(list(TYPE_SPECIFIERS))
+        tok = self._cur()
+        while tok.kind in DECLARATION_SPECIFIER_KINDS:
+            specifier_list.append(tok)
+            tok = self._advance()
+        decl_type = self._expect_in(TYPE_SPECIFIER_KINDS)
         if (decl_type is None):
             return None
         return DeclarationTypes(specifier_list, decl_type)
 
     # <VarDeclarationList> ::= <VarDeclaration> ( "," <VarDeclaration> )*
-    def _var_declaration_list(self):
+    # The first declarator has already been parsed
+    def _var_declaration_list(self, identifier):
         delc_list: List[VarDeclaration] = []
-        var_decl = self._var_declaration()
+        var_decl = self._var_initializer(identifier)
         if (var_decl is None):
             return None
         delc_list.append(var_decl)
-        while self._match('COMMA'):
-            self._expect('COMMA')
+        while self._match(TokenKind.COMMA):
+            self._expect(TokenKind.COMMA)
             var_decl = self._var_declaration()
             if (var_decl is None):
                 return None
@@ -158,55 +375,84 @@ class Parser:
         decl = self._declarator()
         if (decl is None):
             return None
+        return self._var_initializer(decl)
+
+    # ( "=" <Expression> )? of a <VarDeclaration>
+    def _var_initializer(self, decl):
         init = None
-        if self._match('ASSIGN'):
-            self._expect('ASSIGN')
-            expr = self._expression(TOKEN_PREC['COMMA'] + 1)
+        if self._match(TokenKind.ASSIGN):
+            self._expect(TokenKind.ASSIGN)
+            expr = self._expression(_ASSIGNMENT_PRECEDENCE)
             if (expr is None):
                 return None
             init = expr
         return VarDeclaration(decl, init)
 
     # <Function> ::= <FunctionDefinition> | <FunctionDeclaration>
-    def _function(self):
-        init = self._function_init()
-        if (init is None):
+    # <FunctionInit> ::= <DeclarationTypes> <FunctionDeclarator>
+    # The caller has parsed the types and the declarator's IDENTIFIER
+    def _function(self, decl_type, identifier):
+        parameters = self._function_parameters()
+        if (parameters is None):
             return None
-        decl_type, identifier, parameters = init
-        if (self._match('SEMICOLON')):
-            self._expect('SEMICOLON')
+        if (self._match(TokenKind.SEMICOLON)):
+            self._expect(TokenKind.SEMICOLON)
             return FunctionDeclaration(decl_type, identifier, parameters)
-        statements = self._compound_statement()
+        if self.lazy_bodies:
+            body = self._skip_body()
+            if body is not None:
+                return LazyFunctionDefinition(decl_type, identifier, parameters, body)
+        statements = yield from self._drive(self._block())
         if (statements is None):
             return None
 
         return FunctionDefinition(decl_type, identifier, parameters, statements)
 
-    # <FunctionInit> ::= <DeclarationTypes> <FunctionDeclarator>
-    def _function_init(self):
-        decl_type = self._declaration_types()
-        if (decl_type is None):
-            return None
-        func_decl = self._function_declarator()
-        if (func_decl is None):
-            return None
-        identifier, parameters = func_decl
-        return (decl_type, identifier, parameters)
+    # Steps over a "{" ... "}" body by matching braces and returns its tokens
+    # for parsing later, None when the braces do not match so the caller
+    # parses it now and reports the error
+    def _skip_body(self):
+        if not self._match(TokenKind.LBRACE):
+            return None
+        buffer = self._buffer
+        first = index = self.pos - self._base
+        depth = 0
+        while True:
+            if index == len(buffer):
+                buffer.extend(islice(self._stream, _BUFFER_TRIM))
+                if index == len(buffer):
+                    return None
+            kind = buffer[index].kind
+            if kind == TokenKind.LBRACE:
+                depth += 1
+            elif kind == TokenKind.RBRACE:
+                depth -= 1
+                if depth == 0:
+                    break
+            elif kind == TokenKind.EOF:
+                return None
+            index += 1
+        start = self.pos
+        end = self._base + index + 1
+        if self._sequence is not None:
+            body = _BodyTokens(self._sequence, start, end, start, self.source_lines)
+        else:
+            body = _BodyTokens(buffer[first:index + 1], 0, end - start, start, self.source_lines)
+        self.pos = end
+        self._trim()
+        return body
 
     # <FunctionDeclarator> ::= IDENTIFIER "(" <FunctionParamList>? ")"
-    def _function_declarator(self):
+    def _function_parameters(self):
         parameters = []
-        identifier = self._expect('IDENTIFIER')
-        if (identifier is None):
-            return None
-        if (self._expect('LPAREN') is None):
+        if (self._expect(TokenKind.LPAREN) is None):
             return None
-        if not self._match('RPAREN'):
+        if not self._match(TokenKind.RPAREN):
             parameters = self._function_param_list()
             if (parameters is None):
                 return None
-        self._expect('RPAREN')
-        return (identifier, parameters)
+        self._expect(TokenKind.RPAREN)
+        return parameters
 
     # <FunctionParamList> ::= <ParamDeclaration> ("," <ParamDeclaration> )*
     def _function_param_list(self):
@@ -215,8 +461,8 @@ class Parser:
         if (param_decl is None):
             return None
         param_list.append(param_decl)
-        while (self._match('COMMA')):
-            self._expect('COMMA')
+        while (self._match(TokenKind.COMMA)):
+            self._expect(TokenKind.COMMA)
             param_decl = self._param_declaration()
             if (param_decl is None):
                 return None
@@ -229,34 +475,62 @@ class Parser:
         if (decl_types is None):
             return None
         decl = None
-        if self._match('IDENTIFIER'):
+        if self._match(TokenKind.IDENTIFIER):
             decl = self._declarator()
         return ParameterDeclaration(decl_types, decl)
 
     # IDENTIFIER
     def _declarator(self):
-        identifier = self._expect('IDENTIFIER')
+        identifier = self._expect(TokenKind.IDENTIFIER)
         if (identifier is None):
             return None
         return identifier
 
-    # <CompoundStatement> ::= "{" (<DeclarationStatement> | <Statements>)* "}"
+    # Statements that contain statements are generators. A bare yield asks
+    # for the next nested statement, which _drive parses and sends back, so
+    # the enclosing rules wait on an explicit stack instead of the call stack
+    # and blocks can nest to any depth. _drive is a generator itself only to
+    # pause between statements under parse_steps
+    def _drive(self, result):
+        stack: list[Generator] = []
+        while True:
+            if type(result) is GeneratorType:
+                stack.append(result)
+                sent = None
+            elif stack:
+                sent = result
+            else:
+                return result
+            try:
+                stack[-1].send(sent)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+            if self.pos >= self._pause_at:
+                yield from self._pause()
+            result = self._statement_step()
+
     def _compound_statement(self):
-        if self._expect('LBRACE') is None:
+        return self._run(self._drive(self._block()))
+
+    # <CompoundStatement> ::= "{" (<DeclarationStatement> | <Statements>)* "}"
+    def _block(self):
+        if self._expect(TokenKind.LBRACE) is None:
             return None
         statements = []
-        while not self._match('RBRACE'):
-            if self._match(*DECLARATION_SPECIFIERS) or self._match(*TYPE_SPECIFIERS):
+        while not self._match(TokenKind.RBRACE):
+            if self._match_in(_DECLARATION_START_KINDS):
                 decl_stmt = self._declaration_statement()
                 if decl_stmt is None:
                     return None
                 statements.append(decl_stmt)
                 continue
-            stmt = self._statement()
+            stmt = yield
             if stmt is None:
                 return None
             statements.append(stmt)
-        self._expect('RBRACE')
+        self._expect(TokenKind.RBRACE)
         return CompoundStatement(statements)
 
     # <Statements> ::= <IfStatement>
@@ -271,159 +545,151 @@ class Parser:
     # | <LabelStatement>
     # | <DeclarationStatement>
     def _statement(self):
-        if self._match('IF'):
-            return self._if_statement()
-        if self._match('WHILE'):
-            return self._while_statement()
-        if self._match('DO'):
-            return self._do_while_statement()
-        if self._match('FOR'):
-            return self._for_statement()
-        if self._match('SWITCH'):
-            return self._switch_statement()
-        if self._match('RETURN'):
-            return self._return_statement()
-        if self._match('GOTO'):
-            return self._goto_statement()
-        if self._match('BREAK'):
-            return self._break_statement()
-        if self._match('CONTINUE'):
-            return self._continue_statement()
-        # label needs to be checked before compound statement and expression otherwise they consume IDENTIFIER
-        if self._match('IDENTIFIER') and self._peek().type == 'COLON':
+        return self._run(self._drive(self._statement_step()))
+
+    # A finished statement, or the generator of a statement that nests others
+    def _statement_step(self):
+        handler = self._STATEMENTS.get(self._cur().kind)
+        if handler is not None:
+            return handler(self)
+        return self._expr_statement()
+
+    # label needs to be checked before expression otherwise it consumes IDENTIFIER
+    def _identifier_statement(self):
+        if self._peek().kind == TokenKind.COLON:
             return self._label_statement()
-        if self._match('LBRACE'):
-            return self._compound_statement()
         return self._expr_statement()
 
     # <IfStatement> ::= "if" "(" <Expression> ")" <CompoundStatement> ("else" <CompoundStatement>)?
     def _if_statement(self):
-        if self._expect('IF') is None:
+        if self._expect(TokenKind.IF) is None:
             return None
-        if self._expect('LPAREN') is None:
+        if self._expect(TokenKind.LPAREN) is None:
             return None
         condition = self._expression()
         if condition is None:
             return None
-        if self._expect('RPAREN') is None:
+        if self._expect(TokenKind.RPAREN) is None:
             return None
-        then_branch = self._statement()
+        then_branch = (yield)
         if then_branch is None:
             return None
         else_branch = None
-        if self._match('ELSE'):
-            self._expect('ELSE')
-            else_branch = self._statement()
+        if self._match(TokenKind.ELSE):
+            self._expect(TokenKind.ELSE)
+            else_branch = (yield)
             if else_branch is None:
                 return None
         return IfStatement(condition, then_branch, else_branch)
 
     # <WhileStatement> ::= "while" "(" <Expression> ")" <CompoundStatement>
     def _while_statement(self):
-        if self._expect('WHILE') is None:
+        if self._expect(TokenKind.WHILE) is None:
             return None
-        if self._expect('LPAREN') is None:
+        if self._expect(TokenKind.LPAREN) is None:
             return None
         condition = self._expression()
         if condition is None:
             return None
-        if self._expect('RPAREN') is None:
+        if self._expect(TokenKind.RPAREN) is None:
             return None
-        body = self._statement()
+        body = (yield)
         if body is None:
             return None
         return WhileStatement(condition, body)
 
     # <DoWhileStatement> ::= "do" <CompoundStatement> "while" "(" <Expression> ")" ";"
     def _do_while_statement(self):
-        if self._expect('DO') is None:
+        if self._expect(TokenKind.DO) is None:
             return None
-        body = self._statement()
+        body = (yield)
         if body is None:
             return None
-        if self._expect('WHILE') is None:
+        if self._expect(TokenKind.WHILE) is None:
             return None
-        if self._expect('LPAREN') is None:
+        if self._expect(TokenKind.LPAREN) is None:
             return None
         condition = self._expression()
         if condition is None:
             return None
-        if self._expect('RPAREN') is None:
+        if self._expect(TokenKind.RPAREN) is None:
             return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         return DoWhileStatement(body, condition)
 
     # <ForStatement> ::= "for" "(" (<DeclarationStatement> | ";") <Expression>? ";" <Expression>? ")" <CompoundStatement>
     def _for_statement(self):
-        if self._expect('FOR') is None:
+        if self._expect(TokenKind.FOR) is None:
             return None
-        if self._expect('LPAREN') is None:
+        if self._expect(TokenKind.LPAREN) is None:
             return None
         initializer = None
-        if self._cur().type != 'SEMICOLON':
-            start_pos = self.pos
+        if self._cur().kind != TokenKind.SEMICOLON:
+            start_pos = self._mark()
             initializer = self._declaration_statement()
             if initializer is None:
-                self.pos = start_pos
+                self._rewind(start_pos)
                 expr = self._expression()
                 if expr is None:
                     return None
-                if self._expect('SEMICOLON') is None:
+                if self._expect(TokenKind.SEMICOLON) is None:
                     return None
                 initializer = ExpressionStatement(expr)
+            else:
+                self._release()
         else:
-            if self._expect('SEMICOLON') is None:
+            if self._expect(TokenKind.SEMICOLON) is None:
                 return None
         condition = None
-        if self._cur().type != 'SEMICOLON':
+        if self._cur().kind != TokenKind.SEMICOLON:
             condition = self._expression()
             if condition is None:
                 return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         increment = None
-        if self._cur().type != 'RPAREN':
+        if self._cur().kind != TokenKind.RPAREN:
             increment = self._expression()
             if increment is None:
                 return None
-        if self._expect('RPAREN') is None:
+        if self._expect(TokenKind.RPAREN) is None:
             return None
-        body = self._statement()
+        body = (yield)
         if body is None:
             return None
         return ForStatement(initializer, condition, increment, body)
 
     # <SwitchStatement> ::= "switch" "(" <Expression> ")" <SwitchBody>
     def _switch_statement(self):
-        if self._expect('SWITCH') is None:
+        if self._expect(TokenKind.SWITCH) is None:
             return None
-        if self._expect('LPAREN') is None:
+        if self._expect(TokenKind.LPAREN) is None:
             return None
         expression = self._expression()
         if expression is None:
             return None
-        if self._expect('RPAREN') is None:
+        if self._expect(TokenKind.RPAREN) is None:
             return None
-        body = self._switch_body()
+        body = yield from self._switch_body()
         if body is None:
             return None
         return SwitchStatement(expression, body)
 
     # <SwitchBody> ::= "{" <SwitchSection>* "}"
     def _switch_body(self):
-        if self._expect('LBRACE') is None:
+        if self._expect(TokenKind.LBRACE) is None:
             return None
         sections = []
         while True:
             cur = self._cur()
-            if cur.type == 'RBRACE':
+            if cur.kind == TokenKind.RBRACE:
                 break
-            section = self._switch_section()
+            section = yield from self._switch_section()
             if section is None:
                 return None
             sections.append(section)
-        if self._expect('RBRACE') is None:
+        if self._expect(TokenKind.RBRACE) is None:
             return None
         return sections
 
@@ -433,14 +699,14 @@ class Parser:
         if label is None:
             return None
         label_list = [label]
-        while self._cur().type in {'CASE', 'DEFAULT'}:
+        while self._cur().kind in _SWITCH_LABEL_KINDS:
             label = self._switch_label()
             if label is None:
                 return None
             label_list.append(label)
         items = []
-        while self._cur().type not in {'CASE', 'DEFAULT', 'RBRACE'}:
-            stmt = self._statement()
+        while self._cur().kind not in _SWITCH_SECTION_END_KINDS:
+            stmt = (yield)
             if stmt is None:
                 return None
             items.append(stmt)
@@ -449,88 +715,104 @@ class Parser:
     # <SwitchLabel> ::= "case" <Expression> ":" | "default" ":"
     def _switch_label(self):
         cur = self._cur()
-        if cur.type == 'CASE':
-            case_tok = self._expect('CASE')
+        if cur.kind == TokenKind.CASE:
+            case_tok = self._expect(TokenKind.CASE)
             if case_tok is None:
                 return None
             expr = self._expression()
             if expr is None:
                 return None
-            if self._expect('COLON') is None:
+            if self._expect(TokenKind.COLON) is None:
                 return None
             return CaseLabel(case_tok, expr)
-        if cur.type == 'DEFAULT':
-            default_tok = self._expect('DEFAULT')
+        if cur.kind == TokenKind.DEFAULT:
+            default_tok = self._expect(TokenKind.DEFAULT)
             if default_tok is None:
                 return None
-            if self._expect('COLON') is None:
+            if self._expect(TokenKind.COLON) is None:
                 return None
             return DefaultLabel(default_tok)
         return None
 
     # <ExprStatement> ::= <Expression>? ";"
     def _expr_statement(self):
-        if self._match('SEMICOLON'):
-            self._expect('SEMICOLON')
+        if self._match(TokenKind.SEMICOLON):
+            self._expect(TokenKind.SEMICOLON)
             return ExpressionStatement(None)
         expr = self._expression()
         if expr is None:
             return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         return ExpressionStatement(expr)
 
     # <ReturnStatement> ::= "return" <Expression>? ";"
     def _return_statement(self):
-        if (self._expect('RETURN') is None):
+        if (self._expect(TokenKind.RETURN) is None):
             return None
         expression = None
-        if not self._match('SEMICOLON'):
+        if not self._match(TokenKind.SEMICOLON):
             expression = self._expression()
             if expression is None:
                 return None
-        self._expect('SEMICOLON')
+        self._expect(TokenKind.SEMICOLON)
         return ReturnStatement(expression)
 
     # <GotoStatement> ::= "goto" IDENTIFIER ";"
     def _goto_statement(self):
-        if self._expect('GOTO') is None:
+        if self._expect(TokenKind.GOTO) is None:
             return None
-        identifier = self._expect('IDENTIFIER')
+        identifier = self._expect(TokenKind.IDENTIFIER)
         if (identifier is None):
             return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         return GotoStatement(identifier)
 
     # <BreakStatement> ::= "break" ";"
     def _break_statement(self):
-        if self._expect('BREAK') is None:
+        if self._expect(TokenKind.BREAK) is None:
             return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         return BreakStatement()
 
     # <ContinueStatement> ::= "continue" ";"
     def _continue_statement(self):
-        if self._expect('CONTINUE') is None:
+        if self._expect(TokenKind.CONTINUE) is None:
             return None
-        if self._expect('SEMICOLON') is None:
+        if self._expect(TokenKind.SEMICOLON) is None:
             return None
         return ContinueStatement()
 
     # <LabelStatement> ::= IDENTIFIER ":" <Statements>
     def _label_statement(self):
-        identifier = self._expect('IDENTIFIER')
+        identifier = self._expect(TokenKind.IDENTIFIER)
         if (identifier is None):
             return None
-        if self._expect('COLON') is None:
+        if self._expect(TokenKind.COLON) is None:
             return None
-        statement = self._statement()
+        statement = (yield)
         if statement is None:
             return None
         return LabelStatement(identifier, statement)
 
+    # Statement parser for each token kind that starts a statement,
+    # any other token starts an expression statement
+    _STATEMENTS = {
+        TokenKind.IF: _if_statement,
+        TokenKind.WHILE: _while_statement,
+        TokenKind.DO: _do_while_statement,
+        TokenKind.FOR: _for_statement,
+        TokenKind.SWITCH: _switch_statement,
+        TokenKind.RETURN: _return_statement,
+        TokenKind.GOTO: _goto_statement,
+        TokenKind.BREAK: _break_statement,
+        TokenKind.CONTINUE: _continue_statement,
+        TokenKind.IDENTIFIER: _identifier_statement,
+        TokenKind.LBRACE: _block,
+    }
+
     # ------------------------------------------------------------------
     # Pratt parser For Expressions
     # ------------------------------------------------------------------
@@ -538,110 +820,251 @@ class Parser:
     # This part of the code does not correlate to the grammar one to one
     # This uses a precidence table to determine which side of the expression to collapse
     # The token precidence table can be found in tokens.py -> TOKEN_PREC
+    #
+    # Precedence climbing without recursion. Where the recursive version would
+    # call itself for an operand, a frame saying what to do with the operand is
+    # pushed instead, so chain length and nesting depth only grow the stack list.
+    # Each frame remembers min_prec, which the operator loop resumes at
+    #   _BINARY    combine the operand as the right side of operator
+    #   _PREFIX    wrap the operand in a PrefixExpression
+    #   _PAREN     close a parenthesised expression
+    #   _CALL      collect the operand as a call argument
     def _expression(self, min_prec: int = 0):
-        # first combine prefix
-        node = self._parse_prefix()
-        if node is None:
-            return None
+        stack: list = []
+        node = None
+        need_operand = True
         while True:
-            tok = self._cur()
-            # post op increment / decrement and function calls
-            if tok.type in POSTFIX_OPERATORS:
-                node = self._apply_postfix(node)
+            if need_operand:
+                tok = self._cur()
+                kind = tok.kind
+                # Supported prefix operations:
+                # 'PLUS', 'MINUS', 'LOGNOT', 'BITNOT', 'INCREMENT', 'DECREMENT'
+                if kind in PREFIX_KINDS:
+                    self._advance()
+                    stack.append((_PREFIX, tok, min_prec))
+                    min_prec = PREFIX_PRECEDENCE
+                    continue
+                if kind == TokenKind.IDENTIFIER:
+                    self._advance()
+                    node = Identifier(tok)
+                elif kind in _LITERAL_KINDS:
+                    self._advance()
+                    node = Literal(tok)
+                # Parentheses handling
+                elif kind == TokenKind.LPAREN:
+                    self._advance()
+                    stack.append((_PAREN, min_prec))
+                    min_prec = 0
+                    continue
+                else:
+                    node = None
+                need_operand = False
+
+            if node is not None:
+                while True:
+                    tok = self._cur()
+                    kind = tok.kind
+                    # post op increment / decrement and function calls
+                    if kind in POSTFIX_KINDS:
+                        # Function Calls
+                        if kind == TokenKind.LPAREN:
+                            self._advance()
+                            if self._match(TokenKind.RPAREN):
+                                self._advance()
+                                node = CallExpression(node, [])
+                                continue
+                            stack.append((_CALL, node, [], min_prec))
+                            min_prec = _ASSIGNMENT_PRECEDENCE
+                            need_operand = True
+                            break
+                        # Member Expressions
+                        if kind == TokenKind.DOT:
+                            self._advance()
+                            identifier = self._expect(TokenKind.IDENTIFIER)
+                            if identifier is None:
+                                node = None
+                                break
+                            node = MemberExpression(node, identifier)
+                            continue
+                        # Postfix Operations
+                        self._advance()
+                        node = PostfixExpression(node, tok)
+                        continue
+                    prec = PRECEDENCE[kind]
+                    # collapses expression to the right side if left side token has a lower precedence
+                    if prec < min_prec:
+                        break
+                    self._advance()
+                    stack.append((_BINARY, tok, node, min_prec))
+                    # if not an assignment token, + 1 to current precedence
+                    # this covers if both left and right are the same operation, guarantee left side collapse
+                    min_prec = prec if kind in ASSIGNMENT_KINDS else prec + 1
+                    need_operand = True
+                    break
+                if need_operand:
+                    continue
+
+            # The operand is finished, hand it to the innermost frame, which
+            # restores the precedence the operand started at
+            if not stack:
+                return node
+            frame = stack.pop()
+            action = frame[0]
+
+            if action == _BINARY:
+                # if end of expression
                 if node is None:
-                    return None
-                continue
-            prec = TOKEN_PREC.get(tok.type, -1)
-            # collapses expression to the right side if left side token has a lower precedence
-            if prec < min_prec:
-                break
-            operator = tok
-            self._advance()
-            # if not an assignment token, + 1 to current precedence
-            # this covers if both left and right are the same operation, guarantee left side collapse
-            next_prec = prec if tok.type in ASSIGNMENT_TOKENS else prec + 1
-            right = self._expression(next_prec)
-            # if end of expression
-            if right is None:
-                return None
-            if operator.type in ASSIGNMENT_TOKENS:
-                node = AssignmentExpression(operator, node, right)
-            else:
-                node = BinaryExpression(operator, node, right)
-        return node
-
-    # Supported prefix operations:
-    # 'PLUS', 'MINUS', 'LOGNOT', 'BITNOT', 'INCREMENT', 'DECREMENT'
-    def _parse_prefix(self):
-        if self._match(*PREFIX_OPERATORS):
-            prefix = self._expect(list(PREFIX_OPERATORS))
-            prefix_int = TOKEN_PREC.get('PREFIX')
-            assert (isinstance(prefix_int, int))
-            operand = self._expression(prefix_int)
-            return PrefixExpression(prefix, operand)
-        # If no prefix
-        primary = self._parse_primary()
-        if primary is None:
-            return None
-        return primary
-
-    def _parse_primary(self):
-        # Parentheses handling
-        if self._match('LPAREN'):
-            self._expect('LPAREN')
-            expr = self._expression()
-            if (expr is None):
-                return None
-            self._expect('RPAREN')
-            return expr
-        # If no parentheses
-        if self._match('NUMBER', 'STRING_LITERAL', 'CHAR_LITERAL'):
-            tok = self._expect(['NUMBER', 'STRING_LITERAL', 'CHAR_LITERAL'])
-            return Literal(tok)
-        if self._match('IDENTIFIER'):
-            tok = self._expect('IDENTIFIER')
-            return Identifier(tok)
-        return None
+                    continue
+                operator = frame[1]
+                if operator.kind in ASSIGNMENT_KINDS:
+                    node = AssignmentExpression(operator, frame[2], node)
+                else:
+                    node = BinaryExpression(operator, frame[2], node)
+                min_prec = frame[3]
 
-    # Supported postfic operations:
-    # 'LPAREN', 'DOT', 'INCREMENT', 'DECREMENT'
-    def _apply_postfix(self, node):
-        # Function Calls
-        if self._match('LPAREN'):
-            func_call = self._function_call(node)
-            if (func_call is None):
-                return None
-            return func_call
-        # Member Expressions
-        if self._match('DOT'):
-            self._advance()
-            identifier = self._expect('IDENTIFIER')
-            if identifier is None:
-                return None
-            return MemberExpression(node, identifier)
-        # Postfix Operations
-        if self._match('INCREMENT', 'DECREMENT'):
-            postfix = self._expect(['INCREMENT', 'DECREMENT'])
-            return PostfixExpression(node, postfix)
-        return node
-
-    # builds argument list for function calls
-    def _function_call(self, node):
-        self._advance()
-        args = []
-        if self._match('RPAREN'):
-            if (self._expect('RPAREN') is None):
-                return None
-            return CallExpression(node, args)
-        expr = self._expression(TOKEN_PREC['COMMA'] + 1)
-        if expr is None:
-            return None
-        args.append(expr)
-        while self._match('COMMA'):
-            self._expect('COMMA')
-            if self._match('RPAREN'):
-                break
-            args.append(self._expression(TOKEN_PREC['COMMA'] + 1))
-        if self._expect('RPAREN') is None:
-            return None
-        return CallExpression(node, args)
+            elif action == _PREFIX:
+                node = PrefixExpression(frame[1], node)
+                min_prec = frame[2]
+
+            elif action == _PAREN:
+                if node is not None:
+                    self._expect(TokenKind.RPAREN)
+                    min_prec = frame[1]
+
+            else:  # _CALL, builds argument list for function calls
+                _, callee, args, min_prec = frame
+                if node is None and not args:
+                    continue
+                args.append(node)
+                if self._match(TokenKind.COMMA):
+                    self._expect(TokenKind.COMMA)
+                    if not self._match(TokenKind.RPAREN):
+                        stack.append(frame)
+                        min_prec = _ASSIGNMENT_PRECEDENCE
+                        need_operand = True
+                        continue
+                if self._expect(TokenKind.RPAREN) is None:
+                    node = None
+                    continue
+                node = CallExpression(callee, args)
+
+
+class _BodyTokens:
+    """Token range of a function body that has not been parsed yet
+
+    tokens[start:end] are the body's tokens and position is where the first
+    of them was in the whole program, so errors report the same position.
+    """
+    __slots__ = ('tokens', 'start', 'end', 'position', 'source_lines')
+
+    def __init__(self, tokens, start: int, end: int, position: int, source_lines):
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+        self.position = position
+        self.source_lines = source_lines
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __iter__(self) -> Iterator[Token]:
+        return map(self.tokens.__getitem__, range(self.start, self.end))
+
+    def parse(self) -> CompoundStatement:
+        parser = Parser(self)
+        parser.pos = parser._base = self.position
+        parser.source_lines = self.source_lines
+        return parser.parse_body()
+
+
+# Function bodies per worker task, enough that a task outweighs shipping it
+# and small functions are batched, and about this many tasks per worker so
+# uneven chunks still balance
+_MIN_CHUNK_TOKENS = 4096
+_CHUNKS_PER_WORKER = 4
+
+
+def _body_chunks(units: list['LazyFunctionDefinition'], workers: int):
+    # Yields (units, tokens, payload) per chunk, the payload carries the
+    # bodies' tokens as columns that pickle far faster than Token objects
+    total = sum(len(unit._body_tokens) for unit in units)
+    target = max(_MIN_CHUNK_TOKENS, total // (workers * _CHUNKS_PER_WORKER))
+    chunk = []
+    size = 0
+    for unit in units:
+        chunk.append(unit)
+        size += len(unit._body_tokens)
+        if size >= target or unit is units[-1]:
+            tokens = [tok for member in chunk for tok in member._body_tokens]
+            kinds = array('B', [tok.kind for tok in tokens])
+            values = [tok.value for tok in tokens]
+            lines = array('i', [tok.line_num for tok in tokens])
+            columns = array('i', [tok.char_num for tok in tokens])
+            bodies = []
+            first = 0
+            for member in chunk:
+                end = first + len(member._body_tokens)
+                bodies.append((first, end, member._body_tokens.position))
+                first = end
+            yield chunk, tokens, (kinds, values, lines, columns, bodies)
+            chunk = []
+            size = 0
+
+
+def _parse_chunk(payload) -> tuple[array, array, array, array]:
+    # Runs in a worker process. The parsed bodies go back as the arrays of an
+    # Arena whose token indices count from the chunk's first token, so the
+    # parent rebuilds them around its own Token objects
+    # Nothing here forms reference cycles and the collector's passes over
+    # the growing heap would cost more than the parse, so it stays off in
+    # the worker
+    gc.disable()
+    kinds, values, lines, columns, bodies = payload
+    tokens = list(map(Token, kinds, values, lines, columns))
+    parsed = []
+    for first, end, position in bodies:
+        parser = Parser(tokens[first:end])
+        parser.pos = parser._base = position
+        parsed.append(parser.parse_body())
+    arena = Arena.from_ast(parsed, tokens)
+    return arena.kinds, arena.token, arena.child_start, arena.children
+
+
+# The slot FunctionDefinition stores func_body in
+_FUNC_BODY_SLOT = FunctionDefinition.func_body
+
+
+class LazyFunctionDefinition(FunctionDefinition):
+    """FunctionDefinition whose body is parsed when func_body is first read
+
+    Made by Parser(tokens, lazy_bodies=True). Syntax errors inside the body
+    raise ParserError from that first read rather than from Parser.parse.
+    """
+    __slots__ = ('_body_tokens',)
+
+    def __init__(self, func_type, func_ident, func_param, body_tokens: _BodyTokens):
+        super().__init__(func_type, func_ident, func_param, None)
+        self._body_tokens = body_tokens
+
+    @property
+    def func_body(self) -> CompoundStatement:
+        if self._body_tokens is not None:
+            _FUNC_BODY_SLOT.__set__(self, self._body_tokens.parse())
+            self._body_tokens = None
+        return _FUNC_BODY_SLOT.__get__(self)
+
+    @func_body.setter
+    def func_body(self, body) -> None:
+        self._body_tokens = None
+        _FUNC_BODY_SLOT.__set__(self, body)
+
+    @property
+    def body_parsed(self) -> bool:
+        return self._body_tokens is None
+
+    # Equal to an eagerly parsed FunctionDefinition of the same function
+    def __eq__(self, other):
+        if not isinstance(other, FunctionDefinition):
+            return NotImplemented
+        return ((self.func_type, self.func_ident, self.func_param, self.func_body)
+                == (other.func_type, other.func_ident, other.func_param, other.func_body))
@@ -1,4 +1,5 @@
 from dataclasses import is_dataclass, asdict, fields
+from src.visitor import Visitor
 # AI Generated Formatting Code
 
 
@@ -8,28 +9,20 @@ def ast_to_json(ast):
     if is_dataclass(ast):
         return {key: ast_to_json(value) for key, value in asdict(ast).items()}
     return ast
-# AI Generated AST Print Function
 
 
-def pretty_ast(ast) -> str:
-    """Return a tree-style string of the AST using ASCII connectors."""
-    def format_atom(v):
-        if v is None:
-            return "None"
-        if isinstance(v, list):
-            return "[]"
-        # Prefer concise Token rendering
-        try:
-            from src.tokens import Token  # lazy import for isinstance check
-        except Exception:
-            Token = None
-        if Token is not None and isinstance(v, Token):
-            return f"{v.type}({repr(v.value)})"
-        return repr(v) if isinstance(v, str) else str(v)
+class _AstPrinter(Visitor):
+    # Each render action appends a node's own line and returns the
+    # actions for the lines below it, in order
+    def __init__(self, format_atom):
+        self.format_atom = format_atom
+        self.lines = []
 
-    def render(node, indent: str = "", is_last: bool = True) -> str:
-        lines = []
+    def render(self, item) -> list:
+        node, indent, is_last = item
+        lines = self.lines
         connector = "└──" if is_last else "├──"
+        below = []
         if is_dataclass(node):
             name = node.__class__.__name__
             if indent == "":
@@ -44,21 +37,19 @@ def pretty_ast(ast) -> str:
                 branch = "└──" if last_field else "├──"
                 sub_indent = child_indent + ("    " if last_field else "│   ")
                 if is_dataclass(val):
-                    lines.append(f"{child_indent}{branch} {f.name}")
-                    lines.extend(render(val, sub_indent, True).splitlines())
+                    below.append((lines.append, f"{child_indent}{branch} {f.name}"))
+                    below.append((self.render, (val, sub_indent, True)))
                 elif isinstance(val, list):
                     if len(val) == 0:
-                        lines.append(f"{child_indent}{branch} {f.name}: []")
+                        below.append((lines.append, f"{child_indent}{branch} {f.name}: []"))
                     else:
-                        lines.append(f"{child_indent}{branch} {f.name}")
+                        below.append((lines.append, f"{child_indent}{branch} {f.name}"))
                         for j, item in enumerate(val):
                             item_last = j == len(val) - 1
-                            lines.extend(
-                                render(item, sub_indent, item_last).splitlines())
+                            below.append((self.render, (item, sub_indent, item_last)))
                 else:
-                    lines.append(
-                        f"{child_indent}{branch} {f.name}: {format_atom(val)}")
-            return "\n".join(lines)
+                    below.append((lines.append,
+                                  f"{child_indent}{branch} {f.name}: {self.format_atom(val)}"))
         elif isinstance(node, list):
             label = f"list[{len(node)}]"
             if indent == "":
@@ -67,18 +58,38 @@ def pretty_ast(ast) -> str:
                 lines.append(f"{indent}{connector} {label}")
             child_indent = indent + ("    " if is_last else "│   ")
             for j, item in enumerate(node):
-                lines.extend(render(item, child_indent, j ==
-                             len(node) - 1).splitlines())
-            return "\n".join(lines)
+                below.append((self.render, (item, child_indent, j == len(node) - 1)))
         else:
-            text = format_atom(node)
+            text = self.format_atom(node)
             if indent == "":
                 lines.append(text)
             else:
                 lines.append(f"{indent}{connector} {text}")
-            return "\n".join(lines)
+        return below
+
+
+# AI Generated AST Print Function
+
+
+def pretty_ast(ast) -> str:
+    """Return a tree-style string of the AST using ASCII connectors."""
+    def format_atom(v):
+        if v is None:
+            return "None"
+        if isinstance(v, list):
+            return "[]"
+        # Prefer concise Token rendering
+        try:
+            from src.tokens import Token  # lazy import for isinstance check
+        except Exception:
+            Token = None
+        if Token is not None and isinstance(v, Token):
+            return f"{v.type}({repr(v.value)})"
+        return repr(v) if isinstance(v, str) else str(v)
 
-    return render(ast)
+    printer = _AstPrinter(format_atom)
+    printer.visit((printer.render, (ast, "", True)))
+    return "\n".join(printer.lines)
 
 
 def pretty_tac(instructions) -> str:
@@ -213,6 +224,9 @@ def pretty_tac(instructions) -> str:
             res_raw = getattr(ins, 'res', None)
             if _Tkn is not None and isinstance(res_raw, _Tkn) and getattr(res_raw, 'type', None) == 'PARAM':
                 return f"{index:04}: param {left}"
+            # SSA encoding: PHI with res=version, left=one version per predecessor
+            if getattr(ins, 'instr_type', None) == 'PHI':
+                return f"{index:04}: {dst} = phi({', '.join(operand_str(arg) for arg in left_raw)})"
             return f"{index:04}: {dst} = {left}"
 
         if left_raw is None and right_raw is not None and op_type in {'BITNOT', 'LOGNOT'}:
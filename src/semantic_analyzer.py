@@ -1,8 +1,59 @@
 from src.ast_nodes import *
-from src.symbol_table import SymbolTable, Scope
+from src.symbol_table import SymbolTable, node_key
 from src.errors import SemanticError
-from src.tokens import Token
-from typing import Set, Optional
+from src.tokens import Token, TokenKind
+from src.visitor import Visitor, SKIP
+from typing import Any, Set, Optional
+
+
+_INCDEC_KINDS = (TokenKind.INCREMENT, TokenKind.DECREMENT)
+_RESTRICTED_LITERAL_KINDS = (TokenKind.STRING_LITERAL, TokenKind.CHAR_LITERAL)
+
+
+def _undeclared_error(token: Token, action: str) -> SemanticError:
+    return SemanticError(
+        f"Variable '{token.value}' is {action} before being declared.",
+        token
+    )
+
+
+def uninitialized_error(token: Token, use: str) -> SemanticError:
+    """The error for a variable read at token before it is initialized"""
+    return SemanticError(
+        f"Variable '{token.value}' is {use} before being initialized.",
+        token
+    )
+
+
+def _initializers(stmt: DeclarationStatement) -> list:
+    return [decl.initializer for decl in stmt.declarations
+            if decl and decl.initializer is not None]
+
+
+def _check_type_is_int(decl_type):
+    """Ensure type is 'int' (no char, void, _Bool, etc.)"""
+    if not hasattr(decl_type, 'base'):
+        return
+
+    base_type = decl_type.base
+
+    # Reject non-int types
+    if base_type.kind != TokenKind.INT:
+        raise SemanticError(
+            f"Type '{base_type.value}' is not supported. "
+            "This compiler only supports 'int' (signed 64-bit integers).",
+            base_type
+        )
+
+    # Reject unsigned, const, static specifiers
+    if hasattr(decl_type, 'specifiers'):
+        for spec in decl_type.specifiers:
+            if spec.kind in (TokenKind.UNSIGNED, TokenKind.CONST, TokenKind.STATIC):
+                raise SemanticError(
+                    f"Type specifier '{spec.value}' is not supported. "
+                    "This compiler only supports plain 'int' (signed 64-bit).",
+                    spec
+                )
 
 
 class SemanticAnalyzer:
@@ -19,7 +70,6 @@ class SemanticAnalyzer:
     def __init__(self, ast: Program, symbol_table: SymbolTable):
         self.ast = ast
         self.symbol_table = symbol_table
-        self.current_scope = symbol_table.global_scope
 
     def analyze(self):
         """Run all semantic analysis passes"""
@@ -32,8 +82,6 @@ class SemanticAnalyzer:
         # Pass 3: Check uninitialized variables
         self.check_uninitialized_usage()
 
-    # ==================== PASS 1: TYPE RESTRICTIONS ====================
-
     def check_type_restrictions(self):
         """
         Check for:
@@ -43,571 +91,641 @@ class SemanticAnalyzer:
         - Function calls
         - Member expressions
         """
-        for unit in self.ast.units:
-            if isinstance(unit, FunctionDefinition):
-                # Check function return type
-                self._check_type_is_int(unit.func_type)
+        _RestrictionCheck().visit(self.ast)
+
+    def check_undefined_variables(self):
+        """Check that all used variables are defined in scope"""
+        _DeclarationCheck(self).visit(self.ast)
 
-                # Check parameter types
-                for param in unit.func_param:
-                    self._check_type_is_int(param.decl_type)
+    def check_uninitialized_usage(self):
+        """Check that variables aren't used before initialization"""
+        _InitializationCheck().visit(self.ast)
+
+    def _check_expression_restrictions(self, expr):
+        """Check expression for restricted constructs"""
+        _RestrictionCheck().visit(expr)
 
-                # Enter function scope
-                self._enter_scope_by_name(unit.func_ident.value)
+    def _is_variable_defined(self, identifier: Identifier) -> bool:
+        """Check if the identifier was bound to a declaration in scope"""
+        return node_key(identifier) in self.symbol_table.bindings
 
-                # Check function body
-                self._check_statement_restrictions(unit.func_body)
 
-                # Exit function scope
-                self._exit_scope()
+# ==================== PASS 1: TYPE RESTRICTIONS ====================
 
-            elif isinstance(unit, FunctionDeclaration):
-                # Check function declaration type
-                self._check_type_is_int(unit.func_type)
+class _RestrictionCheck(Visitor):
+    """Rejects unsupported types, literals and expressions"""
 
-                # Check parameter types
-                for param in unit.func_param:
-                    self._check_type_is_int(param.decl_type)
+    def enter_FunctionDefinition(self, func: FunctionDefinition):
+        # Return and parameter types
+        _check_type_is_int(func.func_type)
+        for param in func.func_param:
+            _check_type_is_int(param.decl_type)
+        return [func.func_body]
 
-            elif isinstance(unit, DeclarationStatement):
-                # Check global declaration type
-                self._check_type_is_int(unit.decl_type)
+    def enter_FunctionDeclaration(self, func: FunctionDeclaration):
+        _check_type_is_int(func.func_type)
+        for param in func.func_param:
+            _check_type_is_int(param.decl_type)
+        return SKIP
 
-                # Check initializers
-                for decl in unit.declarations:
-                    if decl and decl.initializer:
-                        self._check_expression_restrictions(decl.initializer)
+    def enter_DeclarationStatement(self, stmt: DeclarationStatement):
+        _check_type_is_int(stmt.decl_type)
+        return _initializers(stmt)
 
-    def _check_type_is_int(self, decl_type):
-        """Ensure type is 'int' (no char, void, _Bool, etc.)"""
-        if not hasattr(decl_type, 'base'):
-            return
+    def enter_Identifier(self, expr: Identifier):
+        return SKIP
 
-        base_type = decl_type.base
+    def enter_ForStatement(self, stmt: ForStatement):
+        # An initializer expression is not checked
+        initializer = stmt.initializer
+        if not isinstance(initializer, DeclarationStatement):
+            initializer = None
+        return [initializer, stmt.condition, stmt.increment, stmt.body]
 
-        # Reject non-int types
-        if base_type.type != 'INT':
+    def enter_Literal(self, expr: Literal):
+        # REJECT string literals
+        if expr.token.kind == TokenKind.STRING_LITERAL:
             raise SemanticError(
-                f"Type '{base_type.value}' is not supported. "
-                "This compiler only supports 'int' (signed 64-bit integers).",
-                base_type
+                "String literals are not supported. "
+                "This compiler only supports signed 64-bit integers.",
+                expr.token
             )
 
-        # Reject unsigned, const, static specifiers
-        if hasattr(decl_type, 'specifiers'):
-            for spec in decl_type.specifiers:
-                if spec.type in ('UNSIGNED', 'CONST', 'STATIC'):
-                    raise SemanticError(
-                        f"Type specifier '{spec.value}' is not supported. "
-                        "This compiler only supports plain 'int' (signed 64-bit).",
-                        spec
-                    )
-
-    def _check_statement_restrictions(self, stmt):
-        """Check statement for restricted constructs"""
-
-        if isinstance(stmt, DeclarationStatement):
-            # Check type is int
-            self._check_type_is_int(stmt.decl_type)
-
-            # Check initializers
-            for decl in stmt.declarations:
-                if decl and decl.initializer:
-                    self._check_expression_restrictions(decl.initializer)
-
-        elif isinstance(stmt, ExpressionStatement):
-            if stmt.expression:
-                self._check_expression_restrictions(stmt.expression)
-
-        elif isinstance(stmt, ReturnStatement):
-            if stmt.expression:
-                self._check_expression_restrictions(stmt.expression)
-
-        elif isinstance(stmt, CompoundStatement):
-            # Enter block scope
-            self._enter_first_block_scope()
-            for item in stmt.items:
-                self._check_statement_restrictions(item)
-            self._exit_scope()
-
-        elif isinstance(stmt, IfStatement):
-            self._check_expression_restrictions(stmt.condition)
-            self._check_statement_restrictions(stmt.then_branch)
-            if stmt.else_branch:
-                self._check_statement_restrictions(stmt.else_branch)
-
-        elif isinstance(stmt, WhileStatement):
-            self._check_expression_restrictions(stmt.condition)
-            self._check_statement_restrictions(stmt.body)
-
-        elif isinstance(stmt, DoWhileStatement):
-            self._check_statement_restrictions(stmt.body)
-            self._check_expression_restrictions(stmt.condition)
-
-        elif isinstance(stmt, ForStatement):
-            # Enter for scope
-            self._enter_scope_by_name('for_stmt')
-
-            if stmt.initializer:
-                if isinstance(stmt.initializer, DeclarationStatement):
-                    self._check_type_is_int(stmt.initializer.decl_type)
-                    for decl in stmt.initializer.declarations:
-                        if decl and decl.initializer:
-                            self._check_expression_restrictions(
-                                decl.initializer)
-                else:
-                    self._check_expression_restrictions(stmt.initializer)
-
-            if stmt.condition:
-                self._check_expression_restrictions(stmt.condition)
-
-            if stmt.increment:
-                self._check_expression_restrictions(stmt.increment)
-
-            self._check_statement_restrictions(stmt.body)
-
-            self._exit_scope()
+        # REJECT char literals
+        if expr.token.kind == TokenKind.CHAR_LITERAL:
+            raise SemanticError(
+                "Character literals are not supported. "
+                "This compiler only supports signed 64-bit integers.",
+                expr.token
+            )
+        return SKIP
 
-    def _check_expression_restrictions(self, expr):
-        """Check expression for restricted constructs"""
+    def enter_CallExpression(self, expr: CallExpression):
+        # REJECT function calls
+        if hasattr(expr.callee, 'token'):
+            token = expr.callee.token
+        else:
+            token = None
 
-        if isinstance(expr, Literal):
-            # REJECT string literals
-            if expr.token.type == 'STRING_LITERAL':
-                raise SemanticError(
-                    "String literals are not supported. "
-                    "This compiler only supports signed 64-bit integers.",
-                    expr.token
-                )
+        raise SemanticError(
+            "Function calls are not supported in this compiler. "
+            "Only variable declarations, assignments, and control flow are allowed.",
+            token
+        )
 
-            # REJECT char literals
-            if expr.token.type == 'CHAR_LITERAL':
-                raise SemanticError(
-                    "Character literals are not supported. "
-                    "This compiler only supports signed 64-bit integers.",
-                    expr.token
-                )
+    def enter_MemberExpression(self, expr: MemberExpression):
+        # REJECT member access (struct/union fields)
+        if hasattr(expr.property, 'token'):
+            token = expr.property.token
+        else:
+            token = None
 
-        elif isinstance(expr, CallExpression):
-            # REJECT function calls
-            if hasattr(expr.callee, 'token'):
-                token = expr.callee.token
-            else:
-                token = None
+        raise SemanticError(
+            "Member access (struct/union fields) is not supported in this compiler. "
+            "Only simple integer variables are allowed.",
+            token
+        )
 
-            raise SemanticError(
-                "Function calls are not supported in this compiler. "
-                "Only variable declarations, assignments, and control flow are allowed.",
-                token
-            )
+    # Not looked into by this pass
+    def enter_PostfixExpression(self, expr: PostfixExpression):
+        return SKIP
 
-        elif isinstance(expr, MemberExpression):
-            # REJECT member access (struct/union fields)
-            if hasattr(expr.property, 'token'):
-                token = expr.property.token
-            else:
-                token = None
+    def enter_SwitchStatement(self, stmt: SwitchStatement):
+        return SKIP
 
-            raise SemanticError(
-                "Member access (struct/union fields) is not supported in this compiler. "
-                "Only simple integer variables are allowed.",
-                token
-            )
+    def enter_LabelStatement(self, stmt: LabelStatement):
+        return SKIP
 
-        elif isinstance(expr, BinaryExpression):
-            self._check_expression_restrictions(expr.left)
-            self._check_expression_restrictions(expr.right)
 
-        elif isinstance(expr, AssignmentExpression):
-            self._check_expression_restrictions(expr.left)
-            self._check_expression_restrictions(expr.right)
+# ==================== PASS 2: UNDEFINED VARIABLES ====================
 
-        elif isinstance(expr, PrefixExpression):
-            self._check_expression_restrictions(expr.operand)
+class _DeclarationCheck(Visitor):
+    """Rejects names used outside the scope of any declaration"""
 
-        elif isinstance(expr, PostfixExpression):
-            self._check_expression_restrictions(expr.operand)
+    def __init__(self, analyzer: SemanticAnalyzer):
+        self.analyzer = analyzer
 
-        elif isinstance(expr, Identifier):
-            # Identifiers are fine (will be checked in other passes)
-            pass
+    def enter_FunctionDefinition(self, func: FunctionDefinition):
+        return [func.func_body]
 
-    # ==================== PASS 2: UNDEFINED VARIABLES ====================
+    def enter_FunctionDeclaration(self, func: FunctionDeclaration):
+        return SKIP
 
-    def check_undefined_variables(self):
-        """Check that all used variables are defined in scope"""
-        for unit in self.ast.units:
-            if isinstance(unit, FunctionDefinition):
-                # Enter function scope
-                self._enter_scope_by_name(unit.func_ident.value)
-
-                # Check function body
-                self._check_statement_for_undefined(unit.func_body)
-
-                # Exit function scope
-                self._exit_scope()
-
-            elif isinstance(unit, DeclarationStatement):
-                # Check global declarations
-                for decl in unit.declarations:
-                    if decl and decl.initializer:
-                        self._check_expression_for_undefined(decl.initializer)
-
-    def _check_statement_for_undefined(self, stmt):
-        """Recursively check statement for undefined variables"""
-
-        if isinstance(stmt, DeclarationStatement):
-            # Check initializers
-            for decl in stmt.declarations:
-                if decl and decl.initializer:
-                    self._check_expression_for_undefined(decl.initializer)
-
-        elif isinstance(stmt, ExpressionStatement):
-            if stmt.expression:
-                self._check_expression_for_undefined(stmt.expression)
-
-        elif isinstance(stmt, ReturnStatement):
-            if stmt.expression:
-                self._check_expression_for_undefined(stmt.expression)
-
-        elif isinstance(stmt, CompoundStatement):
-            # Enter block scope
-            self._enter_first_block_scope()
-            for item in stmt.items:
-                self._check_statement_for_undefined(item)
-            self._exit_scope()
-
-        elif isinstance(stmt, IfStatement):
-            self._check_expression_for_undefined(stmt.condition)
-            self._check_statement_for_undefined(stmt.then_branch)
-            if stmt.else_branch:
-                self._check_statement_for_undefined(stmt.else_branch)
-
-        elif isinstance(stmt, WhileStatement):
-            self._check_expression_for_undefined(stmt.condition)
-            self._check_statement_for_undefined(stmt.body)
-
-        elif isinstance(stmt, DoWhileStatement):
-            self._check_statement_for_undefined(stmt.body)
-            self._check_expression_for_undefined(stmt.condition)
-
-        elif isinstance(stmt, ForStatement):
-            # Enter for scope
-            self._enter_scope_by_name('for_stmt')
-
-            if stmt.initializer:
-                if isinstance(stmt.initializer, DeclarationStatement):
-                    for decl in stmt.initializer.declarations:
-                        if decl and decl.initializer:
-                            self._check_expression_for_undefined(
-                                decl.initializer)
-                else:
-                    # initializer is ExpressionStatement
-                    if isinstance(stmt.initializer, ExpressionStatement):
-                        if stmt.initializer.expression:
-                            self._check_expression_for_undefined(
-                                stmt.initializer.expression)
-                    else:
-                        self._check_expression_for_undefined(stmt.initializer)
-
-            if stmt.condition:
-                self._check_expression_for_undefined(stmt.condition)
-
-            if stmt.increment:
-                self._check_expression_for_undefined(stmt.increment)
-
-            self._check_statement_for_undefined(stmt.body)
-
-            self._exit_scope()
-
-    def _check_expression_for_undefined(self, expr):
-        """Recursively check expression for undefined variables"""
-
-        if isinstance(expr, Identifier):
-            var_name = expr.token.value
-            if not self._is_variable_defined(var_name):
-                raise SemanticError(
-                    f"Variable '{var_name}' is used before being declared.",
-                    expr.token
-                )
+    def enter_DeclarationStatement(self, stmt: DeclarationStatement):
+        return _initializers(stmt)
+
+    def enter_Literal(self, expr: Literal):
+        return SKIP
+
+    def enter_Identifier(self, expr: Identifier):
+        if not self.analyzer._is_variable_defined(expr):
+            raise _undeclared_error(expr.token, 'used')
+        return SKIP
+
+    def enter_AssignmentExpression(self, expr: AssignmentExpression):
+        # Check right side first
+        return [expr.right]
+
+    def leave_AssignmentExpression(self, expr: AssignmentExpression):
+        # Check left side (should be defined)
+        if isinstance(expr.left, Identifier):
+            if not self.analyzer._is_variable_defined(expr.left):
+                raise _undeclared_error(expr.left.token, 'assigned')
+
+    # Not looked into by this pass
+    def enter_PostfixExpression(self, expr: PostfixExpression):
+        return SKIP
+
+    def enter_CallExpression(self, expr: CallExpression):
+        return SKIP
+
+    def enter_MemberExpression(self, expr: MemberExpression):
+        return SKIP
+
+    def enter_SwitchStatement(self, stmt: SwitchStatement):
+        return SKIP
+
+    def enter_LabelStatement(self, stmt: LabelStatement):
+        return SKIP
+
+
+# ==================== PASS 3: UNINITIALIZED VARIABLES ====================
+
+class _InitializationCheck(Visitor):
+    """Rejects variables read before a value is assigned to them
+
+    The last set on the initialized stack holds the names initialized so
+    far. Blocks and branches push a copy, so their initializations do not
+    reach past them.
+    """
+
+    def __init__(self):
+        self.initialized: list[Set[str]] = []
+
+    def _push_copy(self, _):
+        self.initialized.append(self.initialized[-1].copy())
+
+    def _pop(self, _):
+        self.initialized.pop()
 
-        elif isinstance(expr, BinaryExpression):
-            self._check_expression_for_undefined(expr.left)
-            self._check_expression_for_undefined(expr.right)
+    def _branch(self, stmt) -> list:
+        # A branch doesn't guarantee execution, so don't propagate
+        # initializations. A block already works on its own copy
+        if isinstance(stmt, CompoundStatement):
+            return [stmt]
+        return [(self._push_copy, None), stmt, (self._pop, None)]
 
-        elif isinstance(expr, AssignmentExpression):
-            # Check right side first
-            self._check_expression_for_undefined(expr.right)
+    def _initialize(self, name: str):
+        self.initialized[-1].add(name)
 
-            # Check left side (should be defined)
+    def _initialize_target(self, target):
+        if isinstance(target, Identifier):
+            self.initialized[-1].add(target.token.value)
+
+    def _initialize_loop_target(self, expr: AssignmentExpression):
+        # Mark left side as initialized (for = operator only), in the loop
+        # and after it
+        if expr.operator.kind == TokenKind.ASSIGN:
             if isinstance(expr.left, Identifier):
                 var_name = expr.left.token.value
-                if not self._is_variable_defined(var_name):
-                    raise SemanticError(
-                        f"Variable '{var_name}' is assigned before being declared.",
-                        expr.left.token
-                    )
+                self.initialized[-1].add(var_name)
+                self.initialized[-2].add(var_name)
+
+    def enter_Program(self, program: Program):
+        return [unit for unit in program.units if isinstance(unit, FunctionDefinition)]
+
+    def enter_FunctionDefinition(self, func: FunctionDefinition):
+        # Parameters are initialized
+        self.initialized.append({param.declarator.value for param in func.func_param
+                                 if param.declarator})
+        return [func.func_body]
+
+    def enter_DeclarationStatement(self, stmt: DeclarationStatement):
+        # Check each initializer first, then mark the variable as initialized
+        items = []
+        for decl in stmt.declarations:
+            if decl and decl.initializer is not None:
+                items += (decl.initializer, (self._initialize, decl.declarator.value))
+        return items
+
+    def enter_ExpressionStatement(self, stmt: ExpressionStatement):
+        expr = stmt.expression
+        if isinstance(expr, AssignmentExpression):
+            # After assignment, left side is initialized
+            return [expr.right, (self._initialize_target, expr.left)]
+        return [expr] if expr else SKIP
+
+    def enter_CompoundStatement(self, stmt: CompoundStatement):
+        # Don't propagate block-local initializations to outer scope
+        self._push_copy(None)
+        return stmt.items
+
+    def enter_IfStatement(self, stmt: IfStatement):
+        # Both branches see same initialization state
+        items = [stmt.condition, *self._branch(stmt.then_branch)]
+        if stmt.else_branch:
+            items += self._branch(stmt.else_branch)
+        return items
+
+    def enter_WhileStatement(self, stmt: WhileStatement):
+        return [stmt.condition, *self._branch(stmt.body)]
+
+    def enter_ForStatement(self, stmt: ForStatement):
+        # Create local initialization tracking
+        self._push_copy(None)
+        items = []
+        initializer = stmt.initializer
+        if isinstance(initializer, ExpressionStatement):
+            expr = initializer.expression
+            if isinstance(expr, AssignmentExpression):
+                items += (expr.right, (self._initialize_loop_target, expr))
+        elif initializer:
+            items.append(initializer)
+        # Body is checked before the increment
+        return [items, stmt.condition, self._branch(stmt.body), stmt.increment]
+
+    def _leave_scope(self, node):
+        self.initialized.pop()
+
+    leave_FunctionDefinition = leave_CompoundStatement = leave_ForStatement = _leave_scope
+
+    def enter_Identifier(self, expr: Identifier):
+        if expr.token.value not in self.initialized[-1]:
+            # It's declared (we checked in pass 2), but not initialized
+            raise uninitialized_error(expr.token, 'used')
+        return SKIP
+
+    def enter_Literal(self, expr: Literal):
+        return SKIP
+
+    def enter_AssignmentExpression(self, expr: AssignmentExpression):
+        # Right side must be initialized
+        return [expr.right]
+
+    def leave_AssignmentExpression(self, expr: AssignmentExpression):
+        # For compound assignments (+=, etc.), left side must be initialized
+        if expr.operator.kind != TokenKind.ASSIGN:
+            if isinstance(expr.left, Identifier):
+                if expr.left.token.value not in self.initialized[-1]:
+                    raise uninitialized_error(expr.left.token, 'used in compound assignment')
 
-        elif isinstance(expr, PrefixExpression):
-            self._check_expression_for_undefined(expr.operand)
+    def enter_PrefixExpression(self, expr: PrefixExpression):
+        if expr.prefix.kind not in _INCDEC_KINDS:
+            return None
+        # ++x or --x requires x to be initialized
+        if isinstance(expr.operand, Identifier):
+            if expr.operand.token.value not in self.initialized[-1]:
+                raise uninitialized_error(expr.operand.token, 'used in increment/decrement')
+        return SKIP
 
-        elif isinstance(expr, PostfixExpression):
-            self._check_expression_for_undefined(expr.operand)
+    # Not looked into by this pass
+    def enter_PostfixExpression(self, expr: PostfixExpression):
+        return SKIP
 
-        elif isinstance(expr, Literal):
-            # Literals are always fine
-            pass
+    def enter_CallExpression(self, expr: CallExpression):
+        return SKIP
 
-    # ==================== PASS 3: UNINITIALIZED VARIABLES ====================
+    def enter_MemberExpression(self, expr: MemberExpression):
+        return SKIP
 
-    def check_uninitialized_usage(self):
-        """Check that variables aren't used before initialization"""
-        for unit in self.ast.units:
-            if isinstance(unit, FunctionDefinition):
-                # Enter function scope
-                self._enter_scope_by_name(unit.func_ident.value)
-
-                # Parameters are initialized
-                initialized: Set[str] = set()
-                for param in unit.func_param:
-                    if param.declarator:
-                        initialized.add(param.declarator.value)
-
-                # Check function body
-                self._check_statement_for_initialization(
-                    unit.func_body, initialized)
-
-                # Exit function scope
-                self._exit_scope()
-
-    def _check_statement_for_initialization(self, stmt, initialized: Set[str]):
-        """Track initialization and check usage"""
-
-        if isinstance(stmt, DeclarationStatement):
-            for decl in stmt.declarations:
-                if decl:
-                    if decl.initializer is not None:
-                        # Check initializer first
-                        self._check_expression_for_initialization(
-                            decl.initializer, initialized)
-                        # Then mark as initialized
-                        initialized.add(decl.declarator.value)
-                    # else: declared but NOT initialized - don't add to set
-
-        elif isinstance(stmt, ExpressionStatement):
-            if stmt.expression:
-                if isinstance(stmt.expression, AssignmentExpression):
-                    # Check right side first
-                    self._check_expression_for_initialization(
-                        stmt.expression.right, initialized)
-
-                    # After assignment, left side is initialized
-                    if isinstance(stmt.expression.left, Identifier):
-                        initialized.add(stmt.expression.left.token.value)
-                else:
-                    self._check_expression_for_initialization(
-                        stmt.expression, initialized)
-
-        elif isinstance(stmt, ReturnStatement):
-            if stmt.expression:
-                self._check_expression_for_initialization(
-                    stmt.expression, initialized)
-
-        elif isinstance(stmt, CompoundStatement):
-            # Create new set for block scope (copy parent's initialized vars)
-            block_initialized = initialized.copy()
-
-            # Enter block scope
-            self._enter_first_block_scope()
-
-            for item in stmt.items:
-                self._check_statement_for_initialization(
-                    item, block_initialized)
-
-            # Exit block scope
-            self._exit_scope()
-
-            # Don't propagate block-local initializations to outer scope
-
-        elif isinstance(stmt, IfStatement):
-            # Check condition
-            self._check_expression_for_initialization(
-                stmt.condition, initialized)
-
-            # Both branches see same initialization state
-            then_init = initialized.copy()
-            self._check_statement_for_initialization(
-                stmt.then_branch, then_init)
-
-            if stmt.else_branch:
-                else_init = initialized.copy()
-                self._check_statement_for_initialization(
-                    stmt.else_branch, else_init)
-
-            # Conservative: don't propagate any new initializations from branches
-
-        elif isinstance(stmt, WhileStatement):
-            self._check_expression_for_initialization(
-                stmt.condition, initialized)
-
-            # Body doesn't guarantee execution, so don't propagate initializations
-            body_init = initialized.copy()
-            self._check_statement_for_initialization(stmt.body, body_init)
-
-        elif isinstance(stmt, DoWhileStatement):
-            # Body executes at least once
-            self._check_statement_for_initialization(stmt.body, initialized)
-            self._check_expression_for_initialization(
-                stmt.condition, initialized)
-
-        elif isinstance(stmt, ForStatement):
-            # Enter for scope
-            self._enter_scope_by_name('for_stmt')
-
-            # Create local initialization tracking
-            for_init = initialized.copy()
-
-            # Initializer
-            if stmt.initializer:
-                if isinstance(stmt.initializer, DeclarationStatement):
-                    for decl in stmt.initializer.declarations:
-                        if decl and decl.initializer:
-                            self._check_expression_for_initialization(
-                                decl.initializer, for_init)
-                            for_init.add(decl.declarator.value)
-
-                else:
-                    # initializer is ExpressionStatement
-                    if isinstance(stmt.initializer, ExpressionStatement):
-                        expr = stmt.initializer.expression  # Get the actual expression!
-                        if isinstance(expr, AssignmentExpression):
-                            # Check right side
-                            self._check_expression_for_initialization(
-                                expr.right, for_init)
-                            # Mark left side as initialized (for = operator only)
-                            if expr.operator.type == 'ASSIGN':
-                                if isinstance(expr.left, Identifier):
-                                    var_name = expr.left.token.value
-                                    for_init.add(expr.left.token.value)
-                                    initialized.add(var_name)
-                    else:
-                        # Fallback
-                        self._check_expression_for_initialization(
-                            stmt.initializer, for_init)
-            # Condition
-            if stmt.condition:
-                self._check_expression_for_initialization(
-                    stmt.condition, for_init)
-
-            # Body (doesn't guarantee execution)
-            body_init = for_init.copy()
-            self._check_statement_for_initialization(stmt.body, body_init)
-
-            # Increment
-            if stmt.increment:
-                self._check_expression_for_initialization(
-                    stmt.increment, for_init)
-
-            # Exit for scope
-            self._exit_scope()
-
-    def _check_expression_for_initialization(self, expr, initialized: Set[str]):
-        """Check if expression uses uninitialized variables"""
-
-        if isinstance(expr, Identifier):
-            var_name = expr.token.value
-
-            # Check if initialized
-            if var_name not in initialized:
-                # It's declared (we checked in pass 2), but not initialized
-                raise SemanticError(
-                    f"Variable '{var_name}' is used before being initialized.",
-                    expr.token
-                )
+    def enter_SwitchStatement(self, stmt: SwitchStatement):
+        return SKIP
+
+    def enter_LabelStatement(self, stmt: LabelStatement):
+        return SKIP
+
+
+# Kinds of diagnostic FusedAnalyzer keeps, in the order SemanticAnalyzer's
+# passes report them
+_RESTRICTION = 0
+_UNDECLARED = 1
+_UNINITIALIZED = 2
 
-        elif isinstance(expr, BinaryExpression):
-            self._check_expression_for_initialization(expr.left, initialized)
-            self._check_expression_for_initialization(expr.right, initialized)
-
-        elif isinstance(expr, AssignmentExpression):
-            # Right side must be initialized
-            self._check_expression_for_initialization(expr.right, initialized)
-
-            # Left side check depends on operator
-            # For compound assignments (+=, etc.), left side must be initialized
-            if expr.operator.type != 'ASSIGN':
-                if isinstance(expr.left, Identifier):
-                    var_name = expr.left.token.value
-                    if var_name not in initialized:
-                        raise SemanticError(
-                            f"Variable '{var_name}' is used in compound assignment "
-                            f"before being initialized.",
-                            expr.left.token
-                        )
-
-        elif isinstance(expr, PrefixExpression):
-            # ++x or --x requires x to be initialized
-            if expr.prefix.type in ('INCREMENT', 'DECREMENT'):
-                if isinstance(expr.operand, Identifier):
-                    var_name = expr.operand.token.value
-                    if var_name not in initialized:
-                        raise SemanticError(
-                            f"Variable '{var_name}' is used in increment/decrement "
-                            f"before being initialized.",
-                            expr.operand.token
-                        )
-            else:
-                self._check_expression_for_initialization(
-                    expr.operand, initialized)
-
-        elif isinstance(expr, PostfixExpression):
-
-            # x++ or x-- requires x to be initialized
-            if hasattr(expr.postfix, 'type') and expr.postfix.type in ('INCREMENT', 'DECREMENT'):
-                if isinstance(expr.operand, Identifier):
-                    var_name = expr.operand.token.value
-                    if var_name not in initialized:
-                        raise SemanticError(
-                            f"Variable '{var_name}' is used in increment/decrement "
-                            f"before being initialized.",
-                            expr.operand.token
-                        )
-            else:
-                self._check_expression_for_initialization(
-                    expr.operand, initialized)
-
-        elif isinstance(expr, Literal):
-            # Literals don't need initialization check
-            pass
-
-    # ==================== HELPER METHODS ====================
-
-    def _is_variable_defined(self, var_name: str) -> bool:
-        """Check if variable is defined in current or parent scopes"""
-        scope = self.current_scope
-        while scope is not None:
-            if var_name in scope.symbols:
-                return True
-            scope = scope.parent
-        return False
-
-    def _enter_scope_by_name(self, name: str):
-        """Enter child scope by name"""
-        for child in self.current_scope.children:
-            if child.name == name:
-                self.current_scope = child
-                return
-        raise Exception(f"Internal error: Scope '{name}' not found")
-
-    def _enter_first_block_scope(self):
-        """Enter the first block scope (handles multiple block children)"""
-        for child in self.current_scope.children:
-            if child.name == 'block':
-                self.current_scope = child
-                return
-        # If no block scope, stay in current scope
-
-    def _exit_scope(self):
-        """Return to parent scope"""
-        if self.current_scope.parent:
-            self.current_scope = self.current_scope.parent
+
+class FusedAnalyzer(SemanticAnalyzer, Visitor):
+    """
+    Builds the symbol table and runs the three SemanticAnalyzer passes in a
+    single walk of the AST, visiting each node once.
+
+    Reports the error build_symbol_table and analyze() would. A symbol
+    table error is raised where it is found. The first error of each pass
+    is kept while the walk goes on, and the one from the earliest pass is
+    raised at the end. Names are bound the way build_symbol_table binds
+    them, which is what the passes see. The increment of a for loop is
+    walked before its body, as the restriction and undeclared name passes
+    do, and an initialization error found there is held until the body is
+    walked, since that pass checks the increment last.
+
+    Initialized names are one set for the whole walk. A block records the
+    names it adds on a trail and removes them when it ends, instead of
+    working on a copy of the set.
+
+    Expressions are checked in the (tracked, restrict) mode on top of the
+    mode stack, tracked and restrict are False where the initialization or
+    restriction pass does not look.
+    """
+
+    def __init__(self, ast: Program, symbol_table: SymbolTable,
+                 check_uninitialized: bool = True):
+        super().__init__(ast, symbol_table)
+        # False when initialization is checked on the TAC instead, see
+        # check_initialization
+        self.check_uninitialized = check_uninitialized
+        self._first_errors: list[Optional[SemanticError]] = [None, None, None]
+        # (identifier, action) of names used before their declaration
+        self._unresolved: list[tuple[Identifier, str]] = []
+        self._initialized: Set[str] = set()
+        # Names added to _initialized, in order, for _end_block to remove
+        self._trail: list[str] = []
+        # Trail lengths where the open blocks and branches started
+        self._marks: list[int] = []
+        self._modes: list[tuple[bool, bool]] = [(True, True)]
+
+    def analyze(self):
+        """Build the symbol table and run all semantic checks"""
+        self.visit(self.ast)
+        self._finish()
+
+    def analyze_unit(self, unit: Any):
+        """Adds one translation unit to the symbol table and checks it
+
+        For compiling a unit at a time, the unit's errors are raised before
+        the next unit is seen, so names have to be declared in an earlier
+        unit than the one using them.
+        """
+        self.visit(unit)
+        self._finish()
+
+    def _finish(self):
+        self.symbol_table._bind_uses()
+        for ident, action in self._unresolved:
+            if not self._is_variable_defined(ident):
+                self._report(_UNDECLARED, _undeclared_error(ident.token, action))
+                break
+        self._unresolved.clear()
+
+        if not self.check_uninitialized:
+            self._first_errors[_UNINITIALIZED] = None
+        for error in self._first_errors:
+            if error is not None:
+                raise error
+
+    def _report(self, kind: int, error: SemanticError):
+        if self._first_errors[kind] is None:
+            self._first_errors[kind] = error
+
+    def _restrict(self, check, node):
+        """Run a SemanticAnalyzer restriction check and keep its error"""
+        try:
+            check(node)
+        except SemanticError as err:
+            self._report(_RESTRICTION, err)
+
+    def _initialize(self, name: str):
+        if name not in self._initialized:
+            self._initialized.add(name)
+            self._trail.append(name)
+
+    def _end_block(self, start: int):
+        """Forget the names initialized since the trail was start long"""
+        self._initialized.difference_update(self._trail[start:])
+        del self._trail[start:]
+
+    def _mark(self, _):
+        self._marks.append(len(self._trail))
+
+    def _end_mark(self, _):
+        self._end_block(self._marks.pop())
+
+    def _branch(self, stmt) -> list:
+        # Initializations in a branch or loop body do not reach past it. A
+        # block already forgets its own when it ends
+        if stmt.__class__ is CompoundStatement:
+            return [stmt]
+        return [(self._mark, None), stmt, (self._end_mark, None)]
+
+    def _push_mode(self, mode: tuple[bool, bool]):
+        self._modes.append(mode)
+
+    def _pop_mode(self, _):
+        self._modes.pop()
+
+    def _in_mode(self, work, tracked: bool, restrict: bool) -> list:
+        if self._modes[-1] == (tracked, restrict):
+            return [work]
+        return [(self._push_mode, (tracked, restrict)), work, (self._pop_mode, None)]
+
+    def _resolve(self, ident: Identifier, action: str):
+        if not self.symbol_table._bind(ident):
+            self._unresolved.append((ident, action))
+
+    def _visit_signature(self, func):
+        try:
+            _check_type_is_int(func.func_type)
+            for param in func.func_param:
+                _check_type_is_int(param.decl_type)
+        except SemanticError as err:
+            self._report(_RESTRICTION, err)
+
+    # Statements, checked in the (True, True) mode
+
+    def enter_FunctionDefinition(self, func: FunctionDefinition):
+        table = self.symbol_table
+        self._visit_signature(func)
+        table._add_function(func)
+        table._enter_scope(func.func_ident.value, func)
+        table._add_param(func.func_param)
+        # Parameters are initialized
+        for param in func.func_param:
+            if param.declarator:
+                self._initialize(param.declarator.value)
+        return [func.func_body]
+
+    def leave_FunctionDefinition(self, func: FunctionDefinition):
+        self._end_block(0)
+        self.symbol_table._exit_scope()
+
+    def enter_FunctionDeclaration(self, func: FunctionDeclaration):
+        self._visit_signature(func)
+        self.symbol_table._add_function(func)
+        return SKIP
+
+    def enter_DeclarationStatement(self, stmt: DeclarationStatement):
+        # Globals are not tracked for initialization
+        table = self.symbol_table
+        tracked = table.current_scope is not table.global_scope
+        self._restrict(_check_type_is_int, stmt.decl_type)
+        table._add_decl_stmt(stmt, 'local' if tracked else 'global')
+        items = []
+        for decl in stmt.declarations:
+            if decl and decl.initializer is not None:
+                items += self._in_mode(decl.initializer, tracked, True)
+                if tracked:
+                    items.append((self._initialize, decl.declarator.value))
+        return items
+
+    def enter_ExpressionStatement(self, stmt: ExpressionStatement):
+        expr = stmt.expression
+        if expr.__class__ is AssignmentExpression:
+            # A compound assignment statement also initializes its target
+            return self._assignment(expr, False, True)
+        return [expr] if expr else SKIP
+
+    def enter_CompoundStatement(self, stmt: CompoundStatement):
+        self.symbol_table._enter_scope('block', stmt)
+        # Block-local initializations do not reach the outer scope
+        self._mark(None)
+        return stmt.items
+
+    def leave_CompoundStatement(self, stmt: CompoundStatement):
+        self._end_mark(None)
+        self.symbol_table._exit_scope()
+
+    def enter_IfStatement(self, stmt: IfStatement):
+        items = [stmt.condition, *self._branch(stmt.then_branch)]
+        if stmt.else_branch:
+            items += self._branch(stmt.else_branch)
+        return items
+
+    def enter_WhileStatement(self, stmt: WhileStatement):
+        return [stmt.condition, *self._branch(stmt.body)]
+
+    def enter_ForStatement(self, stmt: ForStatement):
+        self.symbol_table._enter_scope('for_stmt', stmt)
+        start = len(self._trail)
+        items = []
+
+        init = stmt.initializer
+        assigned = None
+        if init.__class__ is DeclarationStatement:
+            items.append(init)
+        elif init.__class__ is ExpressionStatement:
+            # The restriction pass skips an initializer expression and the
+            # initialization pass only reads an assignment's right side
+            expr = init.expression
+            if expr.__class__ is AssignmentExpression:
+                items += self._in_mode(self._assignment(expr, False), True, False)
+                if expr.operator.kind == TokenKind.ASSIGN and expr.left.__class__ is Identifier:
+                    assigned = expr.left.token.value
+                    items.append((self._initialize, assigned))
+            elif expr:
+                items += self._in_mode(expr, False, False)
+
+        if stmt.condition:
+            items.append(stmt.condition)
+
+        # The initialization pass checks the increment after the body, so an
+        # error in the body comes first
+        held = [None]
+        if stmt.increment:
+            items += ((self._hold_from, held), stmt.increment, (self._hold, held))
+
+        items += self._branch(stmt.body)
+        items += ((self._release, held), (self._end_for, (start, assigned)))
+        return items
+
+    def _hold_from(self, held: list):
+        held[0] = self._first_errors[_UNINITIALIZED] is None
+
+    def _hold(self, held: list):
+        error = None
+        if held[0]:
+            error = self._first_errors[_UNINITIALIZED]
+            self._first_errors[_UNINITIALIZED] = None
+        held[0] = error
+
+    def _release(self, held: list):
+        if held[0] is not None:
+            self._report(_UNINITIALIZED, held[0])
+
+    def _end_for(self, end: tuple[int, Optional[str]]):
+        start, assigned = end
+        self._end_block(start)
+        # A variable assigned by the initializer stays initialized after the loop
+        if assigned is not None:
+            self._initialize(assigned)
+        self.symbol_table._exit_scope()
+
+    def enter_SwitchStatement(self, stmt: SwitchStatement):
+        # Switch bodies only declare names, none of the passes check them
+        self.symbol_table.visit(stmt)
+        return SKIP
+
+    def enter_LabelStatement(self, stmt: LabelStatement):
+        return SKIP
+
+    # Expressions, checked in the mode on top of the mode stack
+
+    def _assignment(self, expr: AssignmentExpression, compound_check: bool,
+                    initializes: bool = False) -> list:
+        unrestricted = self._first_errors[_RESTRICTION] is None
+        return [expr.right, (self._assignment_target,
+                             (expr, unrestricted, compound_check, initializes))]
+
+    def _assignment_target(self, args: tuple[AssignmentExpression, bool, bool, bool]):
+        expr, unrestricted, compound_check, initializes = args
+        tracked, restrict = self._modes[-1]
+        left = expr.left
+        if left.__class__ is Identifier:
+            self._resolve(left, 'assigned')
+            if (compound_check and tracked
+                    and expr.operator.kind != TokenKind.ASSIGN
+                    and left.token.value not in self._initialized):
+                self._report(_UNINITIALIZED,
+                             uninitialized_error(left.token, 'used in compound assignment'))
+            if initializes:
+                self._initialize(left.token.value)
+        else:
+            self.symbol_table.visit(left)
+            if restrict:
+                # The restriction pass checks the left side before the right
+                try:
+                    self._check_expression_restrictions(left)
+                except SemanticError as err:
+                    if unrestricted:
+                        self._first_errors[_RESTRICTION] = err
+
+    def enter_AssignmentExpression(self, expr: AssignmentExpression):
+        return self._assignment(expr, True)
+
+    def enter_Identifier(self, expr: Identifier):
+        token = expr.token
+        self._resolve(expr, 'used')
+        if self._modes[-1][0] and token.value not in self._initialized:
+            self._report(_UNINITIALIZED, uninitialized_error(token, 'used'))
+        return SKIP
+
+    def enter_Literal(self, expr: Literal):
+        if self._modes[-1][1] and expr.token.kind in _RESTRICTED_LITERAL_KINDS:
+            self._restrict(self._check_expression_restrictions, expr)
+        return SKIP
+
+    def enter_PrefixExpression(self, expr: PrefixExpression):
+        if expr.prefix.kind not in _INCDEC_KINDS:
+            return None
+        # ++x or --x requires x to be initialized
+        tracked, restrict = self._modes[-1]
+        operand = expr.operand
+        return [*self._in_mode(operand, False, restrict), (self._check_incdec, (operand, tracked))]
+
+    def _check_incdec(self, args: tuple[Any, bool]):
+        operand, tracked = args
+        if (tracked and operand.__class__ is Identifier
+                and operand.token.value not in self._initialized):
+            self._report(_UNINITIALIZED,
+                         uninitialized_error(operand.token, 'used in increment/decrement'))
+
+    def enter_CallExpression(self, expr):
+        # Bound for later passes but not checked
+        self.symbol_table.visit(expr)
+        if self._modes[-1][1]:
+            self._restrict(self._check_expression_restrictions, expr)
+        return SKIP
+
+    enter_MemberExpression = enter_CallExpression
+
+    def enter_PostfixExpression(self, expr: PostfixExpression):
+        # The operand is kept in the postfix field, which none of the
+        # passes look into
+        self.symbol_table.visit(expr)
+        return SKIP
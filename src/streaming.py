@@ -0,0 +1,79 @@
+from typing import Iterable, Iterator, TextIO
+from src.ast_nodes import FunctionDefinition, FunctionDeclaration, DeclarationStatement
+from src.symbol_table import SymbolTable
+from src.semantic_analyzer import FusedAnalyzer
+from src.tac import TAC
+from src.asm import tac_to_asm
+from src.optimizations.ast_constant_fold import fold_ast_constants
+from src.optimizations.definite_initialization import check_initialization
+from src.optimizations.optimize import optimize_tac
+from src.optimizations.register_optimization import register_optimization
+
+"""
+Compiles a program one translation unit at a time
+
+Each unit from Parser.iter_units goes through the semantic checks, TAC
+generation, the -o1 passes, register allocation and tac_to_asm before the
+next unit is parsed. Afterwards the unit's scopes, bindings and TAC are
+dropped, so what is held at once is one function's AST and IR plus the
+global symbols, not the whole program.
+
+Every function gets its own registers and stack frame, where the
+whole-program tac_to_asm allocates them across all functions, and its
+labels and temps are numbered from 0. Names have to be declared in a unit
+before the one using them.
+"""
+
+_Unit = FunctionDefinition | FunctionDeclaration | DeclarationStatement
+
+
+class StreamingCompiler:
+    """Holds what outlives a unit, the global symbols and the name IDs"""
+
+    def __init__(self, optimize: bool = False, init_check: str = 'ast'):
+        self.optimize = optimize
+        self.init_check = init_check
+        self.symbol_table = SymbolTable()
+        self.analyzer = FusedAnalyzer(None, self.symbol_table,
+                                      check_uninitialized=init_check == 'ast')
+        self.tac = TAC(value_numbering=optimize)
+        self.functions = 0
+
+    def compile_unit(self, unit: _Unit) -> list[str]:
+        """Assembly of one unit, empty for a declaration
+
+        Raises the error the whole-program pipeline would raise for the unit
+        """
+        self.analyzer.analyze_unit(unit)
+        if self.optimize:
+            fold_ast_constants(unit)
+        tac = self.tac
+        tac.generate_unit(unit, self.symbol_table)
+        if self.init_check == 'cfg':
+            check_initialization(tac)
+        # Nothing below needs the unit's scopes
+        self.symbol_table.forget_locals()
+        if not tac.functions:
+            return []
+        if self.optimize:
+            optimize_tac(tac)
+        self.functions += len(tac.functions)
+        asm = tac_to_asm(tac, register_optimization(tac))
+        tac.functions = []
+        return asm
+
+    def compile(self, units: Iterable[_Unit]) -> Iterator[str]:
+        """Assembly lines of every unit, each unit compiled when the lines reach it"""
+        for unit in units:
+            asm = self.compile_unit(unit)
+            # Drop the unit before the next one is parsed
+            del unit
+            yield from asm
+
+    def write(self, units: Iterable[_Unit], file: TextIO) -> int:
+        """Writes the assembly of every unit to file as it is compiled, returns the line count"""
+        count = 0
+        for line in self.compile(units):
+            file.write(f"{line}\n")
+            count += 1
+        return count
@@ -1,18 +1,29 @@
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Hashable, Optional
 from src.ast_nodes import (
     Program,
     FunctionDefinition,
     FunctionDeclaration,
     DeclarationStatement,
     CompoundStatement,
-    IfStatement,
-    WhileStatement,
-    DoWhileStatement,
     ForStatement,
-    SwitchStatement
+    SwitchStatement,
+    LabelStatement,
+    Identifier
 )
 from src.errors import SymbolTableError
+from src.interning import NameTable
+from src.visitor import Visitor, SKIP
+
+
+def node_key(node: Any) -> Hashable:
+    """Key of an AST node in SymbolTable.scopes and SymbolTable.bindings
+
+    Dataclass nodes compare by value and are unhashable, so they are keyed
+    by identity. Arena cursors are made on every access and hash by their
+    arena and index.
+    """
+    return id(node) if type(node).__hash__ is None else node
 
 
 @dataclass
@@ -43,12 +54,29 @@ class Scope:
         return s
 
 
-class SymbolTable:
+class SymbolTable(Visitor):
     def __init__(self):
         self.global_scope = Scope(0, 'global', None)
         self.head = self.global_scope
         self.current_scope = self.global_scope
         self.next_id = 1
+        # Resolved once while the table is built so later passes never look
+        # a name up again. scopes maps each FunctionDefinition,
+        # CompoundStatement and ForStatement to the Scope built for it and
+        # bindings maps each Identifier use to its Symbol, both by node_key.
+        # A use is bound to the declaration visible where it appears. One
+        # declared only later in an enclosing scope is bound once the table
+        # is finished, which is what SemanticAnalyzer's checks accept
+        self.scopes: dict[Hashable, Scope] = {}
+        self.bindings: dict[Hashable, Symbol] = {}
+        self._uses: list[tuple[Any, Scope]] = []
+        # The innermost Symbol of each name declared so far in the scopes
+        # being built, so binding a use is one dict lookup. Each open scope
+        # keeps what its declarations shadowed, restored when it is exited
+        self._visible: dict[str, Symbol] = {}
+        self._shadowed: list[list[tuple[str, Optional[Symbol]]]] = [[]]
+        # IDs of every declared name, TAC adds its temps and labels after them
+        self.names = NameTable()
 
     def __repr__(self):
         order = self.dump()
@@ -57,19 +85,50 @@ class SymbolTable:
             s += str(scope)
         return s
 
-    def _enter_scope(self, name):
+    def scope_of(self, node) -> Scope:
+        """The Scope of a FunctionDefinition, CompoundStatement or ForStatement"""
+        return self.scopes[node_key(node)]
+
+    def symbol_of(self, identifier) -> Optional[Symbol]:
+        """The Symbol an Identifier use refers to, None if it is undeclared"""
+        return self.bindings.get(node_key(identifier))
+
+    def forget_locals(self):
+        """Drops every scope below the global scope and every recorded binding
+
+        For compiling a unit at a time, once the units analyzed so far are
+        compiled. The global symbols stay for the units after them.
+        """
+        self.global_scope.children.clear()
+        self.scopes.clear()
+        self.bindings.clear()
+
+    def _enter_scope(self, name, node=None):
         new_scope = Scope(self.next_id, name, self.current_scope)
         self.next_id += 1
         self.current_scope.children.append(new_scope)
         self.current_scope = new_scope
+        self._shadowed.append([])
+        if node is not None:
+            self.scopes[node_key(node)] = new_scope
 
     def _exit_scope(self):
         if self.current_scope.parent is None:
             raise SymbolTableError('Can not back escape global scope', None)
         self.current_scope = self.current_scope.parent
+        visible = self._visible
+        for name, symbol in reversed(self._shadowed.pop()):
+            if symbol is None:
+                del visible[name]
+            else:
+                visible[name] = symbol
 
     def _add_symbol(self, name, data):
-        self.current_scope.add(name, data)
+        scope = self.current_scope
+        scope.add(name, data)
+        self._shadowed[-1].append((name, self._visible.get(name)))
+        self._visible[name] = scope.symbols[name]
+        self.names.intern(name)
 
     # Loops through using dfs and returns an array or ordered scope
     def dump(self):
@@ -88,18 +147,72 @@ class SymbolTable:
 
     # Entry
     def build_symbol_table(self, program: Program):
-        # loop through everything in global scope
-        for unit in program.units:
-            if isinstance(unit, FunctionDefinition):
-                self._add_function(unit)
-                self._enter_scope(unit.func_ident.value)
-                self._add_param(unit.func_param)
-                self._add_compound_stmt(unit.func_body)
-                self._exit_scope()
-            elif isinstance(unit, FunctionDeclaration):
-                self._add_function(unit)
-            elif isinstance(unit, DeclarationStatement):
-                self._add_decl_stmt(unit, 'global')
+        self.visit(program)
+        self._bind_uses()
+
+    # Visitor hooks, each adds what its node declares and binds the names
+    # its expressions use
+    def enter_FunctionDefinition(self, func: FunctionDefinition):
+        self._add_function(func)
+        self._enter_scope(func.func_ident.value, func)
+        self._add_param(func.func_param)
+        return [func.func_body]
+
+    def enter_FunctionDeclaration(self, func: FunctionDeclaration):
+        self._add_function(func)
+        return SKIP
+
+    def enter_DeclarationStatement(self, stmt: DeclarationStatement):
+        kind = 'global' if self.current_scope is self.global_scope else 'local'
+        self._add_decl_stmt(stmt, kind)
+        return [decl.initializer for decl in stmt.declarations
+                if decl and decl.initializer is not None]
+
+    def enter_CompoundStatement(self, block: CompoundStatement):
+        self._enter_scope('block', block)
+        return block.items
+
+    def enter_ForStatement(self, stmt: ForStatement):
+        # enter scope before declaring conditional variables
+        self._enter_scope('for_stmt', stmt)
+
+    def enter_SwitchStatement(self, stmt: SwitchStatement):
+        # Case labels are constants, only the sections' statements are added
+        return [stmt.expression, *(section.items for section in stmt.body)]
+
+    def enter_LabelStatement(self, stmt: LabelStatement):
+        return SKIP
+
+    def enter_Identifier(self, ident: Identifier):
+        self._bind(ident)
+        return SKIP
+
+    def _leave_scope(self, node):
+        self._exit_scope()
+
+    leave_FunctionDefinition = leave_CompoundStatement = leave_ForStatement = _leave_scope
+
+    def _bind(self, ident) -> bool:
+        """Binds a use of a name, False if it is not declared yet"""
+        symbol = self._visible.get(ident.token.value)
+        if symbol is not None:
+            self.bindings[node_key(ident)] = symbol
+            return True
+        self._uses.append((ident, self.current_scope))
+        return False
+
+    def _bind_uses(self):
+        # Binds the uses of names that were declared after them
+        bindings = self.bindings
+        for ident, scope in self._uses:
+            name = ident.token.value
+            while scope is not None:
+                symbol = scope.symbols.get(name)
+                if symbol is not None:
+                    bindings[node_key(ident)] = symbol
+                    break
+                scope = scope.parent
+        self._uses.clear()
 
     def _add_function(self, func):
         name = func.func_ident.value
@@ -142,41 +255,3 @@ class SymbolTable:
                                   'type': unit.decl_type.base.value,
                                   'line': decl.declarator.line_num,
                                   'char': decl.declarator.char_num})
-
-    def _add_compound_stmt(self, block):
-        self._enter_scope('block')
-        for stmt in block.items:
-            self._traverse_stmt(stmt)
-        self._exit_scope()
-
-    # used to find which statements need to be added to symbol table
-    def _traverse_stmt(self, stmt):
-        if isinstance(stmt, DeclarationStatement):
-            self._add_decl_stmt(stmt, 'local')
-
-        elif isinstance(stmt, CompoundStatement):
-            self._add_compound_stmt(stmt)
-
-        elif isinstance(stmt, IfStatement):
-            self._traverse_stmt(stmt.then_branch)
-            if stmt.else_branch:
-                self._traverse_stmt(stmt.else_branch)
-
-        elif isinstance(stmt, WhileStatement):
-            self._traverse_stmt(stmt.body)
-
-        elif isinstance(stmt, DoWhileStatement):
-            self._traverse_stmt(stmt.body)
-
-        elif isinstance(stmt, ForStatement):
-            # enter scope before declaring conditional variables
-            self._enter_scope('for_stmt')
-            if isinstance(stmt.initializer, DeclarationStatement):
-                self._add_decl_stmt(stmt.initializer, 'local')
-            self._traverse_stmt(stmt.body)
-            self._exit_scope()
-
-        elif isinstance(stmt, SwitchStatement):
-            for switch_stmt in stmt.body:
-                for items in switch_stmt.items:
-                    self._traverse_stmt(items)
@@ -25,9 +25,11 @@ from src.ast_nodes import (
     CompoundStatement
 )
 from typing import Any
-from src.tokens import Token, IDENTIFIER, NUMBER
+from src.tokens import Token, TokenKind, IDENTIFIER, NUMBER, ASSIGN_TO_BINARY, SYMBOL_TEXT
 from src.errors import *
 from src.symbol_table import SymbolTable
+from src.interning import NameTable
+from src.visitor import Visitor, SKIP
 '''
 Instruction has general format of:
     res = left op right
@@ -35,8 +37,27 @@ For loop statements, labels, and gotos Instruction is used differently
 '''
 # Instruction Types: ASSIGN, PARAM, CALL, LABEL, IF, FOR, WHILE, RETURN, DECL
 
+# Operators whose operands can be swapped without changing the value
+_COMMUTATIVE_KINDS = frozenset({
+    TokenKind.PLUS, TokenKind.MULTIPLY, TokenKind.EQUAL, TokenKind.NOTEQUAL,
+    TokenKind.BITAND, TokenKind.BITOR, TokenKind.BITXOR, TokenKind.LOGAND, TokenKind.LOGOR,
+})
+
+# op tokens of the structural instructions and res of PARAM, shared by
+# every instruction since tokens are never changed in place
+LABEL_OP = Token('LABEL', 'label')
+GOTO_OP = Token('GOTO', 'goto')
+IF_OP = Token('IFSTMT', 'if')
+FOR_OP = Token('FORSTMT', 'for')
+WHILE_OP = Token('WHILESTMT', 'while')
+RETURN_OP = Token('RETURN', 'return')
+CALL_OP = Token('CALL', 'call')
+PARAM_RES = Token('PARAM', 'param')
+
 
 class Instruction:
+    __slots__ = ('op', 'left', 'right', 'res', 'instr_type')
+
     def __init__(self, instr_type: Token | str,
                  res: Token | str,
                  left: Token | str | None,
@@ -66,8 +87,8 @@ class FunctionBlock:
         self.params = []
 
 
-class TAC:
-    def __init__(self):
+class TAC(Visitor):
+    def __init__(self, value_numbering: bool = False):
         self.symbol_table: SymbolTable | None = None
         self.temp_var_count: int = 0
         self.label_count: int = 0
@@ -77,30 +98,91 @@ class TAC:
         # Control-flow stack to track break/continue
         self.ctrl_stack: list[dict[str, str]] = []
         self.globals: list[Instruction] = []
+        # IDs of the names in the instructions. generate_tac takes over the
+        # symbol table's, so variables keep the IDs they were declared with
+        self.names = NameTable()
+        # IDs of the number literals, interned by src.ir as it encodes them
+        # since folding keeps making new ones
+        self.constants = NameTable()
+        # Values of the expressions being generated, innermost last
+        self._operands: list[Token] = []
+        # Local value numbering, an operation already computed in the current
+        # basic block reuses its temp instead of being emitted again.
+        # _values maps (operator, operand keys) to the temp holding the result
+        # and that temp's version, _versions counts assignments to each name
+        # so a key or temp goes stale as soon as one of its names is assigned
+        self.value_numbering = value_numbering
+        self._values: dict[tuple, tuple[Token, int]] = {}
+        self._versions: dict[str, int] = {}
+        # Temps handed out more than once, which must not change in place
+        self._shared: set[str] = set()
+        # Instructions, and so temps, saved by value numbering
+        self.reused_values = 0
 
     def _push_to_block(self, instr: Instruction) -> None:
+        if self.value_numbering:
+            self._number(instr)
         # if global
         if (self.cur_func == None):
 
             self.globals.append(instr)
         else:
             # If theres a label create a new instruction block
-            if (isinstance(instr.op, Token) and instr.op.type == 'LABEL'):
+            if (isinstance(instr.op, Token) and instr.op.kind == TokenKind.LABEL):
                 new_block = BasicBlock()
                 self.cur_func.blocks.append(new_block)
                 self.cur_block = new_block
             assert (self.cur_block)
             self.cur_block.instr_list.append(instr)
 
+    def _number(self, instr: Instruction) -> None:
+        # Keeps the value table valid once instr is pushed
+        if instr.instr_type in ('ASSIGN', 'DECL') and isinstance(instr.res, Token):
+            name = instr.res.value
+            self._versions[name] = self._versions.get(name, 0) + 1
+        elif instr.instr_type in ('LABEL', 'CALL'):
+            # Control may reach a label from elsewhere, and a call may
+            # assign any global
+            self._values.clear()
+
+    def _operand_key(self, operand: Token | str | None) -> Any:
+        if isinstance(operand, Token):
+            if operand.kind == TokenKind.IDENTIFIER:
+                return (operand.value, self._versions.get(operand.value, 0))
+            return (operand.kind, operand.value)
+        return operand
+
+    def _emit_value(self, left: Token, right: Token | None, op: Token) -> Token:
+        # Emits temp = left op right, unless value numbering finds a temp in
+        # this block that already holds it
+        key = None
+        if self.value_numbering:
+            operands = (self._operand_key(left), self._operand_key(right))
+            if op.kind in _COMMUTATIVE_KINDS:
+                operands = tuple(sorted(operands, key=repr))
+            key = (op.kind, *operands)
+            found = self._values.get(key)
+            if found is not None and self._versions.get(found[0].value) == found[1]:
+                self.reused_values += 1
+                self._shared.add(found[0].value)
+                return found[0]
+        temp = self._get_temp_var()
+        self._push_to_block(Instruction('ASSIGN', temp, left, right, op))
+        if key is not None:
+            self._values[key] = (temp, self._versions[temp.value])
+        return temp
+
     def _get_temp_var(self) -> Token:
         temp_name = f'%t{self.temp_var_count}'
         self.temp_var_count += 1
+        self.names.intern(temp_name)
         tok = Token(IDENTIFIER, temp_name)
         return tok
 
     def _get_label(self) -> str:
         label_name = f"%L{self.label_count}"
         self.label_count += 1
+        self.names.intern(label_name)
         return label_name
 
     def _push_ctrl(self,
@@ -136,19 +218,51 @@ class TAC:
                      symbol_table
                      ) -> list[FunctionBlock]:
         self.symbol_table = symbol_table
-        self._program(head)
+        self.names = symbol_table.names
+        self.visit(head)
         return self.functions
 
-    def _program(self, program: Program) -> None:
-        for unit in program.units:
-            if (isinstance(unit, FunctionDefinition)):
-                self._func_def(unit)
-            elif (isinstance(unit, DeclarationStatement)):
-                self._decl_stmt(unit)
-            else:
-                raise TACError('Invalid Program Structure', unit)
+    def generate_unit(self,
+                      unit: FunctionDefinition | DeclarationStatement,
+                      symbol_table
+                      ) -> list[FunctionBlock]:
+        """Generates one translation unit in place of the last one
+
+        For compiling a unit at a time, self.functions only holds the
+        unit's function afterwards. Temps and labels are numbered from 0
+        again, labels are local to their function in the assembly. Globals
+        are still collected in self.globals.
+        """
+        self.symbol_table = symbol_table
+        self.names = symbol_table.names
+        self.functions = []
+        self.cur_func = None
+        self.cur_block = None
+        self.temp_var_count = 0
+        self.label_count = 0
+        self._versions.clear()
+        self._shared.clear()
+        self.visit(Program([unit]))
+        return self.functions
+
+    # Visitor hooks. Statements emit their instructions, expressions leave
+    # the Token holding their value on _operands for the node that uses it.
+    # Work between two children, such as the labels around a branch, is
+    # queued as an action after the first child
+    def enter_default(self, stmt: Any) -> None:
+        raise TACError('Invalid Function Defenition Structure', stmt)
+
+    def enter_Program(self, program: Program) -> list:
+        return [(self._unit, unit) for unit in program.units]
+
+    def _unit(self, unit: Any) -> list:
+        # Values computed in one function or global are not shared with another
+        self._values.clear()
+        if not isinstance(unit, (FunctionDefinition, DeclarationStatement)):
+            raise TACError('Invalid Program Structure', unit)
+        return [unit]
 
-    def _func_def(self, func_def: FunctionDefinition) -> None:
+    def enter_FunctionDefinition(self, func_def: FunctionDefinition) -> list:
         # Setup blocks and function blocks
         func_name = func_def.func_ident
         if (self.symbol_table is None):
@@ -168,130 +282,128 @@ class TAC:
             if param.declarator is None:
                 continue
             incoming = Token('IDENTIFIER', f'%param{i}')
+            self.names.intern(incoming.value)
             func.params.append(incoming.value)
             self._push_to_block(Instruction(
                 'ASSIGN', param.declarator, incoming))
-        stmt_list = func_def.func_body
-        self._loop_stmts(stmt_list)
+        return [func_def.func_body]
 
-    def _decl_stmt(self, decl: DeclarationStatement) -> None:
+    def enter_CompoundStatement(self, stmt: CompoundStatement) -> list:
+        return stmt.items
+
+    def enter_DeclarationStatement(self, decl: DeclarationStatement) -> list:
+        children = []
         for decl_obj in decl.declarations:
             if (isinstance(decl_obj, VarDeclaration)):
+                # Nothing is emitted for a declaration without a value
                 if (decl_obj.initializer is None):
-                    break
-                self._var_decl(decl_obj)
+                    continue
+                children.append(decl_obj.initializer)
+                children.append((self._var_decl, decl_obj.declarator))
             else:
-                raise TACError(
-                    'Invalid Declaration Statement Structure', decl_obj)
+                # Raised once the declarations before it are generated
+                children.append((self._raise, TACError(
+                    'Invalid Declaration Statement Structure', decl_obj)))
+                break
+        return children
+
+    def _var_decl(self, var_ident: Token) -> None:
+        value = self._operands.pop()
+        self._push_to_block(Instruction('DECL', var_ident, value))
 
-    def _expr_stmt(self, expr_stmt: ExpressionStatement) -> None:
+    def _raise(self, err: Exception) -> None:
+        raise err
+
+    def enter_ExpressionStatement(self, expr_stmt: ExpressionStatement) -> list:
         expr = expr_stmt.expression
         if expr is None:
-            return
+            return SKIP
+        return self._effect(expr)
+
+    def _effect(self, expr: Any) -> list:
+        # An expression evaluated for its side effects, its value is dropped
         if (isinstance(expr, AssignmentExpression)):
-            self._assign_expr(expr)
-        else:
-            self._get_expression(expr)
+            return self._assign_expr(expr)
+        return [expr, (self._discard, expr)]
 
-    def _assign_expr(self, expr: AssignmentExpression) -> None:
-        operator = expr.operator  # has to be a token
+    def _discard(self, expr: Any) -> None:
+        self._operands.pop()
+
+    def _assign_expr(self, expr: AssignmentExpression) -> list:
         left = expr.left.token  # has to be an identifier
-        right = self._get_expression(expr.right)
+        return [expr.right, (self._assign, (expr.operator, left))]
+
+    def _assign(self, target: tuple[Token, Token]) -> None:
+        operator, left = target  # operator has to be a token
+        right = self._operands.pop()
         # For operator assigns, do operation with temp var, then assign
-        if (operator.type == 'ASSIGN'):
+        if (operator.kind == TokenKind.ASSIGN):
             self._push_to_block(Instruction('ASSIGN', left, right))
-        elif (operator.type == 'PLUSASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('PLUS', '+')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'MINUSASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('MINUS', '-')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'MULTASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('MULTIPLY', '*')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'DIVASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('DIVIDE', '/')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'MODASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('MODULUS', '%')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'ANDASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('BITAND', '&')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'ORASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('BITOR', '|')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'XORASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('BITXOR', '^')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'LSHIFTASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('LEFTSHIFT', '<<')))
-            self._push_to_block(Instruction('ASSIGN', left, temp_add))
-        elif (operator.type == 'RSHIFTASSIGN'):
-            temp_add = self._get_temp_var()
-            self._push_to_block(Instruction(
-                'ASSIGN', temp_add, left, right, Token('RIGHTSHIFT', '>>')))
+        elif (ASSIGN_TO_BINARY[operator.kind] is not None):
+            binary = ASSIGN_TO_BINARY[operator.kind]
+            temp_add = self._emit_value(left, right, Token(binary, SYMBOL_TEXT[binary]))
             self._push_to_block(Instruction('ASSIGN', left, temp_add))
         else:
             raise TACError("Invlaid Assignment", operator)
 
-    def _bi_expr(self, bi_expr: BinaryExpression) -> Token:
-        # Creates a temparary variable for left and right of expression and returns it
-        op = bi_expr.operator
-        left = self._get_expression(bi_expr.left)
-        right = self._get_expression(bi_expr.right)
-        temp_store = self._get_temp_var()
-        self._push_to_block(Instruction('ASSIGN', temp_store, left, right, op))
-        return temp_store
+    def enter_AssignmentExpression(self, expr: AssignmentExpression) -> None:
+        # Assignments are only generated as statements
+        raise TACError('Invalid Statement Structure', expr)
+
+    def enter_NoneType(self, expr: None) -> None:
+        raise TACError('Invalid Statement Structure', expr)
+
+    def enter_Literal(self, lit: Literal) -> tuple:
+        self._operands.append(lit.token)
+        return SKIP
+
+    def enter_Identifier(self, ident: Identifier) -> tuple:
+        self._operands.append(ident.token)
+        return SKIP
+
+    def enter_Token(self, tok: Token) -> tuple:
+        self._operands.append(tok)
+        return SKIP
+
+    def enter_BinaryExpression(self, bi_expr: BinaryExpression) -> list:
+        return [bi_expr.left, bi_expr.right]
+
+    def leave_BinaryExpression(self, bi_expr: BinaryExpression) -> None:
+        # Creates a temparary variable for left and right of expression
+        right = self._operands.pop()
+        left = self._operands.pop()
+        self._operands.append(self._emit_value(left, right, bi_expr.operator))
 
-    def _post_expr(self, post_expr: PostfixExpression) -> Token:
+    def enter_PostfixExpression(self, post_expr: PostfixExpression) -> tuple:
         # set temp_var = identifier then preform postfix
-        # returns the temp_var
+        # the value is the temp_var
         operand = post_expr.operand
         postfix = post_expr.postfix
         ident = None
         pre_incement = self._get_temp_var()
         if (isinstance(postfix, Identifier)):
-            ident = self._identifier(postfix)
+            ident = postfix.token
         else:
             raise TACError('Invalid Postfix Structure', postfix)
-        if (operand.type == 'INCREMENT' or operand.type == 'DECREMENT'):
+        if (operand.kind == TokenKind.INCREMENT or operand.kind == TokenKind.DECREMENT):
             self._push_to_block(Instruction(
                 'ASSIGN', ident, ident, Token(NUMBER, '1'), operand))
         else:
             raise TACError('Invalid Postfix Structure', operand.type)
-        return pre_incement
+        self._operands.append(pre_incement)
+        return SKIP
 
-    def _pre_expr(self, pre_expr: PrefixExpression) -> Token:
+    def enter_PrefixExpression(self, pre_expr: PrefixExpression) -> list:
+        return [pre_expr.operand]
+
+    def leave_PrefixExpression(self, pre_expr: PrefixExpression) -> None:
+        self._operands.append(self._pre_expr(pre_expr, self._operands.pop()))
+
+    def _pre_expr(self, pre_expr: PrefixExpression, ident: Token) -> Token:
         operand = pre_expr.operand
         prefix = pre_expr.prefix
-        ident = None
-        if (isinstance(operand, Identifier)):
-            ident = self._identifier(operand)
-        elif (isinstance(operand, Literal)):
-            ident = operand.token
-        else:
-            ident = self._get_expression(operand)
 
-        if (prefix.type == 'INCREMENT' or prefix.type == 'DECREMENT'):
+        if (prefix.kind == TokenKind.INCREMENT or prefix.kind == TokenKind.DECREMENT):
             if not isinstance(operand, Identifier):
                 raise TACError(
                     f'Cannot apply {prefix.value} to non-identifier',
@@ -301,51 +413,52 @@ class TAC:
                 'ASSIGN', ident, ident, Token(NUMBER, '1'), prefix))
             return ident
 
-        elif (prefix.type == 'BITNOT'):
-            if isinstance(operand, Literal):
-                temp = self._get_temp_var()
-                self._push_to_block(Instruction(
-                    'ASSIGN', temp, ident, None, Token('BITNOT', '~')))
-                return temp
+        elif (prefix.kind == TokenKind.BITNOT):
+            # Constants and temps shared by value numbering get a new temp
+            if (isinstance(operand, Literal) or ident.kind == TokenKind.NUMBER
+                    or ident.value in self._shared):
+                return self._emit_value(ident, None, Token('BITNOT', '~'))
             else:
                 self._push_to_block(Instruction(
                     'ASSIGN', ident, ident, None, Token('BITNOT', '~')))
                 return ident
 
-        elif prefix.type == 'LOGNOT':
-            if isinstance(operand, Literal):
-                temp = self._get_temp_var()
-                self._push_to_block(Instruction(
-                    'ASSIGN', temp, ident, None, Token('LOGNOT', '!')))
-                return temp
+        elif prefix.kind == TokenKind.LOGNOT:
+            # Constants and temps shared by value numbering get a new temp
+            if (isinstance(operand, Literal) or ident.kind == TokenKind.NUMBER
+                    or ident.value in self._shared):
+                return self._emit_value(ident, None, Token('LOGNOT', '!'))
             else:
                 self._push_to_block(Instruction(
                     'ASSIGN', ident, ident, None, Token('LOGNOT', '!')))
                 return ident
 
-        elif prefix.type == 'PLUS':
+        elif prefix.kind == TokenKind.PLUS:
             return ident
 
-        elif prefix.type == 'MINUS':
-            if isinstance(operand, Literal) and operand.token.type == 'NUMBER':
+        elif prefix.kind == TokenKind.MINUS:
+            if isinstance(operand, Literal) and operand.token.kind == TokenKind.NUMBER:
                 negated_value = ('-' + operand.token.value
                                  if operand.token.value[0] != '-'
                                  else operand.token.value[1:])
                 return Token(NUMBER, negated_value)
             else:
-                temp = self._get_temp_var()
-                self._push_to_block(Instruction(
-                    'ASSIGN', temp, Token(NUMBER, '0'), ident, Token('MINUS', '-')))
-                return temp
+                return self._emit_value(Token(NUMBER, '0'), ident, Token('MINUS', '-'))
 
         else:
             raise TACError('Invalid Prefix Operator', prefix)
 
-    def _function_call(self, call: CallExpression) -> Token:
+    def enter_CallExpression(self, call: CallExpression) -> list:
+        children = []
         for arg in call.arguments:
-            param = Token('PARAM', 'param')
-            expr = self._get_expression(arg)
-            self._push_to_block(Instruction('PARAM', param, expr))
+            children.append(arg)
+            children.append((self._param, arg))
+        return children
+
+    def _param(self, arg: Any) -> None:
+        self._push_to_block(Instruction('PARAM', PARAM_RES, self._operands.pop()))
+
+    def leave_CallExpression(self, call: CallExpression) -> None:
         temp_var = self._get_temp_var()
         tok_name = call.callee.token.value  # name of funciton
         # when CALL token is found the arguments are used as follows:
@@ -354,90 +467,104 @@ class TAC:
         # 3. N/A
         # 4. Token type Call
         self._push_to_block(Instruction(
-            'CALL', temp_var, tok_name, None, Token('CALL', 'call')))
-        return temp_var
+            'CALL', temp_var, tok_name, None, CALL_OP))
+        self._operands.append(temp_var)
 
-    def _switch_stmt(self, stmt: SwitchStatement) -> None:
-        label_tok = Token('LABEL', 'label')
-        case_tok = Token('CASE', 'case')
+    def enter_MemberExpression(self, expr: MemberExpression) -> None:
+        raise NotImplementedError
+
+    def enter_SwitchStatement(self, stmt: SwitchStatement) -> list:
         label_end = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         assert (isinstance(label_end.res, str))
         self._push_ctrl(label_end.res)
-        for cases in stmt.body:
-            # Creates a an if statement with control flow for true and false
-            case_cond = self._get_expression(cases.labels[0].expression)
-            label_true = Instruction(
-                'LABEL', self._get_label(), None, None, label_tok)
-            label_false = Instruction(
-                'LABEL', self._get_label(), None, None, label_tok)
-            self._push_to_block(Instruction(
-                'IF', case_cond, label_true.res, label_false.res, Token('IFSTMT', 'if')))
-            self._push_to_block(label_true)
-            self._loop_stmts(cases)
-            self._push_to_block(label_false)
+        children: list = [(self._case, cases) for cases in stmt.body]
+        children.append((self._end_switch, label_end))
+        return children
+
+    def _case(self, cases: Any) -> list:
+        return [cases.labels[0].expression, (self._case_body, cases)]
+
+    def _case_body(self, cases: Any) -> list:
+        # Creates a an if statement with control flow for true and false
+        case_cond = self._operands.pop()
+        label_true = Instruction(
+            'LABEL', self._get_label(), None, None, LABEL_OP)
+        label_false = Instruction(
+            'LABEL', self._get_label(), None, None, LABEL_OP)
+        self._push_to_block(Instruction(
+            'IF', case_cond, label_true.res, label_false.res, IF_OP))
+        self._push_to_block(label_true)
+        return [cases, (self._push_to_block, label_false)]
+
+    def _end_switch(self, label_end: Instruction) -> None:
         self._push_to_block(label_end)
         self._pop_ctrl()
 
-    def _for_stmt(self, stmt: ForStatement) -> None:
-        label_tok = Token('LABEL', 'label')
-        for_tok = Token('FORSTMT', 'for')
+    def enter_ForStatement(self, stmt: ForStatement) -> list:
         label_start = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_stmts = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_incr = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_end = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
+        assert (isinstance(label_start.res, str))
 
+        children = []
         # initializer
         if stmt.initializer is not None:
             if isinstance(stmt.initializer, DeclarationStatement):
-                self._decl_stmt(stmt.initializer)
+                children.append(stmt.initializer)
             elif isinstance(stmt.initializer, ExpressionStatement):
                 if stmt.initializer.expression:
-                    if isinstance(stmt.initializer.expression, AssignmentExpression):
-                        self._assign_expr(stmt.initializer.expression)
-                    else:
-                        self._get_expression(stmt.initializer.expression)
-            assert (isinstance(label_start.res, str))
-            self._goto_stmt(label_start.res)
-        self._push_to_block(label_start)
-        condition = self._get_expression(stmt.condition)
+                    children += self._effect(stmt.initializer.expression)
+            children.append((self._goto_stmt, label_start.res))
+        children.append((self._push_to_block, label_start))
+        children.append(stmt.condition)
+        children.append((self._for_body, (stmt, label_start, label_stmts, label_incr, label_end)))
+        return children
+
+    def _for_body(self, args: tuple) -> list:
+        stmt, label_start, label_stmts, label_incr, label_end = args
+        condition = self._operands.pop()
         # check condition
         self._push_to_block(Instruction(
-            'FOR', condition, label_stmts.res, label_end.res, for_tok))
+            'FOR', condition, label_stmts.res, label_end.res, FOR_OP))
         # for loop body
         self._push_to_block(label_stmts)
         assert (isinstance(label_end.res, str))
         assert (isinstance(label_incr.res, str))
         self._push_ctrl(label_end.res, label_incr.res)
-        self._loop_stmts(stmt.body)
+        return [stmt.body, (self._for_increment, args)]
+
+    def _for_increment(self, args: tuple) -> list:
+        stmt, label_start, label_stmts, label_incr, label_end = args
         self._pop_ctrl()
         self._goto_stmt(label_incr.res)
         self._push_to_block(label_incr)
+        children = []
         if stmt.increment is not None:
-            if isinstance(stmt.increment, AssignmentExpression):
-                self._assign_expr(stmt.increment)
-            else:
-                self._get_expression(stmt.increment)
+            children += self._effect(stmt.increment)
         # goto start
-        assert (isinstance(label_start.res, str))
-        self._goto_stmt(label_start.res)
-        self._push_to_block(label_end)
+        children.append((self._goto_stmt, label_start.res))
+        children.append((self._push_to_block, label_end))
+        return children
 
-    def _while_stmt(self, stmt: WhileStatement) -> None:
-        label_tok = Token('LABEL', 'label')
-        while_tok = Token('WHILESTMT', 'while')
+    def enter_WhileStatement(self, stmt: WhileStatement) -> list:
         label_start = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_stmts = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_end = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         self._push_to_block(label_start)
-        condition = self._get_expression(stmt.condition)
+        return [stmt.condition, (self._while_body, (stmt, label_start, label_stmts, label_end))]
+
+    def _while_body(self, args: tuple) -> list:
+        stmt, label_start, label_stmts, label_end = args
+        condition = self._operands.pop()
         # check condition
         # while instructions are formatted:
         # 1. condition
@@ -445,151 +572,120 @@ class TAC:
         # 3. if false goto
         # 4. while tok
         self._push_to_block(Instruction('WHILE', condition,
-                            label_stmts.res, label_end.res, while_tok))
+                            label_stmts.res, label_end.res, WHILE_OP))
         # while body
         self._push_to_block(label_stmts)
         assert (isinstance(label_end.res, str))
         assert (isinstance(label_start.res, str))
         self._push_ctrl(label_end.res, label_start.res)
-        self._loop_stmts(stmt.body)
+        return [stmt.body, (self._end_while, (label_start, label_end))]
+
+    def _end_while(self, args: tuple) -> None:
+        label_start, label_end = args
         self._pop_ctrl()
         # goto start
         self._goto_stmt(label_start.res)
         self._push_to_block(label_end)
 
-    def _do_while_stmt(self, stmt: DoWhileStatement) -> None:
-        label_tok = Token('LABEL', 'label')
-        while_tok = Token('WHILESTMT', 'while')
+    def enter_DoWhileStatement(self, stmt: DoWhileStatement) -> list:
         label_start = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_end = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         # while body
         self._push_to_block(label_start)
         assert (isinstance(label_end.res, str))
         self._push_ctrl(label_end.res)
-        self._loop_stmts(stmt.body)
+        return [stmt.body, (self._do_while_condition, (stmt, label_start, label_end))]
+
+    def _do_while_condition(self, args: tuple) -> list:
+        stmt, label_start, label_end = args
         self._pop_ctrl()
         # check condition
-        condition = self._get_expression(stmt.condition)
+        return [stmt.condition, (self._do_while_test, args)]
+
+    def _do_while_test(self, args: tuple) -> None:
+        stmt, label_start, label_end = args
+        condition = self._operands.pop()
         # while instructions are formatted:
         # 1. condition
         # 2. if true goto
         # 3. if false goto
         # 4. while tok
         self._push_to_block(Instruction('WHILE', condition,
-                            label_start.res, label_end.res, while_tok))
+                            label_start.res, label_end.res, WHILE_OP))
         self._push_to_block(label_end)
 
-    def _if_stmt(self, stmt: IfStatement) -> None:
-        if_tok = Token('IFSTMT', 'if')
-        label_tok = Token('LABEL', 'label')
+    def enter_IfStatement(self, stmt: IfStatement) -> list:
         # check condition
-        condition = self._get_expression(stmt.condition)
+        return [stmt.condition, (self._if_branches, stmt)]
+
+    def _if_branches(self, stmt: IfStatement) -> list:
+        condition = self._operands.pop()
         label_true = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_false = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         label_end = Instruction(
-            'LABEL', self._get_label(), None, None, label_tok)
+            'LABEL', self._get_label(), None, None, LABEL_OP)
         # if instructions are formatted:
         # 1. condition
         # 2. if true goto
         # 3. if false goto
         # 4. if tok
         self._push_to_block(Instruction(
-            'IF', condition, label_true.res, label_false.res, if_tok))
+            'IF', condition, label_true.res, label_false.res, IF_OP))
         # if true
         self._push_to_block(label_true)
-        self._loop_stmts(stmt.then_branch)
         assert (isinstance(label_end.res, str))
-        self._goto_stmt(label_end.res)
-        # if false
-        self._push_to_block(label_false)
+        children = [stmt.then_branch,
+                    (self._goto_stmt, label_end.res),
+                    # if false
+                    (self._push_to_block, label_false)]
         if (stmt.else_branch is not None):
-            self._loop_stmts(stmt.else_branch)
-        self._goto_stmt(label_end.res)
-        self._push_to_block(label_end)
+            children.append(stmt.else_branch)
+        children.append((self._goto_stmt, label_end.res))
+        children.append((self._push_to_block, label_end))
+        return children
 
-    def _loop_stmts(self, stmts: Any) -> None:
-        if isinstance(stmts, CompoundStatement):
-            stmt_list = stmts.items
-        else:
-            stmt_list = [stmts]
-        for stmt in stmt_list:
-            if (isinstance(stmt, DeclarationStatement)):
-                self._decl_stmt(stmt)
-            elif (isinstance(stmt, CompoundStatement)):
-                self._loop_stmts(stmt)
-            elif (isinstance(stmt, ExpressionStatement)):
-                self._expr_stmt(stmt)
-            elif (isinstance(stmt, BreakStatement)):
-                self._break_stmt()
-            elif (isinstance(stmt, ContinueStatement)):
-                self._continue_stmt()
-            elif (isinstance(stmt, ReturnStatement)):
-                self._return_stmt(stmt)
-            elif (isinstance(stmt, LabelStatement)):
-                self._label_stmt(stmt.identifier.value)
-            elif (isinstance(stmt, GotoStatement)):
-                self._goto_stmt(stmt.identifier.value)
-            elif (isinstance(stmt, SwitchStatement)):
-                self._switch_stmt(stmt)
-            elif (isinstance(stmt, ForStatement)):
-                self._for_stmt(stmt)
-            elif (isinstance(stmt, WhileStatement)):
-                self._while_stmt(stmt)
-            elif (isinstance(stmt, DoWhileStatement)):
-                self._do_while_stmt(stmt)
-            elif (isinstance(stmt, IfStatement)):
-                self._if_stmt(stmt)
-            else:
-                raise TACError('Invalid Function Defenition Structure', stmt)
-
-    def _get_expression(self, expr: Any) -> Token:
-        result = None
-        if (isinstance(expr, Literal)):
-            result = self._literal(expr)
-        elif (isinstance(expr, Identifier)):
-            result = self._identifier(expr)
-        elif (isinstance(expr, BinaryExpression)):
-            result = self._bi_expr(expr)
-        elif (isinstance(expr, PrefixExpression)):
-            result = self._pre_expr(expr)
-        elif (isinstance(expr, PostfixExpression)):
-            result = self._post_expr(expr)
-        elif (isinstance(expr, CallExpression)):
-            result = self._function_call(expr)
-        elif (isinstance(expr, MemberExpression)):
-            raise NotImplementedError
-        elif (isinstance(expr, Token)):
-            result = expr
-        else:
-            raise TACError('Invalid Statement Structure', expr)
-        return result
-
-    def _var_decl(self, decl_obj: VarDeclaration) -> None:
-        expr_obj = decl_obj.initializer
-        var_ident = decl_obj.declarator
-        value = self._get_expression(expr_obj)
-        self._push_to_block(Instruction('DECL', var_ident, value))
+    def enter_ReturnStatement(self, stmt: ReturnStatement) -> list:
+        return [stmt.expression]
 
-    def _return_stmt(self, stmt: ReturnStatement) -> None:
-        value = self._get_expression(stmt.expression)
+    def leave_ReturnStatement(self, stmt: ReturnStatement) -> None:
+        value = self._operands.pop()
         self._push_to_block(Instruction(
-            'RETURN', value, None, None, Token('RETURN', 'return')))
+            'RETURN', value, None, None, RETURN_OP))
         self._push_to_block(Instruction(
-            'LABEL', self._get_label(), None, None, Token('LABEL', 'label')))
+            'LABEL', self._get_label(), None, None, LABEL_OP))
+
+    def enter_LabelStatement(self, stmt: LabelStatement) -> list:
+        self._label_stmt(stmt.identifier.value)
+        return [stmt.statement]
+
+    def enter_GotoStatement(self, stmt: GotoStatement) -> tuple:
+        self.names.intern(stmt.identifier.value)
+        self._goto_stmt(stmt.identifier.value)
+        return SKIP
+
+    def enter_BreakStatement(self, stmt: BreakStatement) -> tuple:
+        self._break_stmt()
+        return SKIP
+
+    def enter_ContinueStatement(self, stmt: ContinueStatement) -> tuple:
+        self._continue_stmt()
+        return SKIP
 
     def _label_stmt(self, name=None) -> None:
         if name is None:
             name = self._get_label()
+        else:
+            self.names.intern(name)
         self._push_to_block(Instruction(
-            'LABEL', name, None, None, Token('LABEL', 'label')))
+            'LABEL', name, None, None, LABEL_OP))
 
     def _goto_stmt(self, name: str) -> None:
         self._push_to_block(Instruction(
-            'GOTO', name, None, None, Token('GOTO', 'goto')))
+            'GOTO', name, None, None, GOTO_OP))
 
     def _break_stmt(self) -> None:
         target = self._current_break()
@@ -598,9 +694,3 @@ class TAC:
     def _continue_stmt(self) -> None:
         target = self._current_continue()
         self._goto_stmt(target)
-
-    def _literal(self, lit: Literal) -> Token:
-        return lit.token
-
-    def _identifier(self, ident: Identifier) -> Token:
-        return ident.token
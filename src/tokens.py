@@ -1,11 +1,23 @@
 ﻿# This is a subset of keywords from the C language
+from array import array
+from bisect import bisect_right
+from enum import IntEnum
+from typing import Iterator, Optional
+
 
 class Token:
     """Representaition of C Language Tokens
     """
+    __slots__ = ('type', 'kind', 'value', 'line_num', 'char_num')
 
-    def __init__(self, token_type: str, value: str, line_num: int = -1, char_num: int = -1):
-        self.type = token_type
+    def __init__(self, token_type: 'str | TokenKind', value: str, line_num: int = -1, char_num: int = -1):
+        # Accepts either the type name or its TokenKind, both are stored
+        if token_type.__class__ is str:
+            kind = KIND_BY_TYPE[token_type]
+        else:
+            kind = TOKEN_KINDS[token_type]
+        self.kind = kind
+        self.type = TOKEN_TYPES[kind]
         self.value = value
         self.line_num = line_num
         self.char_num = char_num
@@ -16,7 +28,10 @@ class Token:
         return f"({self.type},'{self.value}')"
 
     def __eq__(self, other) -> bool:
-        return self.value == other.value and self.type == other.type
+        return self.value == other.value and self.kind == other.kind
+
+    def __reduce__(self):
+        return (Token, (int(self.kind), self.value, self.line_num, self.char_num))
 
 
 KEYWORDS = {
@@ -189,3 +204,153 @@ NUMBER = 'NUMBER'
 CHAR_LITERAL = 'CHAR_LITERAL'
 STRING_LITERAL = 'STRING_LITERAL'
 EOF = 'EOF'
+
+# Token types that only TAC generation creates
+IR_TOKEN_TYPES = (
+    'LABEL',
+    'IFSTMT',
+    'FORSTMT',
+    'WHILESTMT',
+    'CALL',
+    'PARAM',
+)
+
+# Every token type, a token's TokenKind is its index
+TOKEN_TYPES = (
+    *KEYWORDS.values(),
+    *SYMBOLS.values(),
+    IDENTIFIER,
+    NUMBER,
+    CHAR_LITERAL,
+    STRING_LITERAL,
+    EOF,
+    *IR_TOKEN_TYPES,
+)
+
+TokenKind = IntEnum('TokenKind', TOKEN_TYPES, start=0, module=__name__)
+TOKEN_KINDS = tuple(TokenKind)
+KIND_BY_TYPE = {kind.name: kind for kind in TokenKind}
+KEYWORD_KINDS = {text: KIND_BY_TYPE[name] for text, name in KEYWORDS.items()}
+SYMBOL_KINDS = {text: KIND_BY_TYPE[name] for text, name in SYMBOLS.items()}
+
+
+def _kinds(types: set[str]) -> frozenset[TokenKind]:
+    return frozenset(KIND_BY_TYPE[token_type] for token_type in types)
+
+
+DECLARATION_SPECIFIER_KINDS = _kinds(DECLARATION_SPECIFIERS)
+TYPE_SPECIFIER_KINDS = _kinds(TYPE_SPECIFIERS)
+ASSIGNMENT_KINDS = _kinds(ASSIGNMENT_TOKENS)
+PREFIX_KINDS = _kinds(PREFIX_OPERATORS)
+POSTFIX_KINDS = _kinds(POSTFIX_OPERATORS)
+
+# Per kind lookup tables, indexed by TokenKind
+# Binding power from TOKEN_PREC, -1 if the kind is not an infix operator
+PRECEDENCE = tuple(TOKEN_PREC.get(token_type, -1) for token_type in TOKEN_TYPES)
+PREFIX_PRECEDENCE = TOKEN_PREC['PREFIX']
+# Source text of symbol kinds, None for everything else
+_SYMBOL_BY_TYPE = {name: text for text, name in SYMBOLS.items()}
+SYMBOL_TEXT: tuple[Optional[str], ...] = tuple(
+    _SYMBOL_BY_TYPE.get(token_type) for token_type in TOKEN_TYPES)
+# Compound assignment kind to the binary operator it applies, '+=' -> '+'
+ASSIGN_TO_BINARY: tuple[Optional[TokenKind], ...] = tuple(
+    SYMBOL_KINDS[SYMBOL_TEXT[kind][:-1]]
+    if kind in ASSIGNMENT_KINDS and kind != TokenKind.ASSIGN else None
+    for kind in TokenKind
+)
+
+
+_QUOTED_KINDS = (TokenKind.STRING_LITERAL, TokenKind.CHAR_LITERAL)
+
+
+class TokenStream:
+    """Compact token storage for large sources
+
+    Holds parallel arrays of TokenKind, start offset and end offset into the
+    source string instead of one Token object per token. Line and column are
+    found on demand by bisecting an index of line start offsets, and Token
+    objects are only built when a token is indexed or iterated.
+    """
+    __slots__ = ('src', 'codes', 'starts', 'ends', '_line_starts')
+
+    def __init__(self, src: str):
+        self.src = src
+        self.codes = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        self._line_starts: array | None = None
+
+    def append(self, code: int, start: int, end: int) -> None:
+        self.codes.append(code)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self.codes)
+        line, col = self.line_col(index)
+        return Token(self.codes[index], self.value(index), line, col)
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.codes)):
+            yield self[index]
+
+    def type_at(self, index: int) -> str:
+        return TOKEN_TYPES[self.codes[index]]
+
+    def kind_at(self, index: int) -> TokenKind:
+        return TOKEN_KINDS[self.codes[index]]
+
+    def value(self, index: int) -> str:
+        start = self.starts[index]
+        end = self.ends[index]
+        if self.codes[index] in _QUOTED_KINDS:
+            return self.src[start + 1:end - 1]
+        return self.src[start:end]
+
+    @property
+    def line_starts(self) -> array:
+        """Offset of the first character of every line, built on first use"""
+        if self._line_starts is None:
+            starts = array('i', [0])
+            find = self.src.find
+            pos = find('\n')
+            while pos != -1:
+                starts.append(pos + 1)
+                pos = find('\n', pos + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    def line_col(self, index: int) -> tuple[int, int]:
+        """0-indexed line and column of the token at index"""
+        offset = self.starts[index]
+        line_starts = self.line_starts
+        line = bisect_right(line_starts, offset) - 1
+        return line, offset - line_starts[line]
+
+    @property
+    def lines(self) -> 'SourceLines':
+        return SourceLines(self)
+
+
+class SourceLines:
+    """Read only list of source lines backed by a TokenStream's line index"""
+    __slots__ = ('_stream',)
+
+    def __init__(self, stream: TokenStream):
+        self._stream = stream
+
+    def __len__(self) -> int:
+        return len(self._stream.line_starts)
+
+    def __getitem__(self, line: int) -> str:
+        line_starts = self._stream.line_starts
+        start = line_starts[line]
+        if line + 1 < len(line_starts):
+            end = line_starts[line + 1] - 1
+        else:
+            end = len(self._stream.src)
+        return self._stream.src[start:end].rstrip('\r')
@@ -0,0 +1,169 @@
+import dataclasses
+from types import FunctionType
+from typing import Any, Callable, Optional
+from src import ast_nodes
+
+"""
+Explicit-stack AST traversal shared by the compiler passes
+
+A pass subclasses Visitor and names its hooks after node classes:
+enter_IfStatement(node) runs before an IfStatement's children are visited
+and leave_IfStatement(node) after them. A class without either hook uses
+enter_default and leave_default. Hooks are looked up once per Visitor
+subclass, along each node class's MRO, into a dispatch table keyed by node
+class, so visiting a node costs one dict lookup instead of a chain of
+isinstance checks. Cursors of an Arena dispatch as the dataclass they
+stand for. The default walk into a node's children is made once per node
+class, as a closure over the class's field names.
+
+Pending work lives on a list rather than in Python frames, so a deep AST
+cannot exhaust the recursion limit. What an enter hook returns decides what
+is visited below its node:
+    None    the node's AST children in field order, list fields expanded
+    SKIP    nothing
+    a list  its items in order. None and tokens are dispatched like nodes
+            (enter_NoneType, enter_Token), a nested list is expanded and a
+            (function, argument) pair is an action, called as
+            function(argument) when the walk reaches it
+A leave hook is an action too. Whatever an action returns is visited next,
+the same way, which lets a pass run code between two children, e.g. emit a
+label after the then branch of an if statement.
+"""
+
+
+# Returned by an enter hook to leave the node's children unvisited
+SKIP = ()
+
+# Every dataclass defined in ast_nodes
+_AST_NODE_TYPES = tuple(
+    value for value in vars(ast_nodes).values()
+    if dataclasses.is_dataclass(value) and value.__module__ == ast_nodes.__name__
+)
+
+_NODE_FIELDS: dict[type, tuple[str, ...]] = {}
+_IS_NODE: dict[type, bool] = {node_type: True for node_type in _AST_NODE_TYPES}
+
+
+def node_fields(node_type: type) -> tuple[str, ...]:
+    """Field names of an AST node class in declaration order, empty for tokens and other leaves"""
+    names = _NODE_FIELDS.get(node_type)
+    if names is None:
+        names = (tuple(f.name for f in dataclasses.fields(node_type))
+                 if _is_node_type(node_type) else ())
+        _NODE_FIELDS[node_type] = names
+    return names
+
+
+def _is_node_type(node_type: type) -> bool:
+    is_node = _IS_NODE.get(node_type)
+    if is_node is None:
+        # Subclasses of AST nodes, such as LazyFunctionDefinition, are nodes
+        is_node = any(_IS_NODE.get(base, False) for base in node_type.__mro__[1:])
+        # Lists stay out of the cache, the default walk expands them
+        if node_type is not list:
+            _IS_NODE[node_type] = is_node
+    return is_node
+
+
+_PUSHERS: dict[type, Callable[[Any, Callable], None]] = {}
+
+
+def _compile_pusher(node_type: type) -> Callable[[Any, Callable], None]:
+    """The function that pushes a node's children for the default walk, last field first"""
+    pusher = _PUSHERS.get(node_type)
+    if pusher is None:
+        names = node_fields(node_type)[::-1]
+        is_node = _IS_NODE
+
+        def push_children(node, push):
+            for name in names:
+                value = getattr(node, name)
+                flag = is_node.get(value.__class__)
+                if flag:
+                    push(value)
+                elif flag is None:
+                    if value.__class__ is list:
+                        for child in reversed(value):
+                            flag = is_node.get(child.__class__)
+                            if flag or (flag is None and _is_node_type(child.__class__)):
+                                push(child)
+                    elif _is_node_type(value.__class__):
+                        push(value)
+
+        pusher = _PUSHERS[node_type] = push_children
+    return pusher
+
+
+_Hooks = tuple[Optional[Callable], Optional[Callable], Callable[[Any, Callable], None]]
+
+
+class Visitor:
+    """Base class of passes that walk an AST, see the module docstring"""
+
+    # Per subclass: node class -> (enter or None, leave or None, children pusher)
+    _dispatch: dict[type, _Hooks] = {}
+
+    leave_default: Optional[Callable] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+        for node_type in _AST_NODE_TYPES:
+            cls._hooks(node_type)
+
+    @classmethod
+    def _hooks(cls, node_type: type) -> _Hooks:
+        enter = leave = None
+        for base in node_type.__mro__[:-1]:
+            name = base.__name__
+            if enter is None:
+                enter = getattr(cls, 'enter_' + name, None)
+            if leave is None:
+                leave = getattr(cls, 'leave_' + name, None)
+        enter = enter or cls.enter_default
+        # None when there is nothing to call before the default walk
+        if enter is Visitor.enter_default:
+            enter = None
+        hooks = (enter, leave or cls.leave_default, _compile_pusher(node_type))
+        cls._dispatch[node_type] = hooks
+        return hooks
+
+    def enter_default(self, node: Any) -> Any:
+        return None
+
+    def visit(self, root: Any) -> None:
+        """Walks root and everything below it"""
+        dispatch = self._dispatch
+        stack = [root]
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+        while stack:
+            item = pop()
+            item_type = item.__class__
+            hooks = dispatch.get(item_type)
+            if hooks is None:
+                if item_type is tuple:
+                    children = item[0](item[1])
+                    if children:
+                        extend(reversed(children))
+                    continue
+                if item_type is list:
+                    extend(reversed(item))
+                    continue
+                if item_type is FunctionType:
+                    # A leave hook, above the node it leaves
+                    children = item(self, pop())
+                    if children:
+                        extend(reversed(children))
+                    continue
+                hooks = self._hooks(item_type)
+            enter, leave, push_children = hooks
+            children = None if enter is None else enter(self, item)
+            if leave is not None:
+                push(item)
+                push(leave)
+            if children is None:
+                push_children(item, push)
+            elif children:
+                extend(reversed(children))
@@ -9,9 +9,14 @@ from src import (
     TACError,
     ASMError,
     Tokenizer,
+    MappedTokenizer,
+    relex,
+    Token,
+    TokenKind,
     Parser,
     SymbolTable,
     SemanticAnalyzer,
+    FusedAnalyzer,
     TAC,
     pretty_tac,
     constant_fold,
@@ -19,8 +24,39 @@ from src import (
     dead_code_elimination,
     register_optimization,
     tac_to_asm,
+    Arena,
+    AssignmentExpression,
+    BinaryExpression,
+    CompoundStatement,
+    IfStatement,
+    ReturnStatement,
+    LALRParser,
+    GrammarError,
+    GRAMMAR_PATH,
+    read_grammar,
+    check_precedence,
+    fold_ast_constants,
+    Literal,
+    Visitor,
+    SKIP,
+    pretty_ast,
+    uninitialized_uses,
+    to_ir,
+    to_tac,
+    IRArrays,
+    Opcode,
+    StreamingCompiler,
+    optimize_tac,
+    construct_ssa,
+    destruct_ssa,
+    sequentialize_copies,
+    IDENTIFIER,
 )
+import asyncio
+import contextlib
 import copy
+import io
+import tempfile
 
 
 def create_arguments() -> argparse.ArgumentParser:
@@ -139,6 +175,23 @@ class TestRunner:
                 print(f"  ❌ {name} - {type(err).__name__}: {str(err)[:60]}...")
                 return False
 
+    def run_check(self, name: str, check) -> bool:
+        """Run a single check that returns True when it passes"""
+        self.total += 1
+        try:
+            result = check()
+        except Exception as err:
+            self.failed += 1
+            print(f"  ❌ {name} - {type(err).__name__}: {str(err)[:60]}...")
+            return False
+        if result:
+            self.passed += 1
+            print(f"  ✅ {name}")
+            return True
+        self.failed += 1
+        print(f"  ❌ {name} - check returned False")
+        return False
+
     def test_lexer(self):
         """Test lexer functionality"""
         print("\n" + "=" * 80)
@@ -157,6 +210,115 @@ class TestRunner:
         for name, code in tests.items():
             self.run_single_test(name, code, should_pass=True)
 
+        def streamed_matches_list():
+            code = "\n".join(tests.values())
+            token_list = Tokenizer(code).tokenize()
+            streamed = list(Tokenizer(code).iter_tokens())
+            return (streamed == token_list
+                    and all(a.line_num == b.line_num and a.char_num == b.char_num
+                            for a, b in zip(streamed, token_list)))
+
+        def parse_from_stream():
+            code = tests["Identifiers"]
+            from_list = Parser(Tokenizer(code).tokenize()).parse()
+            from_stream = Parser(Tokenizer(code).iter_tokens()).parse()
+            return from_list == from_stream
+
+        def token_stream_matches_list():
+            code = "\n".join(tests.values())
+            token_list = Tokenizer(code).tokenize()
+            stream = Tokenizer(code).token_stream()
+            return (len(stream) == len(token_list)
+                    and all(a == b and a.line_num == b.line_num and a.char_num == b.char_num
+                            for a, b in zip(stream, token_list)))
+
+        def token_kinds_match_types():
+            code = "\n".join(tests.values())
+            return all(tok.kind == TokenKind[tok.type]
+                       and Token(tok.kind, tok.value) == Token(tok.type, tok.value)
+                       for tok in Tokenizer(code).tokenize())
+
+        def mapped_matches_list():
+            code = "\n".join(tests.values()) + '\n"two\nlines" /* a\nb */ x'
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / "mapped.c"
+                path.write_bytes(code.encode())
+                with MappedTokenizer(path) as tokenizer:
+                    mapped = tokenizer.tokenize()
+            token_list = Tokenizer(code).tokenize()
+            return (mapped == token_list
+                    and all(a.line_num == b.line_num and a.char_num == b.char_num
+                            for a, b in zip(mapped, token_list)))
+
+        def relex_matches_full_lex():
+            code = "\n".join(tests.values())
+            edits = [
+                (code.index("42"), 2, "4200"),           # grow a number
+                (code.index("x_1"), 0, "/* "),           # open a comment that swallows code
+                (code.index("block"), 0, "*/ int z; /*"),  # split a comment
+                (code.index("*/"), 2, ""),               # remove a comment end
+                (len(code), 0, "\nint w;"),              # append
+            ]
+            for offset, removed, inserted in edits:
+                stream = Tokenizer(code).token_stream()
+                stream.line_starts
+                edited = relex(stream, offset, removed, inserted)
+                full = Tokenizer(edited.src).token_stream()
+                if (list(edited.codes) != list(full.codes)
+                        or list(edited.starts) != list(full.starts)
+                        or list(edited.line_starts) != list(full.line_starts)):
+                    return False
+            return True
+
+        def dfa_matches_regex():
+            samples = list(tests.values()) + [
+                "x = 0x1Fp+3 + 1.5e-2f + .5 + 0x + 1e+ + 7L;",
+                "a<<=b>>=c&&d||!e~f^g|h&i->j",
+                '"esc\\"aped" \'\\n\' \'a\' "multi\nline"',
+                "/* unterminated * / x",
+                "a /* b */ c // d\r\ne",
+            ]
+            for code in samples:
+                try:
+                    expected = list(Tokenizer(code)._scan())
+                except LexerError as err:
+                    expected = str(err)
+                try:
+                    actual = list(Tokenizer(code, engine="dfa")._scan())
+                except LexerError as err:
+                    actual = str(err)
+                if actual != expected:
+                    return False
+            return True
+
+        def numpy_matches_regex():
+            # Without numpy this checks the pure Python fallback
+            samples = list(tests.values()) + [
+                "x = 1e5abc + 0x1Fg;\n\t  y  = /* a b\n c */ z_1;",
+                '"s t r" \'c\' // tail',
+                "int t\u00e9t\u00e9 = 1;",
+            ]
+            for code in samples:
+                expected = [(t.kind, t.value, t.line_num, t.char_num)
+                            for t in Tokenizer(code).tokenize()]
+                actual = [(t.kind, t.value, t.line_num, t.char_num)
+                          for t in Tokenizer(code, engine="numpy").tokenize()]
+                stream = Tokenizer(code, engine="numpy").token_stream()
+                streamed = [(stream.kind_at(i), stream.value(i), *stream.line_col(i))
+                            for i in range(len(stream))]
+                if actual != expected or streamed != expected:
+                    return False
+            return True
+
+        self.run_check("Token kinds match token types", token_kinds_match_types)
+        self.run_check("Numpy lexer matches regex lexer", numpy_matches_regex)
+        self.run_check("DFA lexer matches regex lexer", dfa_matches_regex)
+        self.run_check("Relexing an edit matches a full lex", relex_matches_full_lex)
+        self.run_check("Memory mapped tokens match token list", mapped_matches_list)
+        self.run_check("Streamed tokens match token list", streamed_matches_list)
+        self.run_check("TokenStream matches token list", token_stream_matches_list)
+        self.run_check("Parser consumes token stream", parse_from_stream)
+
     def test_parser(self):
         """Test parser functionality"""
         print("\n" + "=" * 80)
@@ -179,6 +341,172 @@ class TestRunner:
         for name, code in tests.items():
             self.run_single_test(name, code, should_pass=True)
 
+        def globals_parse_without_backtracking():
+            code = ("const int a = 1, b; static int c;\n"
+                    "int f(int x, int y); int g();\n"
+                    "int h(int x) { for (x = 0; x < 2; x++) { } return x; }\n"
+                    "int d = 2;")
+            parser = Parser(Tokenizer(code).tokenize())
+            program = parser.parse()
+            return len(program.units) == 6 and parser.backtracked_tokens == 0
+
+        self.run_check("Globals parse without backtracking", globals_parse_without_backtracking)
+
+        depth = 100_000
+
+        def parse_body(body):
+            code = "int main() { " + body + " }"
+            return Parser(Tokenizer(code).tokenize()).parse().units[0].func_body.items
+
+        def long_operator_chains_parse():
+            items = parse_body("return " + " + ".join(["a"] * depth) + ";"
+                               + " a = " * depth + "0;"
+                               + " return " + "(" * depth + "a" + ")" * depth + ";")
+            node, count = items[0].expression, 0
+            while isinstance(node, BinaryExpression):
+                node, count = node.left, count + 1
+            if count != depth - 1:
+                return False
+            node, count = items[1].expression, 0
+            while isinstance(node, AssignmentExpression):
+                node, count = node.right, count + 1
+            return count == depth and items[2].expression.token.value == "a"
+
+        def deep_nesting_parses():
+            items = parse_body("{" * depth + "}" * depth
+                               + " if (a) " * depth + "return 0;")
+            node, count = items[0], 0
+            while isinstance(node, CompoundStatement) and node.items:
+                node, count = node.items[0], count + 1
+            if count != depth - 1:
+                return False
+            node, count = items[1], 0
+            while isinstance(node, IfStatement):
+                node, count = node.then_branch, count + 1
+            return count == depth and isinstance(node, ReturnStatement)
+
+        def body_errors_have_locations():
+            locations = []
+            for code in ("int main() { if (a) int b = 1; return 0; }", "int main() {\n  x = ; }"):
+                try:
+                    Parser(Tokenizer(code).tokenize()).parse()
+                except ParserError as err:
+                    locations.append((err.token.line_num, err.token.char_num))
+            return locations == [(0, 20), (1, 6)]
+
+        self.run_check("Long operator chains parse", long_operator_chains_parse)
+        self.run_check("Deeply nested statements parse", deep_nesting_parses)
+        self.run_check("Body syntax errors have a location", body_errors_have_locations)
+
+        def arena_round_trips():
+            code = "\n".join(tests.values()) + "\nint g(int, int y); const int c = 1, d;"
+            tokens = Tokenizer(code).tokenize()
+            program = Parser(tokens).parse()
+            arena = Arena.from_ast(program, tokens)
+            return arena.to_ast() == program and len(arena.tokens) == len(tokens)
+
+        def passes_walk_arena():
+            code = tests["For loop"] + tests["Function with params"].replace("foo", "bar")
+
+            def compile_tac(program):
+                sym_table = SymbolTable()
+                sym_table.build_symbol_table(program)
+                SemanticAnalyzer(program, sym_table).analyze()
+                tac = TAC()
+                tac.generate_tac(program, sym_table)
+                return pretty_tac(tac)
+
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            return compile_tac(Arena.from_ast(program).root) == compile_tac(program)
+
+        def lazy_bodies_parse_on_access():
+            code = "\n".join(tests.values()).replace("main", "f")
+            eager = Parser(Tokenizer(code).tokenize()).parse()
+            lazy = Parser(Tokenizer(code).iter_tokens(), lazy_bodies=True).parse()
+            first = lazy.units[0]
+            if first.body_parsed or first.func_body != eager.units[0].func_body:
+                return False
+            if sum(unit.body_parsed for unit in lazy.units) != 1:
+                return False
+            return lazy == eager and all(unit.body_parsed for unit in lazy.units)
+
+        def parallel_matches_serial():
+            code = "\n".join(tests.values()).replace("main", "f") + "\nint g(); int d = 1;"
+            serial = Parser(Tokenizer(code).tokenize()).parse()
+            parallel = Parser(Tokenizer(code).token_stream()).parse_parallel(workers=2)
+            bad = code.replace("return x;", "return x +;")
+            try:
+                Parser(Tokenizer(bad).tokenize()).parse()
+            except ParserError as err:
+                expected = str(err)
+            try:
+                Parser(Tokenizer(bad).tokenize()).parse_parallel(workers=2)
+            except ParserError as err:
+                return parallel == serial and str(err) == expected
+            return False
+
+        def lalr_matches_parser():
+            code = ("\n".join(tests.values()).replace("main", "f")
+                    + "\nint g(int, int y); const int c = 1, d;\n"
+                    "int h(int a) { switch (a) { case 1: case 2, 3: a++; break; default: ; }\n"
+                    "  if (a) if (a > 1) a = -a; else a = ~a; l: goto l;\n"
+                    "  for (;;) continue; a = b = a * -(b + c)--, f(a, b = 2).x + !++a << 2;\n"
+                    "  return f(); }")
+            tokens = Tokenizer(code).tokenize()
+            if LALRParser(tokens).parse() != Parser(tokens).parse():
+                return False
+            try:
+                LALRParser(Tokenizer("int f() { return (a + ; }").token_stream()).parse()
+            except ParserError as err:
+                return err.token.value == ";" and err.source_lines is not None
+            return False
+
+        def grammar_mirrors_token_prec():
+            precedence = read_grammar(GRAMMAR_PATH.read_text(encoding='utf-8-sig')).precedence
+            check_precedence(precedence)
+            precedence['PLUS'], precedence['MULTIPLY'] = precedence['MULTIPLY'], precedence['PLUS']
+            try:
+                check_precedence(precedence)
+            except GrammarError:
+                return True
+            return False
+
+        def stepped_parse_matches_parse():
+            code = "\n".join(tests.values()).replace("main", "f") + "\nint g(); int d = 1;"
+            tokens = Tokenizer(code).tokenize()
+            steps = Parser(tokens).parse_steps(step_tokens=16)
+            pauses = []
+            while True:
+                try:
+                    pauses.append(next(steps))
+                except StopIteration as stop:
+                    stepped = stop.value
+                    break
+
+            async def two_jobs():
+                parsers = [Parser(Tokenizer(code).iter_tokens()) for _ in range(2)]
+                jobs = asyncio.gather(*(parser.parse_async(step_tokens=16) for parser in parsers))
+                positions = []
+                while not jobs.done():
+                    positions.append([parser.pos for parser in parsers])
+                    await asyncio.sleep(0)
+                # Both jobs were part way through at once
+                return await jobs, any(all(0 < pos < len(tokens) - 1 for pos in sample)
+                                       for sample in positions)
+
+            (first, second), interleaved = asyncio.run(two_jobs())
+            expected = Parser(tokens).parse()
+            return (len(pauses) > 2 and pauses == sorted(pauses) and stepped == expected
+                    and first == second == expected and interleaved)
+
+        self.run_check("LALR parser matches Parser", lalr_matches_parser)
+        self.run_check("Grammar precedence mirrors TOKEN_PREC", grammar_mirrors_token_prec)
+        self.run_check("Lazy function bodies parse on access", lazy_bodies_parse_on_access)
+        self.run_check("Parallel parse matches serial parse", parallel_matches_serial)
+        self.run_check("Stepped parse matches parse", stepped_parse_matches_parse)
+        self.run_check("Arena AST round trips", arena_round_trips)
+        self.run_check("Passes walk the arena AST", passes_walk_arena)
+
     def test_semantic_analysis(self):
         """Test semantic analysis"""
         print("\n" + "=" * 80)
@@ -191,6 +519,8 @@ class TestRunner:
             "Proper initialization": "int main() { int x; x = 10; return x; }",
             "Scoping": "int main() { int x = 5; { int y = x; } return x; }",
             "Parameters initialized": "int foo(int x) { return x + 5; }",
+            "Else block declares a name":
+                "int main() { int c = 1; if (c) { int x = 1; c = x; } else { int y = 2; c = y; } return c; }",
         }
 
         for name, code in pass_tests.items():
@@ -211,6 +541,91 @@ class TestRunner:
         for name, code in fail_tests.items():
             self.run_single_test(f"FAIL: {name}", code, should_pass=False)
 
+        def analysis_outcome(code, fused):
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            try:
+                if fused:
+                    FusedAnalyzer(program, sym_table).analyze()
+                else:
+                    sym_table.build_symbol_table(program)
+                    SemanticAnalyzer(program, sym_table).analyze()
+            except (SymbolTableError, SemanticError) as err:
+                return type(err), str(err)
+            return repr(sym_table.dump())
+
+        def fused_matches_passes():
+            programs = [*pass_tests.values(), *fail_tests.values(),
+                        "int main() { int x; x += 1; for (x = 1; x < 3; x++) { int y; } return x; }",
+                        "int main() { int x = 1; for (int i = 0; i < x; i += z) { z = x; } return x; }",
+                        "int main() { int x = 1; for (int i = 0; i < x; i += j) { int j; x = j; } }",
+                        "int main() { int x; int z; for (int i = 0; i < 3; i += z) { x = x + 1; } return 0; }",
+                        "int main() { int x = 1; x = y; int y = 2; return f(x); }",
+                        "int main() { int x = 1; int x = 2; return 'a'; }",
+                        'int main() { do { x = "s"; } while (y); return 0; }',
+                        "int main() { int c = 1; if (c) { int x = 1; c = x; } else { int y = 2; c = y; } return c; }"]
+            return all(analysis_outcome(code, True) == analysis_outcome(code, False)
+                       for code in programs)
+
+        def uses_bound_to_declarations():
+            code = ("int main() { int x = 1; { int x = 2; x = x + 1; } "
+                    "if (x) { int y = 3; x = y; } else { int y = 4; x = y; } return x; }")
+            scope_ids = []
+            for fused in (True, False):
+                program = Parser(Tokenizer(code).tokenize()).parse()
+                sym_table = SymbolTable()
+                if fused:
+                    FusedAnalyzer(program, sym_table).analyze()
+                else:
+                    sym_table.build_symbol_table(program)
+                    SemanticAnalyzer(program, sym_table).analyze()
+                body = program.units[0].func_body
+                shadow, branch, ret = body.items[1], body.items[2], body.items[3]
+                uses = [(shadow.items[1].expression.left, shadow),
+                        (branch.then_branch.items[1].expression.right, branch.then_branch),
+                        (branch.else_branch.items[1].expression.right, branch.else_branch),
+                        (ret.expression, body)]
+                if any(sym_table.symbol_of(ident).scope_id != sym_table.scope_of(block).id
+                       for ident, block in uses):
+                    return False
+                scope_ids.append([sym_table.symbol_of(ident).scope_id for ident, _ in uses])
+            return scope_ids[0] == scope_ids[1]
+
+        def fused_analysis_walks_arena():
+            def outcome(code, arena):
+                program = Parser(Tokenizer(code).tokenize()).parse()
+                sym_table = SymbolTable()
+                try:
+                    FusedAnalyzer(Arena.from_ast(program).root if arena else program, sym_table).analyze()
+                except (SymbolTableError, SemanticError) as err:
+                    return type(err), str(err)
+                return repr(sym_table.dump())
+            programs = ["int main() { int a = 2; for (int i = 0; i < 3; i++) { a += i; } return a; }",
+                        "int main() { int x = 1; for (int i = 0; i < x; i += j) { int j; x = j; } }",
+                        "int main() { int a; a = 1; if (a) { a = 2; } else { int b = a; a = b; } return a; }",
+                        "int main() { int x = 1; x = y; int y = 2; return x; }"]
+            return all(outcome(code, True) == outcome(code, False) for code in programs)
+
+        def cfg_initialization_follows_paths():
+            def uninitialized_at(code):
+                program = Parser(Tokenizer(code).tokenize()).parse()
+                sym_table = SymbolTable()
+                FusedAnalyzer(program, sym_table, check_uninitialized=False).analyze()
+                tac = TAC()
+                tac.generate_tac(program, sym_table)
+                return [(err.token.value, err.token.char_num) for err in uninitialized_uses(tac)]
+            both_branches = "int main() { int x; int c = 1; if (c) x = 1; else x = 2; return x; }"
+            goto_past = "int main() { int x; goto L; x = 1; L: return x; }"
+            read_in_loop = "int main() { int x; int i = 0; while (i < 3) { i = i + x; x = 1; } return i; }"
+            return (uninitialized_at(both_branches) == []
+                    and uninitialized_at(goto_past) == [('x', 45)]
+                    and uninitialized_at(read_in_loop) == [('x', 55)])
+
+        self.run_check("Fused analysis matches separate passes", fused_matches_passes)
+        self.run_check("Uses are bound to their declarations", uses_bound_to_declarations)
+        self.run_check("Fused analysis walks arena trees", fused_analysis_walks_arena)
+        self.run_check("CFG initialization check follows every path", cfg_initialization_follows_paths)
+
     def test_tac_generation(self):
         """Test TAC generation"""
         print("\n" + "=" * 80)
@@ -230,6 +645,57 @@ class TestRunner:
         for name, code in tests.items():
             self.run_single_test(name, code, should_pass=True)
 
+        def visitor_hooks_run_in_order():
+            class Recorder(Visitor):
+                def __init__(self):
+                    self.events = []
+
+                def enter_default(self, node):
+                    self.events.append(type(node).__name__)
+
+                def leave_BinaryExpression(self, expr):
+                    self.events.append('/BinaryExpression')
+
+                def enter_IfStatement(self, stmt):
+                    self.events.append('IfStatement')
+                    return [stmt.condition, (self.events.append, 'then'), stmt.then_branch]
+
+                def enter_ReturnStatement(self, stmt):
+                    self.events.append('ReturnStatement')
+                    return SKIP
+
+            recorder = Recorder()
+            recorder.visit(Parser(Tokenizer("int main() { if (a + 1) return a; }").tokenize()).parse())
+            return recorder.events == [
+                'Program', 'FunctionDefinition', 'DeclarationTypes', 'CompoundStatement',
+                'IfStatement', 'BinaryExpression', 'Identifier', 'Literal', '/BinaryExpression',
+                'then', 'ReturnStatement']
+
+        def passes_handle_deep_asts():
+            # Far deeper than the recursion limit
+            depth = 3000
+            code = ("int main() { int x = 1; x = " + " + ".join(["x"] * depth) + ";"
+                    + " x = " + "-(" * depth + "x" + ")" * depth + ";"
+                    + " {" * depth + " x = x - 1;" + " }" * depth + " return x; }")
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            sym_table.build_symbol_table(program)
+            SemanticAnalyzer(program, sym_table).analyze()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            if len(pretty_ast(program).splitlines()) < 3 * depth:
+                return False
+            fold_ast_constants(program)
+            tac = TAC()
+            tac.generate_tac(program, sym_table)
+            ops = [instr.op.kind for block in tac.functions[0].blocks for instr in block.instr_list
+                   if instr.op is not None]
+            return (ops.count(TokenKind.PLUS) == depth - 1
+                    and ops.count(TokenKind.MINUS) == depth + 1)
+
+        self.run_check("Visitor hooks run in walk order", visitor_hooks_run_in_order)
+        self.run_check("Passes handle very deep ASTs", passes_handle_deep_asts)
+
     def test_optimizations(self):
         """Test optimization passes"""
         print("\n" + "=" * 80)
@@ -250,6 +716,223 @@ class TestRunner:
         self.run_single_test("FAIL: Division by zero",
                              "int main() { return 10 / 0; }", should_pass=False)
 
+        def folded(expression):
+            program = Parser(Tokenizer(f"int main() {{ return {expression}; }}").tokenize()).parse()
+            expression = fold_ast_constants(program).units[0].func_body.items[0].expression
+            return expression.token.value if isinstance(expression, Literal) else None
+
+        def ast_folding_wraps_at_64_bits():
+            return (folded("2 * 3 + 4") == "10"
+                    and folded("9223372036854775807 + 1") == "-9223372036854775808"
+                    and folded("-7 / 2") == "-3" and folded("-7 % 2") == "-1"
+                    and folded("~0 & 0x10 | !010") == "16"
+                    and folded("1 / 0") is None and folded("1 << 64") is None
+                    and folded("x + 1") is None)
+
+        def tac_folding_divides_like_ast():
+            for expression in ("-7 / 2", "-7 % 2", "7 % -2", "9223372036854775807 / 3"):
+                code = f"int main() {{ return {expression}; }}"
+                program = Parser(Tokenizer(code).tokenize()).parse()
+                sym_table = SymbolTable()
+                sym_table.build_symbol_table(program)
+                tac = TAC()
+                tac.generate_tac(program, sym_table)
+                constant_fold(tac)
+                if tac.functions[0].blocks[0].instr_list[0].left.value != folded(expression):
+                    return False
+            return True
+
+        def ast_folding_shrinks_tac():
+            code = "int main() { int a = 5; return a * (60 * 60 * 24) + (2 * 3 + 4) * (7 - 1); }"
+            results = []
+            for fold in (False, True):
+                program = Parser(Tokenizer(code).tokenize()).parse()
+                sym_table = SymbolTable()
+                sym_table.build_symbol_table(program)
+                if fold:
+                    fold_ast_constants(program)
+                tac = TAC()
+                tac.generate_tac(program, sym_table)
+                size = sum(len(block.instr_list) for func in tac.functions for block in func.blocks)
+                for _ in range(4):
+                    constant_fold(tac)
+                    copy_and_constant_propagation(tac)
+                    dead_code_elimination(tac)
+                results.append((size, pretty_tac(tac).split()[-1]))
+            # Same return value from fewer instructions
+            return results[1][0] < results[0][0] and results[1][1] == results[0][1] == "432060"
+
+        def numbered(code):
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            sym_table.build_symbol_table(program)
+            tac = TAC(value_numbering=True)
+            tac.generate_tac(program, sym_table)
+            ops = [instr.op.value for func in tac.functions for block in func.blocks
+                   for instr in block.instr_list if isinstance(instr.op, Token)]
+            return ops, tac.reused_values
+
+        def value_numbering_reuses_subexpressions():
+            shared = numbered("int main() { int a = 2; int b = 3; return (a * b) + (b * a) - ~(a * b); }")
+            # a changes between the products, so both are computed
+            killed = numbered("int main() { int a = 2; int b = 3; int c = a * b; a = 1; return a * b; }")
+            return (shared[0].count('*') == 1 and shared[1] == 2
+                    and killed[0].count('*') == 2 and killed[1] == 0)
+
+        def names_interned_across_stages():
+            code = ("int g = 1; int f(int p) { int x = p + 1; L: if (x < 9) { x = x * 2; goto L; } "
+                    "return x; } int main() { int x = 3; return x - 1; }")
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            declared = len(sym_table.names)
+            tac = TAC()
+            tac.generate_tac(program, sym_table)
+            names = tac.names
+            if names is not sym_table.names or sorted(names.names[:declared]) != ['f', 'g', 'main', 'p', 'x']:
+                return False
+            # Every name an instruction refers to already has an ID
+            size = len(names)
+            for func in tac.functions:
+                for block in func.blocks:
+                    for instr in block.instr_list:
+                        for operand in (instr.res, instr.left, instr.right):
+                            name = operand.value if isinstance(operand, Token) else operand
+                            if (isinstance(name, str) and (not isinstance(operand, Token)
+                                                           or operand.kind == TokenKind.IDENTIFIER)
+                                    and names.intern(name) >= size):
+                                return False
+            registers = register_optimization(tac)
+            return (len(registers) == size and registers[names.ids['x']] >= 0
+                    and registers[names.ids['%L0']] == -1 and len(tac_to_asm(tac, registers)) > 0)
+
+        def compact_ir_round_trips():
+            code = ("int g = 4; int f(int p) { int x = ~p; while (x < p) { x += 2; if (!x) { break; } } "
+                    "return x; } int main() { int y = 7 % 5; for (int i = 0; i < y; i++) { y--; } return y; }")
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            tac = TAC()
+            tac.generate_tac(program, sym_table)
+            program_ir = to_ir(tac)
+            arrays = IRArrays.from_tac(tac)
+            opcodes = {Opcode(opcode) for opcode in arrays.opcodes}
+            if (pretty_tac(to_tac(program_ir)) != pretty_tac(tac) or IRArrays.from_ir(program_ir) != arrays
+                    or not {Opcode.BITNOT, Opcode.LOGNOT, Opcode.MODULUS, Opcode.GOTO, Opcode.WHILE} <= opcodes):
+                return False
+            # The -o1 rounds stop once the arrays stop changing
+            rounds = 0
+            while True:
+                rounds += 1
+                constant_fold(tac)
+                copy_and_constant_propagation(tac)
+                dead_code_elimination(tac)
+                optimized = IRArrays.from_tac(tac)
+                if optimized == arrays:
+                    break
+                arrays = optimized
+            return 1 < rounds < 10 and len(optimized) < len(IRArrays.from_ir(program_ir))
+
+        def streaming_matches_whole_program():
+            single = ("int main() { int a = 3; int b = 0; for (int i = 0; i < a; i++) { b += i * 2; } "
+                      "while (b > 4) { b = b - 1; } return b; }")
+            program = Parser(Tokenizer(single).tokenize()).parse()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            fold_ast_constants(program)
+            tac = TAC(value_numbering=True)
+            tac.generate_tac(program, sym_table)
+            optimize_tac(tac)
+            whole = tac_to_asm(tac, register_optimization(tac))
+            compiler = StreamingCompiler(optimize=True)
+            streamed = list(compiler.compile(Parser(Tokenizer(single).iter_tokens()).iter_units()))
+            if streamed != whole:
+                return False
+            # Nothing of a finished unit is kept
+            compiler = StreamingCompiler(optimize=True)
+            units = Parser(Tokenizer("int g = 2; int f(int a) { return a * 2; } "
+                                     "int main() { int x = 5; return x; }").iter_tokens()).iter_units()
+            lines = []
+            for unit in units:
+                lines += compiler.compile_unit(unit)
+                if compiler.symbol_table.global_scope.children or compiler.tac.functions:
+                    return False
+            if compiler.functions != 2 or 'f:' not in lines or 'main:' not in lines:
+                return False
+            # Globals outlive their unit, an error stops the stream at its unit
+            compiler = StreamingCompiler()
+            units = Parser(Tokenizer("int g = 1; int f() { return 1; } int g = 2; int main() { return 0; }")
+                           .iter_tokens()).iter_units()
+            try:
+                for _ in compiler.compile(units):
+                    pass
+            except SymbolTableError:
+                return compiler.functions == 1
+            return False
+
+        def o1_ignores_o0():
+            from main import run_compiler
+            outcomes = []
+            with tempfile.TemporaryDirectory() as tmp:
+                for code in ("int f() { int x = 10 / !16; return x; } int main() { return 0; }",
+                             "int main() { int a = 3; int b = ~-11 * 14; while (b < a) { b = b + a * a + a * a; } "
+                             "return b; }"):
+                    source = Path(tmp) / "o1.c"
+                    source.write_text(code)
+                    for o0 in (False, True):
+                        output = Path(tmp) / "o1.asm"
+                        printed = io.StringIO()
+                        try:
+                            with contextlib.redirect_stdout(printed):
+                                run_compiler(source, output, [False, False, False, o0, True, False])
+                            optimized_tac = printed.getvalue().split('with Constant Folding')[1]
+                            outcomes.append(optimized_tac + output.read_text())
+                        except SystemExit:
+                            outcomes.append(None)
+            # A divisor folding to zero is rejected either way
+            return outcomes[0] is None and outcomes[1] is None and outcomes[2] == outcomes[3] is not None
+
+        def ssa_assigns_once():
+            code = ("int main() { int a = 0; int b = 1; int n = 5; do { int t = a; a = b; b = t + b; n--; } "
+                    "while (n > 0); if (a > b) { a = b; } return a; }")
+            program = Parser(Tokenizer(code).tokenize()).parse()
+            sym_table = SymbolTable()
+            FusedAnalyzer(program, sym_table).analyze()
+            tac = TAC()
+            tac.generate_tac(program, sym_table)
+            func = tac.functions[0]
+            ssa = construct_ssa(func, tac.names)
+            defined = [instr.res.value for block in func.blocks for instr in block.instr_list
+                       if instr.instr_type in ('ASSIGN', 'DECL', 'PHI')]
+            # The loop branching back to itself is split off into its own block
+            loop = next(block for block, phis in enumerate(ssa.phis) if len(phis) == 3)
+            if (len(defined) != len(set(defined)) or len(ssa.preds[loop]) != 2
+                    or any(len(ssa.succs[pred]) != 1 for pred in ssa.preds[loop])
+                    or ssa.idom[loop] != 0 or loop not in ssa.frontiers[loop]):
+                return False
+            destruct_ssa(ssa)
+            text = pretty_tac(tac)
+            return 'phi' not in text and 'a.2 = a.1' in text and 'return a.' in text
+
+        def parallel_copies_break_cycles():
+            a, b, c = (Token(IDENTIFIER, name) for name in 'abc')
+            temps = iter(Token(IDENTIFIER, f'%swap{n}') for n in range(2))
+            chain = sequentialize_copies([(a, b), (b, c)], temps.__next__)
+            swap = sequentialize_copies([(a, b), (b, a), (c, c)], temps.__next__)
+            as_text = [[(dst.value, src.value) for dst, src in copies] for copies in (chain, swap)]
+            return as_text == [[('a', 'b'), ('b', 'c')], [('%swap0', 'b'), ('b', 'a'), ('a', '%swap0')]]
+
+        self.run_check("AST constant folding wraps at 64 bits", ast_folding_wraps_at_64_bits)
+        self.run_check("TAC constant folding divides like AST folding", tac_folding_divides_like_ast)
+        self.run_check("AST constant folding shrinks TAC", ast_folding_shrinks_tac)
+        self.run_check("Value numbering reuses repeated subexpressions", value_numbering_reuses_subexpressions)
+        self.run_check("Names are interned once for every IR stage", names_interned_across_stages)
+        self.run_check("Compact IR round trips every instruction", compact_ir_round_trips)
+        self.run_check("Streaming compiles one unit at a time", streaming_matches_whole_program)
+        self.run_check("-o1 output does not depend on -o0", o1_ignores_o0)
+        self.run_check("SSA assigns every variable once", ssa_assigns_once)
+        self.run_check("Parallel copies are ordered and break cycles", parallel_copies_break_cycles)
+
     def showcase_features(self):
         """Showcase 5 key features"""
         print("\n" + "=" * 80)